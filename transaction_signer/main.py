@@ -1,12 +1,23 @@
+import argparse
 import inquirer
 import json
 import os
 import toml
 
+import src.batch as batch
+import src.compaction as compaction
+import src.daemon as daemon
 import src.eip712_typed_data as eip712_typed_data
+import src.executor as executor
+import src.fee_oracle as fee_oracle
+import src.gas_estimator as gas_estimator
+import src.merge as merge
+import src.ownership as ownership
+import src.receipt_tracker as receipt_tracker
 import src.safe_transaction as safe_transaction
 import src.tenderly as tenderly
 import src.user_input as user_input
+import src.utils.safe_cache as safe_cache
 import src.utils.signatures as signatures
 import src.utils.validate_config as validate_config
 import src.utils.validate_signer as validate_signer
@@ -68,7 +79,10 @@ def sign_typed_data():
         return
 
     # Only continue if signer is valid.
-    if not validate_signer.validate(safe, all_signatures, transaction_hash, signer):
+    signatures.refresh(signature_store)
+    if not validate_signer.validate(
+        safe, all_signatures, transaction_hash, signer, owners
+    ):
         return
 
     signature = eip712_typed_data.sign(
@@ -80,9 +94,13 @@ def sign_typed_data():
         return
 
     # Save the signature in the output file.
-    if not all_signatures.get(transaction_hash, False):
-        all_signatures[transaction_hash] = {}
-    all_signatures[transaction_hash].update({signer["address"]: signature})
+    signatures.add(
+        signature_store,
+        transaction_hash,
+        signer["address"],
+        signature,
+        safe_tx_record,
+    )
 
     # Update existing signatures and signers.
     current_signers = list(all_signatures.get(transaction_hash, {}).keys())
@@ -91,9 +109,6 @@ def sign_typed_data():
         f"{len(current_signers)}/{required_signatures} signatures are collected, from {current_signers}"
     )
 
-    with open(os.path.join(path, "out/signatures.txt"), "w") as f:
-        json.dump(all_signatures, f)
-
 
 def simulate_on_tenderly():
     tenderly.simulate(safe, to, raw_data, operation, constants, TENDERLY_URL)
@@ -106,14 +121,28 @@ def get_unsigned_safe_tx():
 
 
 def _get_unsigned_safe_tx(relayer) -> dict | bool:
-    signers_to_signatures = all_signatures.get(transaction_hash, {})
+    # Include signatures collected by other sessions.
+    signatures.refresh(signature_store)
+    # Leave out signatures that would make execTransaction revert.
+    signers_to_signatures = signatures.get_valid(
+        transaction_hash,
+        all_signatures.get(transaction_hash, {}),
+        safe_state["owners"],
+    )
 
-    # Sort the signatures in ascending order according to public addresses.
-    signers_and_signatures = signatures.sort_by_signer(signers_to_signatures)
+    # Select the threshold number of signatures, in ascending order according to public addresses.
+    signers_and_signatures = signatures.select(
+        signers_to_signatures, required_signatures
+    )
 
     # Only continue if threshold of safe is met.
     if len(signers_and_signatures) >= required_signatures:
-        packed_signatures = signatures.concatenate(signers_and_signatures)
+        packed_signatures = signatures.pack(signers_and_signatures)
+
+        # Fees set to zero are estimated from the recent blocks.
+        max_fee, max_priority_fee = fee_oracle.resolve(
+            fee_oracle_of_chain, max_fee_per_gas, max_priority_fee_per_gas
+        )
 
         # Create the unsigned transaction:
         unsigned_safe_tx = safe_transaction.create(
@@ -126,8 +155,12 @@ def _get_unsigned_safe_tx(relayer) -> dict | bool:
             packed_signatures,
             relayer["address"],
             gas,
-            max_fee_per_gas,
-            max_priority_fee_per_gas,
+            max_fee,
+            max_priority_fee,
+            estimator=estimator,
+            access_list=access_list,
+            chain_id=chain["chain_id"],
+            signer_count=len(signers_and_signatures),
         )
 
         return unsigned_safe_tx
@@ -160,7 +193,10 @@ def _get_signed_safe_tx(relayer) -> dict | bool:
 def sign_and_broadcast_safe_tx() -> bool:
     relayer = user_input.get_relayer(relayers)
     if relayer:
-        signed_tx = _get_signed_safe_tx(relayer)
+        unsigned_safe_tx = _get_unsigned_safe_tx(relayer)
+        signed_tx = unsigned_safe_tx and safe_transaction.sign(
+            w3, unsigned_safe_tx, relayer
+        )
 
         if signed_tx:
             choices = [
@@ -170,7 +206,7 @@ def sign_and_broadcast_safe_tx() -> bool:
             questions = [
                 inquirer.List(
                     "actions",
-                    message=f"Confirm you want to broadcast the signed transaction (Chain Id: {w3.eth.chain_id})",
+                    message=f"Confirm you want to broadcast the signed transaction (Chain Id: {chain['chain_id']})",
                     choices=choices,
                 ),
             ]
@@ -180,13 +216,117 @@ def sign_and_broadcast_safe_tx() -> bool:
                 w3.eth.send_raw_transaction(signed_tx.raw_transaction)
                 tx_hash = f"0x{keccak(signed_tx.raw_transaction).hex()}"
                 print(f"Transaction sent: {tx_hash}")
+                # Wait for the execution, replacing the transaction with higher fees if stuck.
+                (tracked,) = receipt_tracker.track(
+                    w3,
+                    [
+                        receipt_tracker.create_entry(
+                            tx_hash, unsigned_safe_tx, relayer, transaction_hash
+                        )
+                    ],
+                )
+                if receipt_tracker.is_executed(tracked):
+                    print(f"Safe transaction executed in {tracked['tx_hash']}.")
+                else:
+                    print(
+                        f"Safe transaction not executed in {tracked['tx_hash']} (status {tracked['status']})."
+                    )
                 # Return True if successful.
                 return True
     # Return False if not successful.
     return False
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Sign, build and broadcast Safe transactions."
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    batch_parser = subparsers.add_parser(
+        "batch", help="Process a queue file of Safe transactions without prompts."
+    )
+    batch_parser.add_argument("queue", help="Path to the queue file (toml).")
+    batch_parser.add_argument(
+        "--broadcast",
+        action="store_true",
+        help="Broadcast the transactions that reached their threshold.",
+    )
+
+    hash_parser = subparsers.add_parser(
+        "hash", help="Compute the hash of a Safe tx offline, without RPC calls."
+    )
+    hash_parser.add_argument("--chain-id", type=int, required=True, help="Chain id.")
+    hash_parser.add_argument("--safe", required=True, help="Address of the safe.")
+    hash_parser.add_argument("--nonce", type=int, required=True, help="Safe nonce.")
+    hash_parser.add_argument(
+        "--count",
+        type=int,
+        default=1,
+        help="Number of consecutive nonces to hash, starting at --nonce (default: 1).",
+    )
+    hash_parser.add_argument("--to", help="Target address (default: from config).")
+    hash_parser.add_argument(
+        "--operation", type=int, help="Operation (default: from config)."
+    )
+    hash_parser.add_argument("--raw-data", help="Calldata (default: from config).")
+
+    daemon_parser = subparsers.add_parser(
+        "daemon", help="Serve a local HTTP API, keeping connections and state warm."
+    )
+    daemon_parser.add_argument(
+        "--host", default="127.0.0.1", help="Host to listen on (default: 127.0.0.1)."
+    )
+    daemon_parser.add_argument(
+        "--port", type=int, default=8080, help="Port to listen on (default: 8080)."
+    )
+    daemon_parser.add_argument(
+        "--socket", help="Listen on this Unix socket instead of a TCP port."
+    )
+
+    compact_parser = subparsers.add_parser(
+        "compact",
+        help="Remove signatures of transactions whose Safe nonce is already consumed.",
+    )
+    compact_parser.add_argument(
+        "--drop",
+        action="store_true",
+        help="Drop the stale signatures, instead of moving them to out/signatures_archive.jsonl.",
+    )
+
+    execute_parser = subparsers.add_parser(
+        "execute",
+        help="Execute all signed Safe transactions that reached their threshold.",
+    )
+    execute_parser.add_argument(
+        "--relayer",
+        action="append",
+        help="Address of a relayer to execute with, can be repeated (default: all hot wallet relayers).",
+    )
+
+    subparsers.add_parser(
+        "owners",
+        help="Check which signers are owners of which safes, on all configured chains.",
+    )
+
+    merge_parser = subparsers.add_parser(
+        "merge", help="Merge signature files of other signers into the signature store."
+    )
+    merge_parser.add_argument(
+        "files", nargs="+", help="Signature files (signatures.jsonl or signatures.txt)."
+    )
+    merge_parser.add_argument(
+        "--no-verify",
+        action="store_true",
+        help="Merge signatures without checking that they recover to their signer.",
+    )
+
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
+
     ##### Set Up #####
 
     ### User input ###
@@ -203,15 +343,81 @@ if __name__ == "__main__":
     gas = config_data["gas"]
     max_fee_per_gas = config_data["max_fee_per_gas"]
     max_priority_fee_per_gas = config_data["max_priority_fee_per_gas"]
+    access_list = config_data.get("access_list", False)
 
     validate_config.validate(safes, signers, relayers, operation, to, chains=chains)
 
     ### Constants ###
     constants = toml.load(os.path.join(path, "data/constants.toml"))
 
+    ### Offline hashing ###
+    if args.command == "hash":
+        safe_address = Web3.to_checksum_address(args.safe)
+        # Cross-check the domain separator if the safe was read on-chain before.
+        cached = safe_cache.get(safe_cache.load(str(path)), args.chain_id, safe_address)
+        if cached is None:
+            print("Safe is not cached, the domain separator is not cross-checked.")
+        domain_hash = eip712_typed_data.get_domain_separator(
+            args.chain_id, safe_address, cached["domain_separator"] if cached else None
+        )
+        safe_txs = [
+            {
+                "safe": safe_address,
+                "chain_id": args.chain_id,
+                "to": args.to or to,
+                "raw_data": args.raw_data or raw_data,
+                "operation": operation if args.operation is None else args.operation,
+                "nonce": nonce,
+            }
+            for nonce in range(args.nonce, args.nonce + args.count)
+        ]
+        transaction_hashes = eip712_typed_data.get_safe_tx_hashes(safe_txs, constants)
+        print(f"Domain Hash is: {domain_hash.hex()}")
+        for safe_tx, transaction_hash in zip(safe_txs, transaction_hashes):
+            print(f"Nonce {safe_tx['nonce']}: Transaction Hash is: {transaction_hash}")
+        raise SystemExit(0)
+
+    ### Merging ###
+    if args.command == "merge":
+        merge.run(str(path), args.files, constants, verify=not args.no_verify)
+        raise SystemExit(0)
+
     ### Secrets ###
     load_dotenv(find_dotenv())
 
+    with open(os.path.join(path, "data/abis", "safe.json")) as f:
+        SAFE_ABI = json.loads(f.read())
+
+    ### Batch mode ###
+    if args.command == "batch":
+        queue = batch.load_queue(args.queue)
+        batch.validate_queue(queue, chains, signers, relayers)
+        batch.run(
+            str(path), queue, config_data, constants, SAFE_ABI, broadcast=args.broadcast
+        )
+        raise SystemExit(0)
+
+    ### Execution ###
+    if args.command == "execute":
+        executor.run(str(path), config_data, constants, SAFE_ABI, args.relayer)
+        raise SystemExit(0)
+
+    ### Ownership ###
+    if args.command == "owners":
+        ownership.run(config_data, SAFE_ABI)
+        raise SystemExit(0)
+
+    ### Compaction ###
+    if args.command == "compact":
+        compaction.run(str(path), config_data, SAFE_ABI, archive=not args.drop)
+        raise SystemExit(0)
+
+    ### Daemon mode ###
+    if args.command == "daemon":
+        state = daemon.create_state(str(path), config_data, constants, SAFE_ABI)
+        daemon.serve(state, args.host, args.port, args.socket)
+        raise SystemExit(0)
+
     ### Web3 ###
     # Select the Chain.
     chain = user_input.get_chain(chains)
@@ -222,42 +428,78 @@ if __name__ == "__main__":
             f"RPC URL environment variable '{chain['rpc_name']}' is not set."
         )
     w3 = Web3(Web3.HTTPProvider(rpc_url))
-    if w3.eth.chain_id != chain["chain_id"]:
-        raise Exception(f"Chain Id is {w3.eth.chain_id}, expected {chain['chain_id']}")
+    fee_oracle_of_chain = fee_oracle.create_oracle(w3)
+    # Gas estimates are reused when the same transaction is built again in a block.
+    estimator = gas_estimator.create_estimator()
 
     ### Tenderly ###
     TENDERLY_URL = f"https://api.tenderly.co/api/v1/account/{os.getenv('TENDERLY_ACCOUNT')}/project/{os.getenv('TENDERLY_PROJECT')}"
 
     ### Gnosis safe ###
+    # Get the state of all safes, without RPC calls if they are cached.
+    cache = safe_cache.load(str(path))
+    safes_state = safe_cache.read_safes_state(
+        w3,
+        [w3.eth.contract(address=safe["address"], abi=SAFE_ABI) for safe in safes],
+        cache,
+        chain["chain_id"],
+    )
+
     # Select the Safe.
-    safe = user_input.get_safe(safes)
-    with open(os.path.join(path, "data/abis", "safe.json")) as f:
-        SAFE_ABI = json.loads(f.read())
+    safe = user_input.get_safe(safes, safes_state)
     safe = w3.eth.contract(address=safe["address"], abi=SAFE_ABI)
 
+    # Cached states have no nonce, get the full state of the selected safe.
+    safe_state = safes_state[safe.address]
+    if safe_state is None or "nonce" not in safe_state:
+        safe_state = safe_cache.read_safe_state(w3, safe, cache, chain["chain_id"])
+    if safe_state["chain_id"] != chain["chain_id"]:
+        raise Exception(
+            f"Chain Id is {safe_state['chain_id']}, expected {chain['chain_id']}"
+        )
+    safe_cache.save(str(path), cache)
+
     # Required number of signatures.
-    required_signatures = safe.functions.getThreshold().call()
+    required_signatures = safe_state["threshold"]
+    # Owners are read once per session, signers are checked against them without RPC calls.
+    owners = validate_signer.get_owners(safe_state["owners"])
 
     ### Transaction ###
     # Generate the message that must be signed by the multisig users:
     typed_data = eip712_typed_data.get_typed_data(
-        safe, to, raw_data, operation, constants
+        safe,
+        to,
+        raw_data,
+        operation,
+        constants,
+        nonce=safe_state["nonce"],
+        chain_id=safe_state["chain_id"],
     )
 
     # Calculate the Transaction Hash.
-    domain_hash = safe.functions.domainSeparator().call()
+    domain_hash = safe_cache.get_domain_separator(w3, safe, cache, chain["chain_id"])
     message_hash = eip712_typed_data.get_typed_data_hash(typed_data)
 
-    msg_to_sign = (
-        Web3.to_bytes(hexstr=constants["SIGN_MAGIC"]) + domain_hash + message_hash
+    transaction_hash = eip712_typed_data.get_transaction_hash(
+        domain_hash, message_hash, constants
     )
-    transaction_hash = keccak(msg_to_sign).hex()
     print(f"Domain Hash is: {domain_hash.hex()}")
     print(f"Message Hash is: {message_hash.hex()}")
     print(f"Transaction Hash is: {transaction_hash}")
+    # Stored with the signatures, so stale signatures can be compacted.
+    safe_tx_record = {
+        "chain_id": chain["chain_id"],
+        "safe": safe.address,
+        "nonce": safe_state["nonce"],
+        "to": to,
+        "operation": operation,
+        "raw_data": raw_data,
+    }
 
     # Fetch the list of existing signatures, if it exists.
-    all_signatures = signatures.load(str(path))
+    # Signatures added by other sessions are merged in while this session runs.
+    signature_store = signatures.open_store(str(path))
+    all_signatures = signature_store["signatures"]
 
     # Get existing signatures for the Transaction Hash.
     current_signers = list(all_signatures.get(transaction_hash, {}).keys())
@@ -0,0 +1,335 @@
+import toml
+
+import src.eip712_typed_data as eip712_typed_data
+import src.fee_oracle as fee_oracle
+import src.gas_estimator as gas_estimator
+import src.receipt_tracker as receipt_tracker
+import src.safe_reader as safe_reader
+import src.safe_transaction as safe_transaction
+import src.utils.connections as connections
+import src.utils.nonces as nonces
+import src.utils.signatures as signatures
+import src.utils.validate_config as validate_config
+import src.utils.validate_signer as validate_signer
+
+from eth_utils import keccak
+
+REQUIRED_FIELDS = ("chain_id", "safe", "to", "operation", "raw_data")
+
+
+def load_queue(queue_path: str) -> list:
+    queue = toml.load(queue_path).get("transactions", [])
+    if not queue:
+        raise Exception(f"No transactions found in queue file {queue_path}.")
+    return queue
+
+
+def validate_queue(queue: list, chains: list, signers: list, relayers: list):
+    chain_ids = {chain["chain_id"] for chain in chains}
+    signer_addresses = {signer["address"] for signer in signers}
+    relayer_addresses = {relayer["address"] for relayer in relayers}
+
+    for i, transaction in enumerate(queue):
+        for field in REQUIRED_FIELDS:
+            if field not in transaction:
+                raise Exception(f"Transaction {i} in queue is missing field '{field}'.")
+
+        if transaction["chain_id"] not in chain_ids:
+            raise Exception(
+                f"Transaction {i} in queue uses unknown chain id {transaction['chain_id']}."
+            )
+
+        validate_config.validate_transaction(
+            transaction["operation"], transaction["to"]
+        )
+
+        for signer in transaction.get("signers", []):
+            if signer not in signer_addresses:
+                raise Exception(
+                    f"Transaction {i} in queue uses unknown signer {signer}."
+                )
+
+        relayer = transaction.get("relayer")
+        if relayer is not None and relayer not in relayer_addresses:
+            raise Exception(f"Transaction {i} in queue uses unknown relayer {relayer}.")
+
+
+def run(
+    path: str,
+    queue: list,
+    config_data: dict,
+    constants: dict,
+    safe_abi: list,
+    broadcast: bool = False,
+) -> list:
+    """
+    Process a queue of Safe transactions without user prompts.
+
+    All transactions share one Web3 connection per chain and one cached state per Safe.
+    Transactions without an explicit nonce get consecutive nonces per Safe, starting from the current Safe nonce.
+    With gas set to zero, only the transaction with the current Safe nonce is built, later ones can't be estimated yet.
+    A transaction that fails gets an error in its result, the rest of the queue is still processed.
+
+    :param path: The path of the transaction_signer directory.
+    :param queue: The transactions to process.
+    :param config_data: The parsed config_transaction_signer.toml.
+    :param constants: The parsed data/constants.toml.
+    :param safe_abi: The ABI of the Safe contract.
+    :param broadcast: Broadcast transactions that reached their threshold.
+    :return: One result dict per transaction.
+    """
+    signers = {signer["address"]: signer for signer in config_data["signers"]}
+    relayers = {relayer["address"]: relayer for relayer in config_data["relayers"]}
+
+    chain_connections = {}
+    safes = {}
+    next_nonces = {}
+    signature_store = signatures.open_store(path)
+    state = {
+        "nonces": nonces.create_manager(),
+        "fee_oracles": {},
+        "estimator": gas_estimator.create_estimator(),
+    }
+    results = []
+
+    for transaction in queue:
+        chain_id = transaction["chain_id"]
+        w3 = connections.get_w3(chain_connections, config_data["chains"], chain_id)
+        safe = _get_safe(safes, w3, chain_id, transaction["safe"], safe_abi, queue)
+
+        # Assign consecutive nonces to queued transactions of the same safe.
+        key = (chain_id, safe["contract"].address)
+        nonce = transaction.get("nonce", next_nonces.get(key, safe["nonce"]))
+        next_nonces[key] = nonce + 1
+
+        typed_data = eip712_typed_data.get_typed_data(
+            safe["contract"],
+            transaction["to"],
+            transaction["raw_data"],
+            transaction["operation"],
+            constants,
+            nonce=nonce,
+            chain_id=chain_id,
+        )
+        message_hash = eip712_typed_data.get_typed_data_hash(typed_data)
+        transaction_hash = eip712_typed_data.get_transaction_hash(
+            safe["domain_separator"], message_hash, constants
+        )
+        result = {
+            "safe": safe["contract"].address,
+            "nonce": nonce,
+            "transaction_hash": transaction_hash,
+        }
+        print(
+            f"Safe {result['safe']} (Chain Id: {chain_id}), nonce {nonce}: {transaction_hash}"
+        )
+
+        # Collect the signatures of the listed signers.
+        signers_to_signatures = signatures.refresh(signature_store).get(
+            transaction_hash, {}
+        )
+        for address in transaction.get("signers", []):
+            if signers_to_signatures.get(address, "") != "":
+                continue
+            if address.lower() not in safe["owners"]:
+                print(f"Signer {address} is not an owner of the safe {result['safe']}.")
+                continue
+            signature = eip712_typed_data.sign(
+                w3,
+                signers[address],
+                typed_data,
+                safe["domain_separator"],
+                message_hash,
+            )
+            if signature:
+                signatures.add(
+                    signature_store,
+                    transaction_hash,
+                    address,
+                    signature,
+                    {
+                        "chain_id": chain_id,
+                        "safe": result["safe"],
+                        "nonce": nonce,
+                        "to": transaction["to"],
+                        "operation": transaction["operation"],
+                        "raw_data": transaction["raw_data"],
+                    },
+                )
+                signers_to_signatures = signature_store["signatures"][transaction_hash]
+
+        result["signatures"] = len(signers_to_signatures)
+        print(f"{result['signatures']}/{safe['threshold']} signatures are collected.")
+
+        # Assemble the Safe transaction once the threshold is met.
+        relayer = transaction.get("relayer")
+        if relayer is None or result["signatures"] < safe["threshold"]:
+            results.append(result)
+            continue
+
+        signers_to_signatures = signatures.get_valid(
+            transaction_hash, signers_to_signatures, safe["owners"]
+        )
+        if len(signers_to_signatures) < safe["threshold"]:
+            results.append(result)
+            continue
+        signers_and_signatures = signatures.select(
+            signers_to_signatures, safe["threshold"]
+        )
+
+        # Only the transaction with the current Safe nonce can be executed, or estimated,
+        # the signatures of a later nonce make eth_estimateGas revert (GS026).
+        gas = transaction.get("gas", config_data["gas"])
+        if gas == 0 and nonce != safe["nonce"]:
+            print(
+                f"The gas of nonce {nonce} can't be estimated before nonce {safe['nonce']} is executed."
+            )
+            results.append(result)
+            continue
+        executable = broadcast and nonce == safe["nonce"]
+        # Relayer nonces are only reserved for transactions that are sent.
+        relayer_nonce = None
+        try:
+            if executable:
+                relayer_nonce = nonces.get_nonce(state["nonces"], w3, chain_id, relayer)
+            _execute(
+                w3,
+                chain_id,
+                safe,
+                transaction,
+                transaction_hash,
+                signers_and_signatures,
+                relayers[relayer],
+                gas,
+                relayer_nonce,
+                config_data,
+                constants,
+                state,
+                result,
+            )
+        except Exception as e:
+            # One failing transaction does not abort the rest of the queue.
+            print(f"Safe {result['safe']}, nonce {nonce}: failed ({e}).")
+            result["error"] = str(e)
+            if relayer_nonce is not None and "tx_hash" not in result:
+                nonces.release(state["nonces"], chain_id, relayer, relayer_nonce)
+                nonces.try_reconcile(state["nonces"], w3, chain_id, relayer)
+
+        results.append(result)
+
+    return results
+
+
+def _execute(
+    w3: any,
+    chain_id: int,
+    safe: dict,
+    transaction: dict,
+    transaction_hash: str,
+    signers_and_signatures: list,
+    relayer: dict,
+    gas: int,
+    relayer_nonce: int | None,
+    config_data: dict,
+    constants: dict,
+    state: dict,
+    result: dict,
+):
+    # Builds the Safe transaction, and sends it if a relayer nonce is reserved.
+    max_fee_per_gas, max_priority_fee_per_gas = fee_oracle.resolve(
+        fee_oracle.get_oracle(state["fee_oracles"], w3, chain_id),
+        config_data["max_fee_per_gas"],
+        config_data["max_priority_fee_per_gas"],
+    )
+    unsigned_safe_tx = safe_transaction.create(
+        w3,
+        safe["contract"],
+        transaction["to"],
+        constants,
+        transaction["raw_data"],
+        transaction["operation"],
+        signatures.pack(signers_and_signatures),
+        relayer["address"],
+        gas,
+        max_fee_per_gas,
+        max_priority_fee_per_gas,
+        relayer_nonce,
+        state["estimator"],
+        config_data.get("access_list", False),
+        chain_id,
+        len(signers_and_signatures),
+    )
+    result["unsigned_safe_tx"] = unsigned_safe_tx
+    if relayer_nonce is None:
+        return
+
+    signed_tx = safe_transaction.sign(w3, unsigned_safe_tx, relayer)
+    if not signed_tx:
+        raise Exception(f"Relayer {relayer['name']} could not sign the transaction.")
+    w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+    tx_hash = f"0x{keccak(signed_tx.raw_transaction).hex()}"
+    print(f"Transaction sent: {tx_hash}")
+    result["tx_hash"] = tx_hash
+    nonces.mark_sent(
+        state["nonces"], chain_id, relayer["address"], relayer_nonce, tx_hash
+    )
+
+    # Wait for execution, so the next transaction of the safe can be estimated.
+    (tracked,) = receipt_tracker.track(
+        w3,
+        [
+            receipt_tracker.create_entry(
+                tx_hash, unsigned_safe_tx, relayer, transaction_hash
+            )
+        ],
+    )
+    if tracked["tx_hash"] != tx_hash:
+        nonces.mark_sent(
+            state["nonces"],
+            chain_id,
+            relayer["address"],
+            relayer_nonce,
+            tracked["tx_hash"],
+        )
+    result["tx_hash"] = tracked["tx_hash"]
+    result["status"] = tracked["status"]
+    if receipt_tracker.is_executed(tracked):
+        safe["nonce"] += 1
+    # Forgets the mined transaction, the nonce of a dropped one is handed out again.
+    nonces.try_reconcile(state["nonces"], w3, chain_id, relayer["address"])
+
+
+def _get_safe(
+    safes: dict, w3: any, chain_id: int, address: str, safe_abi: list, queue: list
+) -> dict:
+    key = (chain_id, address)
+    if key in safes:
+        return safes[key]
+
+    # Read the state of all queued safes on the chain in a single call.
+    addresses = sorted(
+        {
+            transaction["safe"]
+            for transaction in queue
+            if transaction["chain_id"] == chain_id
+            and (chain_id, transaction["safe"]) not in safes
+        }
+    )
+    contracts = [w3.eth.contract(address=a, abi=safe_abi) for a in addresses]
+    safes_state = safe_reader.read_safes_state(w3, contracts)
+
+    for contract in contracts:
+        safe_state = safes_state[contract.address]
+        if safe_state is None:
+            raise Exception(
+                f"Safe {contract.address} is not deployed on chain {chain_id}."
+            )
+        safes[(chain_id, contract.address)] = {
+            **safe_state,
+            "domain_separator": eip712_typed_data.get_domain_separator(
+                chain_id, contract.address, safe_state["domain_separator"]
+            ),
+            "contract": contract,
+            "owners": validate_signer.get_owners(safe_state["owners"]),
+        }
+    return safes[key]
@@ -0,0 +1,70 @@
+import src.safe_reader as safe_reader
+import src.utils.connections as connections
+import src.utils.signatures as signatures
+
+from web3 import Web3
+
+# The state of a Safe needed to find stale signatures, mapped to the function returning it.
+NONCE_CALLS = {"nonce": "nonce"}
+
+
+def run(path: str, config_data: dict, safe_abi: list, archive: bool = True) -> list:
+    """
+    Compact the signature store, removing signatures of transactions whose nonce is consumed.
+
+    The current nonce of all Safes with recorded transactions is read in one call per chain.
+
+    :param path: The path of the transaction_signer directory.
+    :param config_data: The parsed config_transaction_signer.toml.
+    :param safe_abi: The ABI of the Safe contract.
+    :param archive: Move the removed entries to the archive, instead of dropping them.
+    :return: The removed transaction hashes.
+    """
+    store = signatures.open_store(path)
+
+    safes_by_chain = {}
+    for transaction in store["transactions"].values():
+        safes_by_chain.setdefault(transaction["chain_id"], set()).add(
+            Web3.to_checksum_address(transaction["safe"])
+        )
+
+    chain_connections = {}
+    nonces = {}
+    for chain_id, addresses in sorted(safes_by_chain.items()):
+        try:
+            w3 = connections.get_w3(chain_connections, config_data["chains"], chain_id)
+        except Exception as e:
+            print(f"Skipping the safes on chain {chain_id} ({e}).")
+            continue
+        safes = [w3.eth.contract(address=a, abi=safe_abi) for a in sorted(addresses)]
+        for address, nonce in get_nonces(w3, safes).items():
+            nonces[(chain_id, address.lower())] = nonce
+
+    removed = signatures.compact(path, nonces, archive)
+    unrecorded = len(set(store["signatures"]) - set(store["transactions"]))
+    print(
+        f"{len(removed)} stale transactions are {'archived' if archive else 'dropped'}."
+    )
+    if unrecorded:
+        print(
+            f"{unrecorded} transactions have no recorded safe and nonce, they are kept."
+        )
+    return removed
+
+
+def get_nonces(w3: any, safes: list) -> dict:
+    """
+    Read the current nonce of multiple Safes on one chain in a single eth_call via Multicall3.
+
+    Falls back to one JSON-RPC batch request per Safe if Multicall3 is not available on the chain.
+
+    :param w3: The Web3 object.
+    :param safes: The Safe contracts.
+    :return: Dict mapping each Safe address to its nonce, Safes that are not deployed are left out.
+    """
+    states = safe_reader.read_safes_state(w3, safes, calls=NONCE_CALLS)
+    return {
+        address: state["nonce"]
+        for address, state in states.items()
+        if state is not None
+    }
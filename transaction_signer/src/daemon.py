@@ -0,0 +1,516 @@
+import hmac
+import json
+import os
+import secrets
+import socketserver
+import stat
+import threading
+import time
+
+import src.eip712_typed_data as eip712_typed_data
+import src.fee_oracle as fee_oracle
+import src.gas_estimator as gas_estimator
+import src.safe_transaction as safe_transaction
+import src.utils.connections as connections
+import src.utils.nonces as nonces
+import src.utils.safe_cache as safe_cache
+import src.utils.signatures as signatures
+import src.utils.validate_config as validate_config
+import src.utils.validate_signer as validate_signer
+
+from eth_utils import keccak
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from web3 import Web3
+
+TRANSACTION_FIELDS = ("chain_id", "safe", "to", "operation", "raw_data")
+SIGNATURE_FIELDS = ("chain_id", "safe", "transaction_hash", "signer", "signature")
+# Token that clients of the TCP port send as "Authorization: Bearer <token>".
+TOKEN_FILE = "out/daemon.token"
+# Seconds the cached owners and threshold of a safe are used before checking for changes, about one block.
+SAFE_CHECK_INTERVAL = 12
+
+
+def create_state(path: str, config_data: dict, constants: dict, safe_abi: list) -> dict:
+    """
+    Create the state that is kept warm between requests of the daemon.
+
+    :param path: The path of the transaction_signer directory.
+    :param config_data: The parsed config_transaction_signer.toml.
+    :param constants: The parsed data/constants.toml.
+    :param safe_abi: The ABI of the Safe contract.
+    :return: The daemon state.
+    """
+    return {
+        "path": path,
+        "config_data": config_data,
+        "constants": constants,
+        "safe_abi": safe_abi,
+        "relayers": {
+            relayer["address"]: relayer for relayer in config_data["relayers"]
+        },
+        "connections": {},
+        # Fee estimates per chain, refreshed in the background.
+        "fee_oracles": {},
+        # Gas estimates per block, shared by all builds of a transaction.
+        "gas_estimator": gas_estimator.create_estimator(),
+        "contracts": {},
+        "cache": safe_cache.load(path),
+        # When the cached owners and threshold of each safe were last checked for changes.
+        "checked": {},
+        "signatures": signatures.open_store(path),
+        # Relayer nonces of broadcast transactions, so they can be sent back-to-back.
+        "nonces": nonces.create_manager(),
+        # Transactions of computed hashes, recorded with their first signature.
+        "transactions": {},
+        # Requests are handled one at a time, they share the connections and files.
+        "lock": threading.Lock(),
+    }
+
+
+def get_safe_tx_hash(state: dict, request: dict) -> dict:
+    """
+    Compute the hash of a Safe transaction.
+
+    :param state: The daemon state.
+    :param request: The transaction (chain_id, safe, to, operation, raw_data and optionally nonce).
+    :return: The Safe, nonce, transaction hash, and collected signatures and threshold.
+    """
+    safe, safe_state, transaction_hash = _get_safe_tx(state, request)
+    state["transactions"][transaction_hash] = {
+        "chain_id": request["chain_id"],
+        "safe": safe.address,
+        "nonce": safe_state["nonce"],
+        "to": request["to"],
+        "operation": request["operation"],
+        "raw_data": request["raw_data"],
+    }
+    signers_to_signatures = signatures.refresh(state["signatures"]).get(
+        transaction_hash, {}
+    )
+    return {
+        "safe": safe.address,
+        "nonce": safe_state["nonce"],
+        "transaction_hash": transaction_hash,
+        "signatures": len(signers_to_signatures),
+        "threshold": safe_state["threshold"],
+    }
+
+
+def submit_signature(state: dict, request: dict) -> dict:
+    """
+    Add the signature of an owner to the signature store.
+
+    :param state: The daemon state.
+    :param request: The chain_id, safe, transaction_hash, signer and signature.
+    :return: The transaction hash, and collected signatures and threshold.
+    """
+    _validate_fields(request, SIGNATURE_FIELDS)
+    w3, safe = _get_contract(state, request)
+    safe_state = _get_owners_state(state, w3, safe, request["chain_id"])
+
+    signer = Web3.to_checksum_address(request["signer"])
+    owners = validate_signer.get_owners(safe_state["owners"])
+    if not validate_signer.is_owner(safe, signer, owners):
+        raise Exception(f"Signer {signer} is not an owner of the safe {safe.address}.")
+
+    # Signatures and hashes are stored as hex strings without 0x prefix.
+    transaction_hash = request["transaction_hash"].removeprefix("0x").lower()
+    if len(transaction_hash) != 64 or not _is_hex(transaction_hash):
+        raise Exception("Transaction hash must be 32 bytes, hex encoded.")
+    # Contract signatures are followed by their dynamic data.
+    signature = request["signature"].removeprefix("0x").lower()
+    if len(signature) < 130 or not _is_hex(signature):
+        raise Exception("Signature must be at least 65 bytes, hex encoded.")
+    invalid = signatures.verify(transaction_hash, {signer: signature})
+    if signer in invalid:
+        raise Exception(f"Signature of {signer} is invalid ({invalid[signer]}).")
+    # Also rejects contract signatures whose data does not match its length.
+    signatures.pack([(signer, signature)])
+
+    signatures.add(
+        state["signatures"],
+        transaction_hash,
+        signer,
+        signature,
+        state["transactions"].pop(transaction_hash, None),
+    )
+    signers_to_signatures = state["signatures"]["signatures"][transaction_hash]
+
+    return {
+        "transaction_hash": transaction_hash,
+        "signatures": len(signers_to_signatures),
+        "threshold": safe_state["threshold"],
+    }
+
+
+def get_unsigned_safe_tx(state: dict, request: dict) -> dict:
+    """
+    Build the execTransaction transaction of a Safe transaction that reached its threshold.
+
+    :param state: The daemon state.
+    :param request: The transaction, relayer and optionally nonce and gas.
+    :return: The unsigned transaction.
+    """
+    _, unsigned_safe_tx, _ = _create_safe_tx(state, request)
+    return unsigned_safe_tx
+
+
+def get_signed_safe_tx(state: dict, request: dict) -> dict:
+    """
+    Build and sign the execTransaction transaction of a Safe transaction that reached its threshold.
+
+    :param state: The daemon state.
+    :param request: The transaction, relayer and optionally nonce and gas.
+    :return: The raw signed transaction and its hash.
+    """
+    _, _, signed_tx = _create_signed_safe_tx(state, request)
+    return {
+        "raw_transaction": f"0x{signed_tx.raw_transaction.hex()}",
+        "tx_hash": f"0x{keccak(signed_tx.raw_transaction).hex()}",
+    }
+
+
+def broadcast_safe_tx(state: dict, request: dict) -> dict:
+    """
+    Build, sign and broadcast the execTransaction transaction of a Safe transaction.
+
+    :param state: The daemon state.
+    :param request: The transaction, relayer and optionally nonce and gas.
+    :return: The hash of the sent transaction.
+    """
+    relayer = _get_hot_relayer(state, request)["address"]
+    chain_id = request.get("chain_id")
+    w3 = connections.get_w3(
+        state["connections"], state["config_data"]["chains"], chain_id
+    )
+    nonce = nonces.get_nonce(state["nonces"], w3, chain_id, relayer)
+
+    try:
+        w3, _, signed_tx = _create_signed_safe_tx(state, request, nonce)
+        w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+    except Exception:
+        nonces.release(state["nonces"], chain_id, relayer, nonce)
+        # E.g. the nonce is too low, because the relayer sent a transaction elsewhere.
+        nonces.try_reconcile(state["nonces"], w3, chain_id, relayer)
+        raise
+
+    tx_hash = f"0x{keccak(signed_tx.raw_transaction).hex()}"
+    nonces.mark_sent(state["nonces"], chain_id, relayer, nonce, tx_hash)
+    print(f"Transaction sent: {tx_hash}")
+    return {"tx_hash": tx_hash}
+
+
+ENDPOINTS = {
+    "/safe_tx_hash": get_safe_tx_hash,
+    "/signatures": submit_signature,
+    "/unsigned_safe_tx": get_unsigned_safe_tx,
+    "/signed_safe_tx": get_signed_safe_tx,
+    "/broadcast": broadcast_safe_tx,
+}
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/health":
+            self._respond(200, {"status": "ok"})
+        else:
+            self._respond(404, {"error": f"Unknown endpoint {self.path}."})
+
+    def do_POST(self):
+        endpoint = ENDPOINTS.get(self.path)
+        if endpoint is None:
+            self._respond(404, {"error": f"Unknown endpoint {self.path}."})
+            return
+
+        # Browsers can't send a JSON content type or a token cross-origin without a preflight.
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip()
+        if content_type != "application/json":
+            self._respond(415, {"error": "Content-Type must be application/json."})
+            return
+        if not self._is_authorized():
+            self._respond(401, {"error": "Missing or invalid token."})
+            return
+
+        state = self.server.state
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or "{}")
+            if not isinstance(request, dict):
+                raise Exception("Request body must be a JSON object.")
+            with state["lock"]:
+                response = endpoint(state, request)
+        except Exception as e:
+            self._respond(400, {"error": str(e)})
+            return
+        self._respond(200, response)
+
+    def address_string(self) -> str:
+        # Clients of a Unix socket have no address.
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return "unix-socket"
+
+    def _is_authorized(self) -> bool:
+        # Clients of a Unix socket are authorized by the permissions of the socket.
+        if self.server.token is None:
+            return True
+        authorization = self.headers.get("Authorization", "")
+        return hmac.compare_digest(
+            authorization.encode(), f"Bearer {self.server.token}".encode()
+        )
+
+    def _respond(self, status: int, body: dict):
+        data = json.dumps(body, default=_to_json).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class ThreadingUnixHTTPServer(
+    socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    daemon_threads = True
+
+
+def create_server(
+    state: dict,
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    socket_path: str | None = None,
+    token: str | None = None,
+) -> socketserver.BaseServer:
+    """
+    Create the HTTP server of the daemon, listening on a TCP port or a Unix socket.
+
+    :param state: The daemon state.
+    :param host: The host to listen on.
+    :param port: The port to listen on.
+    :param socket_path: The path of the Unix socket, overrides host and port if set.
+    :param token: The token that POST requests must send, None to accept any request.
+    :return: The server, not yet serving.
+    """
+    if socket_path is not None:
+        # A socket left behind by a previous run is replaced, any other file is kept.
+        if os.path.lexists(socket_path):
+            if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+                raise Exception(f"{socket_path} exists and is not a socket.")
+            os.remove(socket_path)
+        # Only the user running the daemon can connect, from the moment the socket is bound.
+        umask = os.umask(0o177)
+        try:
+            server = ThreadingUnixHTTPServer(socket_path, RequestHandler)
+        finally:
+            os.umask(umask)
+    else:
+        server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.state = state
+    server.token = token
+    return server
+
+
+def create_token(path: str) -> str:
+    """
+    Create a random token and write it to out/daemon.token, readable by the user only.
+
+    :param path: The path of the transaction_signer directory.
+    :return: The token.
+    """
+    token = secrets.token_hex(32)
+    token_path = os.path.join(path, TOKEN_FILE)
+    if os.path.exists(token_path):
+        os.remove(token_path)
+    with os.fdopen(
+        os.open(token_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w"
+    ) as file:
+        file.write(token)
+    return token
+
+
+def serve(
+    state: dict,
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    socket_path: str | None = None,
+):
+    # The TCP port is reachable by every local user and by web pages, the Unix socket is not.
+    token = None if socket_path is not None else create_token(state["path"])
+    server = create_server(state, host, port, socket_path, token)
+    print(f"Daemon listening on {socket_path or f'http://{host}:{port}'}.")
+    if token is not None:
+        print(f"Requests must send the token in {TOKEN_FILE}.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def _validate_fields(request: dict, fields: tuple):
+    for field in fields:
+        if field not in request:
+            raise Exception(f"Request is missing field '{field}'.")
+
+
+def _get_contract(state: dict, request: dict) -> tuple:
+    chain_id = request["chain_id"]
+    w3 = connections.get_w3(
+        state["connections"], state["config_data"]["chains"], chain_id
+    )
+
+    address = Web3.to_checksum_address(request["safe"])
+    key = (chain_id, address)
+    if key not in state["contracts"]:
+        state["contracts"][key] = w3.eth.contract(
+            address=address, abi=state["safe_abi"]
+        )
+    return w3, state["contracts"][key]
+
+
+def _get_safe_state(
+    state: dict, w3: any, safe: any, chain_id: int, nonce: int | None
+) -> dict:
+    # With a given nonce, the owners and threshold of the safe suffice.
+    if nonce is not None:
+        return {**_get_owners_state(state, w3, safe, chain_id), "nonce": nonce}
+    return _read_safe_state(state, w3, safe, chain_id)
+
+
+def _get_owners_state(state: dict, w3: any, safe: any, chain_id: int) -> dict:
+    # The cached owners and threshold are used without RPC calls while they were checked recently.
+    cached = safe_cache.get(state["cache"], chain_id, safe.address)
+    checked = state["checked"].get((chain_id, safe.address))
+    if (
+        cached is not None
+        and checked is not None
+        and time.monotonic() - checked < SAFE_CHECK_INTERVAL
+    ):
+        return cached
+    return _read_safe_state(state, w3, safe, chain_id)
+
+
+def _read_safe_state(state: dict, w3: any, safe: any, chain_id: int) -> dict:
+    # Checks the cached owners and threshold for AddedOwner, RemovedOwner and ChangedThreshold events.
+    safe_state = safe_cache.read_safe_state(w3, safe, state["cache"], chain_id)
+    if safe_state["chain_id"] != chain_id:
+        raise Exception(f"Chain Id is {safe_state['chain_id']}, expected {chain_id}")
+    safe_cache.save(state["path"], state["cache"])
+    state["checked"][(chain_id, safe.address)] = time.monotonic()
+    return safe_state
+
+
+def _get_safe_tx(state: dict, request: dict) -> tuple:
+    _validate_fields(request, TRANSACTION_FIELDS)
+    validate_config.validate_transaction(request["operation"], request["to"])
+    w3, safe = _get_contract(state, request)
+    safe_state = _get_safe_state(
+        state, w3, safe, request["chain_id"], request.get("nonce")
+    )
+
+    typed_data = eip712_typed_data.get_typed_data(
+        safe,
+        request["to"],
+        request["raw_data"],
+        request["operation"],
+        state["constants"],
+        nonce=safe_state["nonce"],
+        chain_id=safe_state["chain_id"],
+    )
+    message_hash = eip712_typed_data.get_typed_data_hash(typed_data)
+    domain_separator = eip712_typed_data.get_domain_separator(
+        request["chain_id"], safe.address, safe_state["domain_separator"]
+    )
+    transaction_hash = eip712_typed_data.get_transaction_hash(
+        domain_separator, message_hash, state["constants"]
+    )
+    return safe, safe_state, transaction_hash
+
+
+def _create_safe_tx(state: dict, request: dict, nonce: int | None = None) -> tuple:
+    relayer = state["relayers"].get(request.get("relayer"))
+    if relayer is None:
+        raise Exception(f"Unknown relayer {request.get('relayer')}.")
+
+    safe, safe_state, transaction_hash = _get_safe_tx(state, request)
+    signers_to_signatures = signatures.get_valid(
+        transaction_hash,
+        signatures.refresh(state["signatures"]).get(transaction_hash, {}),
+        safe_state["owners"],
+    )
+    if len(signers_to_signatures) < safe_state["threshold"]:
+        raise Exception(
+            f"{len(signers_to_signatures)}/{safe_state['threshold']} valid signatures are collected for transaction {transaction_hash}."
+        )
+
+    signers_and_signatures = signatures.select(
+        signers_to_signatures, safe_state["threshold"]
+    )
+    config_data = state["config_data"]
+    w3 = state["connections"][request["chain_id"]]
+    max_fee_per_gas, max_priority_fee_per_gas = fee_oracle.resolve(
+        fee_oracle.get_oracle(
+            state["fee_oracles"], w3, request["chain_id"], background=True
+        ),
+        config_data["max_fee_per_gas"],
+        config_data["max_priority_fee_per_gas"],
+    )
+    unsigned_safe_tx = safe_transaction.create(
+        w3,
+        safe,
+        request["to"],
+        state["constants"],
+        request["raw_data"],
+        request["operation"],
+        signatures.pack(signers_and_signatures),
+        relayer["address"],
+        request.get("gas", config_data["gas"]),
+        max_fee_per_gas,
+        max_priority_fee_per_gas,
+        nonce,
+        state["gas_estimator"],
+        config_data.get("access_list", False),
+        request["chain_id"],
+        len(signers_and_signatures),
+    )
+    return w3, unsigned_safe_tx, relayer
+
+
+def _create_signed_safe_tx(
+    state: dict, request: dict, nonce: int | None = None
+) -> tuple:
+    _get_hot_relayer(state, request)
+    w3, unsigned_safe_tx, relayer = _create_safe_tx(state, request, nonce)
+    signed_tx = safe_transaction.sign(w3, unsigned_safe_tx, relayer)
+    if not signed_tx:
+        raise Exception(f"Relayer {relayer['name']} could not sign the transaction.")
+    return w3, unsigned_safe_tx, signed_tx
+
+
+def _get_hot_relayer(state: dict, request: dict) -> dict:
+    relayer = state["relayers"].get(request.get("relayer"))
+    if relayer is None:
+        raise Exception(f"Unknown relayer {request.get('relayer')}.")
+    # Hardware wallets prompt on the terminal, requests would wait holding the lock.
+    if relayer["wallet"] != "HOT":
+        raise Exception(
+            f"Relayer {relayer['name']} is not a hot wallet, the daemon can't sign with it."
+        )
+    return relayer
+
+
+def _is_hex(value: str) -> bool:
+    try:
+        bytes.fromhex(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _to_json(value: any) -> any:
+    if isinstance(value, bytes):
+        return f"0x{value.hex()}"
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
@@ -1,91 +1,175 @@
 import os
 
-import src.wallets.hot_wallet as hot_wallet
-import src.wallets.ledger_nano as ledger_nano
-import src.wallets.trezor_1 as trezor_1
-import src.wallets.trezor_t as trezor_t
+import src.wallets.registry as registry
 
 from eth_abi import encode
-from eth_utils import keccak
+from eth_utils import keccak, to_canonical_address
 from web3 import Web3
 
+# The ABI encoded SafeTx struct: the type hash followed by 10 words of 32 bytes.
+SAFE_TX_SIZE = 352
+
+# EIP-712 type hashes of the Safe domain (Safe >= 1.3.0) and of a Safe transaction.
+DOMAIN_SEPARATOR_TYPEHASH = keccak(
+    text="EIP712Domain(uint256 chainId,address verifyingContract)"
+)
+SAFE_TX_TYPEHASH = keccak(
+    text="SafeTx(address to,uint256 value,bytes data,uint8 operation,uint256 safeTxGas,uint256 baseGas,uint256 gasPrice,address gasToken,address refundReceiver,uint256 nonce)"
+)
+
 
 def get_typed_data(
-    safe: any, to: str, raw_data: str, operation: int, constants: dict
+    safe: any,
+    to: str,
+    raw_data: str,
+    operation: int,
+    constants: dict,
+    nonce: int | None = None,
+    chain_id: int | None = None,
 ) -> dict:
-    typed_data = {
-        "types": {
-            "EIP712Domain": [
-                {"name": "chainId", "type": "uint256"},
-                {"name": "verifyingContract", "type": "address"},
-            ],
-            "SafeTx": [
-                {"name": "to", "type": "address"},
-                {"name": "value", "type": "uint256"},
-                {"name": "data", "type": "bytes"},
-                {"name": "operation", "type": "uint8"},
-                {"name": "safeTxGas", "type": "uint256"},
-                {"name": "baseGas", "type": "uint256"},
-                {"name": "gasPrice", "type": "uint256"},
-                {"name": "gasToken", "type": "address"},
-                {"name": "refundReceiver", "type": "address"},
-                {"name": "nonce", "type": "uint256"},
-            ],
-        },
-        "primaryType": "SafeTx",
-        "message": {
-            "to": to,
-            "value": constants["VALUE_SAFE_TX"],
-            "data": raw_data,
-            "operation": operation,
-            "safeTxGas": constants["SAFE_TX_GAS"],
-            "baseGas": constants["BASE_GAS"],
-            "gasPrice": constants["GAS_PRICE"],
-            "gasToken": constants["GAS_TOKEN"],
-            "refundReceiver": constants["REFUND_RECEIVER"],
-            "nonce": safe.functions.nonce().call(),
-        },
-        "domain": {
-            "chainId": safe.functions.getChainId().call(),
-            "verifyingContract": safe.address,
-        },
-    }
-    return typed_data
+    # Only read the nonce and chain id from the safe if they are not provided.
+    if nonce is None:
+        nonce = safe.functions.nonce().call()
+    if chain_id is None:
+        chain_id = safe.functions.getChainId().call()
+
+    return _build_typed_data(
+        safe.address, to, raw_data, operation, constants, nonce, chain_id
+    )
 
 
 def get_typed_data_hash(data: dict) -> bytes:
-    return keccak(
+    message = data["message"]
+    buffer = _get_safe_tx_buffer(
+        message["value"],
+        message["safeTxGas"],
+        message["baseGas"],
+        message["gasPrice"],
+        message["gasToken"],
+        message["refundReceiver"],
+    )
+    _pack_safe_tx(
+        buffer,
+        to_canonical_address(message["to"]),
+        keccak(hexstr=message["data"]),
+        message["operation"],
+        message["nonce"],
+    )
+    return keccak(buffer)
+
+
+def get_domain_separator(
+    chain_id: int, safe_address: str, on_chain: bytes | None = None
+) -> bytes:
+    """
+    Compute the EIP-712 domain separator of a Safe locally, without RPC calls.
+
+    :param chain_id: The chain id of the chain the Safe is deployed on.
+    :param safe_address: The address of the Safe.
+    :param on_chain: The domain separator returned by the Safe, to cross-check the computation.
+    :return: The domain separator.
+    """
+    domain_separator = keccak(
         encode(
-            [
-                "bytes32",
-                "address",
-                "uint256",
-                "bytes32",
-                "uint8",
-                "uint256",
-                "uint256",
-                "uint256",
-                "address",
-                "address",
-                "uint256",
-            ],
-            [
-                Web3.to_bytes(
-                    hexstr="0xbb8310d486368db6bd6f849402fdd73ad53d316b5a4b2644ad6efe0f941286d8"
-                ),
-                data["message"]["to"],
-                data["message"]["value"],
-                keccak(hexstr=data["message"]["data"]),
-                data["message"]["operation"],
-                data["message"]["safeTxGas"],
-                data["message"]["baseGas"],
-                data["message"]["gasPrice"],
-                data["message"]["gasToken"],
-                data["message"]["refundReceiver"],
-                data["message"]["nonce"],
-            ],
+            ["bytes32", "uint256", "address"],
+            [DOMAIN_SEPARATOR_TYPEHASH, chain_id, safe_address],
         )
     )
+    if on_chain is not None and on_chain != domain_separator:
+        raise Exception(
+            f"Domain separator of safe {safe_address} on chain {chain_id} is {on_chain.hex()}, expected {domain_separator.hex()}. Only Safes of version 1.3.0 or later are supported."
+        )
+    return domain_separator
+
+
+def get_safe_tx_hash(
+    safe_address: str,
+    chain_id: int,
+    to: str,
+    raw_data: str,
+    operation: int,
+    nonce: int,
+    constants: dict,
+) -> str:
+    """
+    Compute the hash of a Safe transaction locally, without RPC calls.
+
+    :param safe_address: The address of the Safe.
+    :param chain_id: The chain id of the chain the Safe is deployed on.
+    :param to: The address the Safe transaction is sent to.
+    :param raw_data: The calldata of the Safe transaction.
+    :param operation: The operation of the Safe transaction (0: Call, 1: DelegateCall).
+    :param nonce: The nonce of the Safe transaction.
+    :param constants: The parsed data/constants.toml.
+    :return: The transaction hash, as signed by the owners.
+    """
+    safe_tx = {
+        "safe": safe_address,
+        "chain_id": chain_id,
+        "to": to,
+        "raw_data": raw_data,
+        "operation": operation,
+        "nonce": nonce,
+    }
+    return get_safe_tx_hashes([safe_tx], constants)[0]
+
+
+def get_safe_tx_hashes(safe_txs: list, constants: dict) -> list:
+    """
+    Compute the hashes of many Safe transactions locally, without RPC calls.
+
+    All transactions are packed in one preallocated SafeTx buffer, in which only the
+    to, data, operation and nonce words change. Domain separators, addresses and
+    hashes of the data are computed once for transactions sharing them,
+    e.g. over a range of nonces or for the same payload on multiple Safes.
+
+    :param safe_txs: The Safe transactions, dicts with safe, chain_id, to, raw_data, operation and nonce.
+    :param constants: The parsed data/constants.toml.
+    :return: The transaction hashes, in the order of the Safe transactions.
+    """
+    buffer = _get_safe_tx_buffer(
+        constants["VALUE_SAFE_TX"],
+        constants["SAFE_TX_GAS"],
+        constants["BASE_GAS"],
+        constants["GAS_PRICE"],
+        constants["GAS_TOKEN"],
+        constants["REFUND_RECEIVER"],
+    )
+    sign_magic = Web3.to_bytes(hexstr=constants["SIGN_MAGIC"])
+
+    prefixes = {}
+    addresses = {}
+    data_hashes = {}
+    hashes = []
+    for safe_tx in safe_txs:
+        key = (safe_tx["chain_id"], safe_tx["safe"])
+        prefix = prefixes.get(key)
+        if prefix is None:
+            prefix = sign_magic + get_domain_separator(*key)
+            prefixes[key] = prefix
+
+        to = addresses.get(safe_tx["to"])
+        if to is None:
+            to = to_canonical_address(safe_tx["to"])
+            addresses[safe_tx["to"]] = to
+
+        data_hash = data_hashes.get(safe_tx["raw_data"])
+        if data_hash is None:
+            data_hash = keccak(hexstr=safe_tx["raw_data"])
+            data_hashes[safe_tx["raw_data"]] = data_hash
+
+        _pack_safe_tx(buffer, to, data_hash, safe_tx["operation"], safe_tx["nonce"])
+        hashes.append(keccak(prefix + keccak(buffer)).hex())
+    return hashes
+
+
+def get_transaction_hash(
+    domain_hash: bytes, message_hash: bytes, constants: dict
+) -> str:
+    msg_to_sign = (
+        Web3.to_bytes(hexstr=constants["SIGN_MAGIC"]) + domain_hash + message_hash
+    )
+    return keccak(msg_to_sign).hex()
 
 
 def sign(
@@ -97,7 +181,7 @@ def sign(
             print(f"Private key for signer {signer['name']} not found in .env file.")
             # Return False if not successful.
             return False
-        signature = hot_wallet.sign_typed_data(
+        signature = registry.get_wallet("HOT").sign_typed_data(
             key_signer, signer["address"], w3, typed_data
         )
 
@@ -107,18 +191,18 @@ def sign(
         )
         # Sign Message.
         if signer["wallet"] == "T":
-            signature = trezor_t.sign_typed_data(
+            signature = registry.get_wallet("T").sign_typed_data(
                 signer["index"], signer["address"], typed_data
             )
         elif signer["wallet"] == "1":
-            signature = trezor_1.sign_typed_data_hash(
+            signature = registry.get_wallet("1").sign_typed_data_hash(
                 signer["index"],
                 signer["address"],
                 domain_hash,
                 message_hash,
             )
         elif signer["wallet"] == "L":
-            signature = ledger_nano.sign_typed_data_hash(
+            signature = registry.get_wallet("L").sign_typed_data_hash(
                 signer["index"],
                 signer["address"],
                 domain_hash,
@@ -128,3 +212,81 @@ def sign(
             raise Exception("Unknown wallet type.")
 
     return signature
+
+
+def _build_typed_data(
+    safe_address: str,
+    to: str,
+    raw_data: str,
+    operation: int,
+    constants: dict,
+    nonce: int,
+    chain_id: int,
+) -> dict:
+    typed_data = {
+        "types": {
+            "EIP712Domain": [
+                {"name": "chainId", "type": "uint256"},
+                {"name": "verifyingContract", "type": "address"},
+            ],
+            "SafeTx": [
+                {"name": "to", "type": "address"},
+                {"name": "value", "type": "uint256"},
+                {"name": "data", "type": "bytes"},
+                {"name": "operation", "type": "uint8"},
+                {"name": "safeTxGas", "type": "uint256"},
+                {"name": "baseGas", "type": "uint256"},
+                {"name": "gasPrice", "type": "uint256"},
+                {"name": "gasToken", "type": "address"},
+                {"name": "refundReceiver", "type": "address"},
+                {"name": "nonce", "type": "uint256"},
+            ],
+        },
+        "primaryType": "SafeTx",
+        "message": {
+            "to": to,
+            "value": constants["VALUE_SAFE_TX"],
+            "data": raw_data,
+            "operation": operation,
+            "safeTxGas": constants["SAFE_TX_GAS"],
+            "baseGas": constants["BASE_GAS"],
+            "gasPrice": constants["GAS_PRICE"],
+            "gasToken": constants["GAS_TOKEN"],
+            "refundReceiver": constants["REFUND_RECEIVER"],
+            "nonce": nonce,
+        },
+        "domain": {
+            "chainId": chain_id,
+            "verifyingContract": safe_address,
+        },
+    }
+    return typed_data
+
+
+def _get_safe_tx_buffer(
+    value: int,
+    safe_tx_gas: int,
+    base_gas: int,
+    gas_price: int,
+    gas_token: str,
+    refund_receiver: str,
+) -> bytearray:
+    # Words that are the same for all Safe transactions, addresses are right aligned.
+    buffer = bytearray(SAFE_TX_SIZE)
+    buffer[0:32] = SAFE_TX_TYPEHASH
+    buffer[64:96] = value.to_bytes(32, "big")
+    buffer[160:192] = safe_tx_gas.to_bytes(32, "big")
+    buffer[192:224] = base_gas.to_bytes(32, "big")
+    buffer[224:256] = gas_price.to_bytes(32, "big")
+    buffer[268:288] = to_canonical_address(gas_token)
+    buffer[300:320] = to_canonical_address(refund_receiver)
+    return buffer
+
+
+def _pack_safe_tx(
+    buffer: bytearray, to: bytes, data_hash: bytes, operation: int, nonce: int
+):
+    buffer[44:64] = to
+    buffer[96:128] = data_hash
+    buffer[128:160] = operation.to_bytes(32, "big")
+    buffer[320:352] = nonce.to_bytes(32, "big")
@@ -0,0 +1,340 @@
+import src.eip712_typed_data as eip712_typed_data
+import src.fee_oracle as fee_oracle
+import src.gas_estimator as gas_estimator
+import src.receipt_tracker as receipt_tracker
+import src.safe_reader as safe_reader
+import src.safe_transaction as safe_transaction
+import src.utils.connections as connections
+import src.utils.nonces as nonces
+import src.utils.signatures as signatures
+import src.utils.validate_signer as validate_signer
+
+from eth_utils import keccak
+from web3 import Web3
+
+
+def run(
+    path: str,
+    config_data: dict,
+    constants: dict,
+    safe_abi: list,
+    relayer_addresses: list | None = None,
+) -> list:
+    """
+    Execute all Safe transactions of the signature store that reached their threshold.
+
+    Transactions of a Safe form a lane, ordered by Safe nonce from the current nonce on,
+    lanes are assigned round-robin to the relayers. A relayer sends the transactions of
+    its lanes with sequential nonces, so they are mined in Safe nonce order, and all
+    transactions are sent at once. With gas set to zero, the later transactions of a lane
+    are estimated with the Safe nonce overridden to theirs.
+
+    :param path: The path of the transaction_signer directory.
+    :param config_data: The parsed config_transaction_signer.toml.
+    :param constants: The parsed data/constants.toml.
+    :param safe_abi: The ABI of the Safe contract.
+    :param relayer_addresses: The relayers to execute with, default all hot wallet relayers.
+    :return: One result dict per sent transaction.
+    """
+    relayers = get_relayers(config_data["relayers"], relayer_addresses)
+    store = signatures.open_store(path)
+
+    transactions_by_chain = {}
+    for transaction_hash, transaction in store["transactions"].items():
+        transactions_by_chain.setdefault(transaction["chain_id"], {})[
+            transaction_hash
+        ] = transaction
+
+    state = {
+        "connections": {},
+        "fee_oracles": {},
+        "nonces": nonces.create_manager(),
+        "estimator": gas_estimator.create_estimator(),
+    }
+    results = []
+    for chain_id, transactions in sorted(transactions_by_chain.items()):
+        try:
+            w3 = connections.get_w3(
+                state["connections"], config_data["chains"], chain_id
+            )
+        except Exception as e:
+            print(f"Skipping the transactions on chain {chain_id} ({e}).")
+            continue
+
+        lanes = get_lanes(w3, store, transactions, constants, safe_abi)
+        for i, lane in enumerate(lanes):
+            lane["relayer"] = relayers[i % len(relayers)]
+        results.extend(
+            _execute_lanes(w3, chain_id, lanes, config_data, constants, state)
+        )
+    return results
+
+
+def get_relayers(relayers: list, relayer_addresses: list | None = None) -> list:
+    """
+    Get the pool of relayers to execute with.
+
+    Only hot wallets can sign without user interaction.
+
+    :param relayers: The relayers of the config.
+    :param relayer_addresses: The addresses of the relayers to use, default all.
+    :return: The relayers.
+    """
+    if relayer_addresses is not None:
+        addresses = {address.lower() for address in relayer_addresses}
+        relayers = [r for r in relayers if r["address"].lower() in addresses]
+    pool = [relayer for relayer in relayers if relayer["wallet"] == "HOT"]
+    if not pool:
+        raise Exception("No hot wallet relayers are configured to execute with.")
+    return pool
+
+
+def get_lanes(
+    w3: any, store: dict, transactions: dict, constants: dict, safe_abi: list
+) -> list:
+    """
+    Get the executable Safe transactions of one chain, one lane per Safe.
+
+    A lane starts at the current Safe nonce, and ends before the first nonce without a
+    transaction that reached the threshold with valid signatures.
+
+    :param w3: The Web3 object.
+    :param store: The signature store.
+    :param transactions: Dict mapping transaction hashes to their recorded transaction, on this chain.
+    :param constants: The parsed data/constants.toml.
+    :param safe_abi: The ABI of the Safe contract.
+    :return: The lanes, dicts with the Safe state and the executable transactions in nonce order.
+    """
+    by_safe = {}
+    for transaction_hash, transaction in transactions.items():
+        address = Web3.to_checksum_address(transaction["safe"])
+        by_safe.setdefault(address, {}).setdefault(transaction["nonce"], []).append(
+            (transaction_hash, transaction)
+        )
+
+    contracts = [w3.eth.contract(address=a, abi=safe_abi) for a in sorted(by_safe)]
+    safes_state = safe_reader.read_safes_state(w3, contracts)
+
+    lanes = []
+    for contract in contracts:
+        safe_state = safes_state[contract.address]
+        if safe_state is None:
+            continue
+        owners = validate_signer.get_owners(safe_state["owners"])
+
+        lane = []
+        nonce = safe_state["nonce"]
+        while nonce in by_safe[contract.address]:
+            executable = [
+                entry
+                for entry in (
+                    _get_executable(store, safe_state, owners, constants, c)
+                    for c in by_safe[contract.address][nonce]
+                )
+                if entry is not None
+            ]
+            if len(executable) != 1:
+                if executable:
+                    print(
+                        f"Safe {contract.address} has {len(executable)} executable transactions with nonce {nonce}, none is executed."
+                    )
+                break
+            lane.append(executable[0])
+            nonce += 1
+
+        if lane:
+            lanes.append({"safe": contract, "state": safe_state, "transactions": lane})
+    return lanes
+
+
+def _get_executable(
+    store: dict,
+    safe_state: dict,
+    owners: set,
+    constants: dict,
+    candidate: tuple,
+) -> dict | None:
+    transaction_hash, transaction = candidate
+    # The record must match the hash the signatures are for.
+    (computed,) = eip712_typed_data.get_safe_tx_hashes(
+        [{**transaction, "safe": Web3.to_checksum_address(transaction["safe"])}],
+        constants,
+    )
+    if computed != transaction_hash:
+        print(f"Transaction {transaction_hash} does not match its record, skipping.")
+        return None
+
+    signers_to_signatures = {
+        signer: signature
+        for signer, signature in store["signatures"].get(transaction_hash, {}).items()
+        if signature != "" and signer.lower() in owners
+    }
+    if len(signers_to_signatures) < safe_state["threshold"]:
+        return None
+    signers_to_signatures = signatures.get_valid(
+        transaction_hash, signers_to_signatures
+    )
+    if len(signers_to_signatures) < safe_state["threshold"]:
+        return None
+
+    signers_and_signatures = signatures.select(
+        signers_to_signatures, safe_state["threshold"]
+    )
+    return {
+        **transaction,
+        "transaction_hash": transaction_hash,
+        "signatures": signatures.pack(signers_and_signatures),
+        "signer_count": len(signers_and_signatures),
+    }
+
+
+def _execute_lanes(
+    w3: any,
+    chain_id: int,
+    lanes: list,
+    config_data: dict,
+    constants: dict,
+    state: dict,
+) -> list:
+    results = []
+    sent = []
+    for lane in lanes:
+        for i, transaction in enumerate(lane["transactions"]):
+            # The signatures of later transactions are only valid once their predecessor is
+            # executed, they are estimated as if the Safe nonce was already theirs.
+            state_override = None
+            if i > 0:
+                state_override = gas_estimator.get_nonce_override(
+                    lane["safe"].address, transaction["nonce"]
+                )
+            result = _send(
+                w3,
+                chain_id,
+                lane,
+                transaction,
+                state_override,
+                config_data,
+                constants,
+                state,
+            )
+            results.append(result)
+            if "tx_hash" not in result:
+                # Later transactions of the safe would revert.
+                # E.g. the nonce was too low, because the relayer sent a transaction elsewhere.
+                dropped = _reconcile(w3, chain_id, {result["relayer"]}, sent, state)
+                sent = [(i, r) for i, r in sent if r["tx_hash"] not in dropped]
+                break
+            sent.append((lane, result))
+
+    # Track the receipts concurrently, replacing stuck transactions.
+    tracked = receipt_tracker.track(
+        w3,
+        [
+            receipt_tracker.create_entry(
+                result["tx_hash"],
+                result["unsigned_safe_tx"],
+                lane["relayer"],
+                result["transaction_hash"],
+            )
+            for lane, result in sent
+        ],
+    )
+    for (_, result), outcome in zip(sent, tracked):
+        if outcome["tx_hash"] != result["tx_hash"]:
+            nonces.mark_sent(
+                state["nonces"],
+                chain_id,
+                result["relayer"],
+                result["unsigned_safe_tx"]["nonce"],
+                outcome["tx_hash"],
+            )
+        result["tx_hash"] = outcome["tx_hash"]
+        result["status"] = outcome["status"]
+        if not receipt_tracker.is_executed(outcome):
+            print(
+                f"Safe {result['safe']}, nonce {result['nonce']}: not executed in {result['tx_hash']}."
+            )
+    _reconcile(w3, chain_id, {result["relayer"] for _, result in sent}, sent, state)
+    return results
+
+
+def _reconcile(w3: any, chain_id: int, relayers: set, sent: list, state: dict) -> set:
+    # Forgets mined transactions, the relayer nonces of dropped transactions are handed out again.
+    dropped = set()
+    for relayer in sorted(relayers):
+        dropped.update(
+            nonces.try_reconcile(state["nonces"], w3, chain_id, relayer).values()
+        )
+    for _, result in sent:
+        if result["tx_hash"] in dropped:
+            result["status"] = None
+    return dropped
+
+
+def _send(
+    w3: any,
+    chain_id: int,
+    lane: dict,
+    transaction: dict,
+    state_override: dict | None,
+    config_data: dict,
+    constants: dict,
+    state: dict,
+) -> dict:
+    safe = lane["safe"]
+    relayer = lane["relayer"]
+    result = {
+        "chain_id": chain_id,
+        "safe": safe.address,
+        "nonce": transaction["nonce"],
+        "transaction_hash": transaction["transaction_hash"],
+        "relayer": relayer["address"],
+    }
+
+    relayer_nonce = nonces.get_nonce(state["nonces"], w3, chain_id, relayer["address"])
+    try:
+        max_fee_per_gas, max_priority_fee_per_gas = fee_oracle.resolve(
+            fee_oracle.get_oracle(state["fee_oracles"], w3, chain_id),
+            config_data["max_fee_per_gas"],
+            config_data["max_priority_fee_per_gas"],
+        )
+        unsigned_safe_tx = safe_transaction.create(
+            w3,
+            safe,
+            transaction["to"],
+            constants,
+            transaction["raw_data"],
+            transaction["operation"],
+            transaction["signatures"],
+            relayer["address"],
+            config_data["gas"],
+            max_fee_per_gas,
+            max_priority_fee_per_gas,
+            relayer_nonce,
+            state["estimator"],
+            config_data.get("access_list", False),
+            chain_id,
+            transaction["signer_count"],
+            state_override,
+        )
+        signed_tx = safe_transaction.sign(w3, unsigned_safe_tx, relayer)
+        if not signed_tx:
+            raise Exception(
+                f"Relayer {relayer['name']} could not sign the transaction."
+            )
+        w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+    except Exception as e:
+        nonces.release(state["nonces"], chain_id, relayer["address"], relayer_nonce)
+        print(f"Safe {safe.address}, nonce {transaction['nonce']}: not executed ({e}).")
+        return result
+
+    tx_hash = f"0x{keccak(signed_tx.raw_transaction).hex()}"
+    nonces.mark_sent(
+        state["nonces"], chain_id, relayer["address"], relayer_nonce, tx_hash
+    )
+    print(
+        f"Safe {safe.address}, nonce {transaction['nonce']}: sent by {relayer['name']} in {tx_hash}"
+    )
+    result["tx_hash"] = tx_hash
+    result["unsigned_safe_tx"] = unsigned_safe_tx
+    return result
@@ -0,0 +1,171 @@
+import threading
+import time
+
+# Number of recent blocks sampled with eth_feeHistory.
+FEE_HISTORY_BLOCKS = 10
+# Percentile of the priority fees paid in the sampled blocks, used as priority fee.
+PRIORITY_FEE_PERCENTILE = 50
+# The base fee rises at most 12.5% per block, twice the predicted base fee covers 5 full blocks.
+BASE_FEE_MULTIPLIER = 2
+# Seconds a fee estimate is reused, about one block.
+TTL = 12
+# Number of TTLs a stale estimate is still returned while it is refreshed in the background.
+MAX_STALE_TTLS = 3
+
+
+def get_oracle(oracles: dict, w3: any, chain_id: int, background: bool = False) -> dict:
+    """
+    Get the fee oracle of a chain, creating it on first use.
+
+    :param oracles: Dict mapping chain ids to their fee oracle, updated in place.
+    :param w3: The Web3 object.
+    :param chain_id: The chain id of the chain.
+    :param background: Keep the fees fresh in a background thread, once they are used.
+    :return: The fee oracle.
+    """
+    if chain_id not in oracles:
+        oracles[chain_id] = create_oracle(w3, background=background)
+    return oracles[chain_id]
+
+
+def create_oracle(w3: any, ttl: float = TTL, background: bool = False) -> dict:
+    """
+    Create a fee oracle, estimating fees from the recent blocks of a chain.
+
+    :param w3: The Web3 object.
+    :param ttl: Seconds a fee estimate is reused.
+    :param background: Keep the fees fresh in a background thread, once they are used.
+    :return: The fee oracle.
+    """
+    return {
+        "w3": w3,
+        "ttl": ttl,
+        "background": background,
+        "fees": None,
+        "updated": 0.0,
+        "lock": threading.Lock(),
+        "refreshing": False,
+        "started": False,
+        "stop": threading.Event(),
+    }
+
+
+def get_fees(oracle: dict) -> dict:
+    """
+    Get the estimated fees of the next block.
+
+    Fresh estimates are returned without RPC calls. Stale estimates are returned while they
+    are refreshed in the background, up to MAX_STALE_TTLS old. The first estimate and older
+    ones (e.g. after a pause for a hardware wallet) are fetched synchronously.
+
+    :param oracle: The fee oracle.
+    :return: Dict with the predicted base fee, the priority fee and the max fee per gas.
+    """
+    with oracle["lock"]:
+        first = oracle["fees"] is None
+        age = time.monotonic() - oracle["updated"]
+        fees = None if age >= MAX_STALE_TTLS * oracle["ttl"] else oracle["fees"]
+        if fees is not None and age >= oracle["ttl"] and not oracle["refreshing"]:
+            oracle["refreshing"] = True
+            threading.Thread(target=_refresh, args=(oracle,), daemon=True).start()
+
+    if fees is None:
+        fees = refresh(oracle)
+    if first:
+        with oracle["lock"]:
+            begin = oracle["background"] and not oracle["started"]
+            oracle["started"] = True
+        if begin:
+            start(oracle)
+    return fees
+
+
+def refresh(oracle: dict) -> dict:
+    """
+    Fetch the fee history of the chain and update the estimated fees.
+
+    :param oracle: The fee oracle.
+    :return: The estimated fees.
+    """
+    history = oracle["w3"].eth.fee_history(
+        FEE_HISTORY_BLOCKS, "latest", [PRIORITY_FEE_PERCENTILE]
+    )
+    fees = estimate_fees(history)
+    with oracle["lock"]:
+        oracle["fees"] = fees
+        oracle["updated"] = time.monotonic()
+    return fees
+
+
+def start(oracle: dict):
+    """
+    Refresh the fees of an oracle every TTL in a background thread, until stop is called.
+
+    :param oracle: The fee oracle.
+    """
+
+    def run():
+        while not oracle["stop"].wait(oracle["ttl"]):
+            try:
+                refresh(oracle)
+            except Exception as e:
+                print(f"Could not refresh the fees ({e}).")
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def stop(oracle: dict):
+    oracle["stop"].set()
+
+
+def estimate_fees(history: dict) -> dict:
+    """
+    Estimate the fees of the next block from the result of eth_feeHistory.
+
+    :param history: The fee history, with one more base fee than sampled blocks,
+        the last being the base fee of the next block.
+    :return: Dict with the predicted base fee, the priority fee and the max fee per gas.
+    """
+    base_fee = int(history["baseFeePerGas"][-1])
+    # Empty blocks report a reward of zero, they say nothing about the priority fee.
+    rewards = sorted(
+        int(reward[0]) for reward in history.get("reward") or [] if int(reward[0]) > 0
+    )
+    priority_fee = rewards[len(rewards) // 2] if rewards else 0
+    return {
+        "base_fee": base_fee,
+        "max_priority_fee_per_gas": priority_fee,
+        "max_fee_per_gas": BASE_FEE_MULTIPLIER * base_fee + priority_fee,
+    }
+
+
+def resolve(oracle: dict, max_fee_per_gas: int, max_priority_fee_per_gas: int) -> tuple:
+    """
+    Fill in the fees that are set to zero in the config with the estimates of the oracle.
+
+    :param oracle: The fee oracle.
+    :param max_fee_per_gas: The configured max fee per gas, zero to estimate it.
+    :param max_priority_fee_per_gas: The configured priority fee per gas, zero to estimate it.
+    :return: The max fee per gas and the priority fee per gas, at most the max fee.
+    """
+    if max_fee_per_gas == 0 or max_priority_fee_per_gas == 0:
+        fees = get_fees(oracle)
+        if max_priority_fee_per_gas == 0:
+            max_priority_fee_per_gas = fees["max_priority_fee_per_gas"]
+        if max_fee_per_gas == 0:
+            max_fee_per_gas = (
+                BASE_FEE_MULTIPLIER * fees["base_fee"] + max_priority_fee_per_gas
+            )
+
+    # Nodes reject transactions with a priority fee above the max fee.
+    return max_fee_per_gas, min(max_priority_fee_per_gas, max_fee_per_gas)
+
+
+def _refresh(oracle: dict):
+    try:
+        refresh(oracle)
+    except Exception as e:
+        print(f"Could not refresh the fees ({e}).")
+    finally:
+        with oracle["lock"]:
+            oracle["refreshing"] = False
@@ -0,0 +1,263 @@
+import threading
+
+from eth_abi import encode
+from eth_utils import keccak, to_bytes
+from hexbytes import HexBytes
+from web3 import Web3
+
+# Margin on top of the estimate, also the floor of the measured margin: an estimate that is
+# unchanged between blocks does not mean the gas used can't rise above it.
+DEFAULT_MARGIN = 1.2
+# Upper bound of the measured margin.
+MAX_MARGIN = 1.5
+# The margin covers this multiple of the largest measured rise of an estimate between blocks.
+DRIFT_FACTOR = 2
+# Storage slot of the nonce of a Safe.
+SAFE_NONCE_SLOT = 5
+
+
+def create_estimator() -> dict:
+    """
+    Create a gas estimator, caching estimates of Safe transactions per block.
+
+    :return: The gas estimator.
+    """
+    return {
+        "estimates": {},
+        "latest": {},
+        "access_lists": {},
+        "drift": None,
+        "lock": threading.Lock(),
+    }
+
+
+def get_payload_hash(to: str, operation: int, raw_data: str) -> bytes:
+    """
+    Get the hash of the content of a Safe transaction, independent of its signatures.
+
+    :param to: The target address of the Safe transaction.
+    :param operation: The operation of the Safe transaction.
+    :param raw_data: The calldata of the Safe transaction.
+    :return: The payload hash.
+    """
+    return keccak(
+        encode(
+            ["address", "uint8", "bytes"], [to, operation, to_bytes(hexstr=raw_data)]
+        )
+    )
+
+
+def get_nonce_override(safe: str, nonce: int) -> dict:
+    """
+    Get the state override of eth_estimateGas setting the nonce of a Safe.
+
+    Signatures are only valid for the current Safe nonce, with the override a Safe
+    transaction can be estimated before its predecessors are executed.
+
+    :param safe: The address of the Safe.
+    :param nonce: The nonce of the Safe transaction.
+    :return: The state override.
+    """
+    return {safe: {"stateDiff": {f"0x{SAFE_NONCE_SLOT:064x}": f"0x{nonce:064x}"}}}
+
+
+def estimate(
+    estimator: dict,
+    w3: any,
+    unsigned_safe_tx: dict,
+    safe: str,
+    payload_hash: bytes,
+    signature_count: int,
+    state_override: dict | None = None,
+) -> int:
+    """
+    Estimate the gas limit of an execTransaction transaction, with a measured safety margin.
+
+    Estimates are cached by chain, Safe, payload hash, number of signatures, access list and block,
+    so re-building the same transaction (e.g. unsigned, then signed) reuses the estimate.
+    Re-estimates of the same transaction in later blocks measure how much estimates drift,
+    the margin covers twice the largest measured rise, and at least DEFAULT_MARGIN.
+
+    :param estimator: The gas estimator.
+    :param w3: The Web3 object.
+    :param unsigned_safe_tx: The unsigned execTransaction transaction.
+    :param safe: The address of the Safe.
+    :param payload_hash: The payload hash, see get_payload_hash.
+    :param signature_count: The number of signers of the transaction.
+    :param state_override: The state override of eth_estimateGas, see get_nonce_override.
+    :return: The gas limit.
+    """
+    block = w3.eth.block_number
+    return _estimate(
+        estimator,
+        w3,
+        unsigned_safe_tx,
+        _get_transaction_key(unsigned_safe_tx, safe, payload_hash, signature_count),
+        block,
+        state_override=state_override,
+    )
+
+
+def estimate_with_access_list(
+    estimator: dict,
+    w3: any,
+    unsigned_safe_tx: dict,
+    safe: str,
+    payload_hash: bytes,
+    signature_count: int,
+    relayer: str,
+) -> tuple:
+    """
+    Add the access list of eth_createAccessList to a transaction if it lowers the gas usage, and estimate its gas limit.
+
+    The decision to keep or drop the access list is cached by chain, Safe, payload hash, number of signatures and block,
+    like estimates, and the estimate that decided it is reused as the estimate of the transaction.
+
+    :param estimator: The gas estimator.
+    :param w3: The Web3 object.
+    :param unsigned_safe_tx: The unsigned execTransaction transaction, without an access list.
+    :param safe: The address of the Safe.
+    :param payload_hash: The payload hash, see get_payload_hash.
+    :param signature_count: The number of signers of the transaction.
+    :param relayer: The address of the relayer.
+    :return: The transaction, with an access list if it saves gas, and its gas limit.
+    """
+    block = w3.eth.block_number
+    key = (
+        unsigned_safe_tx["chainId"],
+        safe.lower(),
+        payload_hash,
+        signature_count,
+        block,
+    )
+    with estimator["lock"]:
+        decision = estimator["access_lists"].get(key)
+    if decision is None:
+        decision = create_access_list(w3, unsigned_safe_tx, relayer, block)
+        with estimator["lock"]:
+            # Decisions of older blocks are not used again.
+            estimator["access_lists"] = {
+                k: v for k, v in estimator["access_lists"].items() if k[-1] == block
+            }
+            estimator["access_lists"][key] = decision
+
+    access_list, estimated = decision
+    if access_list is not None:
+        unsigned_safe_tx = {**unsigned_safe_tx, "accessList": access_list}
+    gas = _estimate(
+        estimator,
+        w3,
+        unsigned_safe_tx,
+        _get_transaction_key(unsigned_safe_tx, safe, payload_hash, signature_count),
+        block,
+        estimated,
+    )
+    return unsigned_safe_tx, gas
+
+
+def create_access_list(
+    w3: any, unsigned_safe_tx: dict, relayer: str, block: str | int = "latest"
+) -> tuple:
+    """
+    Create the access list of a transaction with eth_createAccessList, if it lowers the gas usage.
+
+    :param w3: The Web3 object.
+    :param unsigned_safe_tx: The unsigned transaction.
+    :param relayer: The address of the relayer.
+    :param block: The block at which the access list is created and the gas estimated.
+    :return: The access list, None if it does not save gas, and the gas estimate of the
+        transaction with or without it, None if no access list could be created.
+    """
+    transaction = {
+        key: value
+        for key, value in unsigned_safe_tx.items()
+        if key not in ("gas", "maxFeePerGas", "maxPriorityFeePerGas", "accessList")
+    }
+    transaction["from"] = relayer
+    try:
+        response = w3.eth.create_access_list(transaction, block)
+        if not response["accessList"]:
+            return None, None
+        access_list = [
+            {
+                "address": Web3.to_checksum_address(entry["address"]),
+                "storageKeys": [
+                    f"0x{bytes(HexBytes(key)).hex()}" for key in entry["storageKeys"]
+                ],
+            }
+            for entry in response["accessList"]
+        ]
+        # Compare estimates of both, gasUsed of eth_createAccessList is no gas limit.
+        gas_with_access_list = int(
+            w3.eth.estimate_gas({**transaction, "accessList": access_list}, block)
+        )
+        gas_without_access_list = int(w3.eth.estimate_gas(transaction, block))
+    except Exception as e:
+        # Not all RPC providers support eth_createAccessList.
+        print(f"Could not create an access list ({e}).")
+        return None, None
+
+    # Warming a slot in the list costs more than a cold access if it is only touched once.
+    if gas_with_access_list >= gas_without_access_list:
+        return None, gas_without_access_list
+    return access_list, gas_with_access_list
+
+
+def _get_transaction_key(
+    unsigned_safe_tx: dict, safe: str, payload_hash: bytes, signature_count: int
+) -> tuple:
+    return (
+        unsigned_safe_tx["chainId"],
+        safe.lower(),
+        payload_hash,
+        signature_count,
+        # An access list changes the gas usage.
+        bool(unsigned_safe_tx.get("accessList")),
+    )
+
+
+def _estimate(
+    estimator: dict,
+    w3: any,
+    unsigned_safe_tx: dict,
+    transaction_key: tuple,
+    block: int,
+    estimated: int | None = None,
+    state_override: dict | None = None,
+) -> int:
+    # An estimate already made in this block is recorded instead of estimating again.
+    key = (*transaction_key, block)
+
+    with estimator["lock"]:
+        cached = estimator["estimates"].get(key)
+    if cached is not None:
+        estimated = cached
+    else:
+        if estimated is None:
+            estimated = int(
+                w3.eth.estimate_gas(unsigned_safe_tx, block, state_override)
+            )
+        with estimator["lock"]:
+            estimator["estimates"][key] = estimated
+            previous = estimator["latest"].get(transaction_key)
+            if previous is not None and previous[0] < block:
+                drift = max(estimated / previous[1] - 1, 0)
+                estimator["drift"] = max(estimator["drift"] or 0, drift)
+            # Estimates of older blocks are not used again.
+            if previous is not None and previous[0] != block:
+                estimator["estimates"].pop((*transaction_key, previous[0]), None)
+            estimator["latest"][transaction_key] = (block, estimated)
+
+    return int(estimated * get_margin(estimator))
+
+
+def get_margin(estimator: dict) -> float:
+    """
+    Get the safety margin on top of gas estimates.
+
+    :param estimator: The gas estimator.
+    :return: The margin, DEFAULT_MARGIN until the drift of estimates is measured.
+    """
+    if estimator["drift"] is None:
+        return DEFAULT_MARGIN
+    return min(max(1 + DRIFT_FACTOR * estimator["drift"], DEFAULT_MARGIN), MAX_MARGIN)
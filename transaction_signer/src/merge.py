@@ -0,0 +1,157 @@
+import src.eip712_typed_data as eip712_typed_data
+import src.utils.signatures as signatures
+
+from web3 import Web3
+
+
+# Fields of a transaction record, from which its hash is computed.
+RECORD_FIELDS = ("chain_id", "safe", "nonce", "to", "operation", "raw_data")
+
+
+def run(path: str, file_paths: list, constants: dict, verify: bool = True) -> dict:
+    """
+    Merge signature files of other signers into the signature store.
+
+    Files are streamed entry by entry, only new signatures are kept in memory.
+    A signer with different signatures for the same transaction hash is a conflict,
+    the signature that recovers to the signer wins, a local signature is kept if valid.
+    Transaction records are only merged if they hash to their transaction hash.
+
+    :param path: The path of the transaction_signer directory.
+    :param file_paths: The signature files to merge, signature stores (.jsonl) or legacy signatures.txt files.
+    :param constants: The parsed data/constants.toml.
+    :param verify: Only merge signatures that recover to their signer.
+    :return: The number of added signatures and of conflicting and invalid signatures.
+    """
+    store = signatures.open_store(path)
+
+    # Distinct new signatures per transaction hash and signer, in the order they are read.
+    candidates = {}
+    transactions = {}
+    for file_path in file_paths:
+        for entry in signatures.read_entries(file_path):
+            transaction_hash = entry.pop("transaction_hash").removeprefix("0x").lower()
+            if "signer" not in entry:
+                transactions.setdefault(transaction_hash, entry)
+                continue
+
+            signer = Web3.to_checksum_address(entry["signer"])
+            signature = entry["signature"].removeprefix("0x").lower()
+            local = store["signatures"].get(transaction_hash, {}).get(signer)
+            if signature == local:
+                continue
+            signer_candidates = candidates.setdefault(transaction_hash, {}).setdefault(
+                signer, []
+            )
+            if signature not in signer_candidates:
+                signer_candidates.append(signature)
+
+    result = {"added": 0, "conflicts": 0, "invalid": 0}
+    new_signatures = {}
+    for transaction_hash, signers_to_candidates in candidates.items():
+        if verify:
+            valid = _verify_candidates(transaction_hash, signers_to_candidates)
+            result["invalid"] += sum(
+                len(signer_candidates) - len(valid.get(signer, []))
+                for signer, signer_candidates in signers_to_candidates.items()
+            )
+        else:
+            valid = signers_to_candidates
+
+        for signer, signer_candidates in valid.items():
+            if not signer_candidates:
+                continue
+            local = store["signatures"].get(transaction_hash, {}).get(signer)
+            if local or len(signer_candidates) > 1:
+                result["conflicts"] += 1
+                # A local signature is kept if it is valid.
+                if local and (
+                    not verify
+                    or not signatures.verify(transaction_hash, {signer: local})
+                ):
+                    print(
+                        f"Conflicting signatures of {signer} for transaction {transaction_hash}, the local signature is kept."
+                    )
+                    continue
+                print(
+                    f"Conflicting signatures of {signer} for transaction {transaction_hash}, {signer_candidates[0]} is kept."
+                )
+            new_signatures.setdefault(transaction_hash, {})[signer] = signer_candidates[
+                0
+            ]
+            result["added"] += 1
+
+    # Only record transactions of which signatures are known.
+    transactions = _verify_records(
+        {
+            transaction_hash: transaction
+            for transaction_hash, transaction in transactions.items()
+            if transaction_hash in new_signatures
+            or transaction_hash in store["signatures"]
+        },
+        constants,
+    )
+    signatures.add_all(store, new_signatures, transactions)
+    print(
+        f"{result['added']} signatures are merged, {result['conflicts']} conflicts, {result['invalid']} invalid signatures are left out."
+    )
+    return result
+
+
+def _verify_candidates(transaction_hash: str, signers_to_candidates: dict) -> dict:
+    # Signers rarely have more than one candidate, so the first round verifies
+    # almost all signatures of the transaction at once.
+    valid = {}
+    rounds = max(len(c) for c in signers_to_candidates.values())
+    for i in range(rounds):
+        signers_to_signatures = {
+            signer: signer_candidates[i]
+            for signer, signer_candidates in signers_to_candidates.items()
+            if len(signer_candidates) > i
+        }
+        invalid = signatures.verify(transaction_hash, signers_to_signatures)
+        for signer, signature in signers_to_signatures.items():
+            if signer in invalid:
+                print(
+                    f"Signature of {signer} for transaction {transaction_hash} is invalid ({invalid[signer]}), it is left out."
+                )
+            else:
+                valid.setdefault(signer, []).append(signature)
+    return valid
+
+
+def _verify_records(transactions: dict, constants: dict) -> dict:
+    # Compaction trusts the safe and nonce of a record, the record must match the hash the signatures are for.
+    transactions = {
+        transaction_hash: transaction
+        for transaction_hash, transaction in transactions.items()
+        if all(field in transaction for field in RECORD_FIELDS)
+        and Web3.is_address(transaction["safe"])
+    }
+    safe_txs = [
+        {**transaction, "safe": Web3.to_checksum_address(transaction["safe"])}
+        for transaction in transactions.values()
+    ]
+    try:
+        hashes = eip712_typed_data.get_safe_tx_hashes(safe_txs, constants)
+    except Exception:
+        # A malformed record fails the whole batch, hash the records one by one.
+        hashes = [_get_hash(safe_tx, constants) for safe_tx in safe_txs]
+
+    verified = {}
+    for (transaction_hash, transaction), computed in zip(transactions.items(), hashes):
+        if computed == transaction_hash:
+            verified[transaction_hash] = transaction
+        else:
+            print(
+                f"Transaction {transaction_hash} does not match its record, the record is left out."
+            )
+    return verified
+
+
+def _get_hash(safe_tx: dict, constants: dict) -> str | None:
+    try:
+        (transaction_hash,) = eip712_typed_data.get_safe_tx_hashes([safe_tx], constants)
+    except Exception:
+        return None
+    return transaction_hash
@@ -0,0 +1,74 @@
+from eth_abi import decode, encode
+from eth_utils import (
+    function_abi_to_4byte_selector,
+    get_abi_input_types,
+    get_abi_output_types,
+    to_checksum_address,
+)
+
+# Multicall3, deployed at the same address on all chains.
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+# aggregate3((address,bool,bytes)[])
+AGGREGATE3_SELECTOR = bytes.fromhex("82ad56cb")
+
+
+def aggregate(w3: any, calls: list, block_identifier: str | int = "latest") -> list:
+    """
+    Execute multiple contract calls in a single eth_call via Multicall3.
+
+    :param w3: The Web3 object.
+    :param calls: List of contract functions (not yet called), e.g. safe.functions.nonce().
+    :param block_identifier: The block at which the calls are executed.
+    :return: The decoded result of each call, None for calls that reverted.
+    """
+    if not calls:
+        return []
+
+    call_data = AGGREGATE3_SELECTOR + encode(
+        ["(address,bool,bytes)[]"],
+        [[(call.address, True, _encode_call(call)) for call in calls]],
+    )
+    return_data = w3.eth.call(
+        {"to": MULTICALL3_ADDRESS, "data": call_data}, block_identifier
+    )
+    (results,) = decode(["(bool,bytes)[]"], return_data)
+
+    if len(results) != len(calls):
+        raise Exception(
+            f"Multicall returned {len(results)} results, expected {len(calls)}."
+        )
+
+    return [
+        _decode_result(call, data) if success else None
+        for call, (success, data) in zip(calls, results)
+    ]
+
+
+def _encode_call(call: any) -> bytes:
+    return function_abi_to_4byte_selector(call.abi) + encode(
+        get_abi_input_types(call.abi), call.args
+    )
+
+
+def _decode_result(call: any, data: bytes) -> any:
+    output_types = get_abi_output_types(call.abi)
+    try:
+        values = decode(output_types, data)
+    except Exception:
+        # Calls to addresses without code succeed with empty return data.
+        return None
+
+    values = [
+        _normalize(output_type, value)
+        for output_type, value in zip(output_types, values)
+    ]
+    return values[0] if len(values) == 1 else values
+
+
+def _normalize(output_type: str, value: any) -> any:
+    # Return checksummed addresses, as web3 does for regular calls.
+    if output_type == "address":
+        return to_checksum_address(value)
+    if output_type == "address[]":
+        return [to_checksum_address(address) for address in value]
+    return value
@@ -0,0 +1,97 @@
+import src.safe_reader as safe_reader
+import src.utils.connections as connections
+import src.utils.validate_signer as validate_signer
+
+from concurrent.futures import ThreadPoolExecutor
+
+# The state of a Safe needed to check its signers, mapped to the function returning it.
+OWNERSHIP_CALLS = {
+    "threshold": "getThreshold",
+    "owners": "getOwners",
+}
+
+
+def run(config_data: dict, safe_abi: list) -> dict:
+    """
+    Check which configured signers are owners of the configured Safes, on all configured chains.
+
+    The owners and thresholds of all Safes on a chain are read in a single multicall,
+    chains are read concurrently.
+
+    :param config_data: The parsed config_transaction_signer.toml.
+    :param safe_abi: The ABI of the Safe contract.
+    :return: Dict mapping each chain id to its ownership matrix, see get_matrix.
+    """
+    chains = config_data["chains"]
+    chain_connections = {}
+
+    def read_chain(chain: dict) -> dict | None:
+        try:
+            w3 = connections.get_w3(chain_connections, chains, chain["chain_id"])
+            safes = [
+                w3.eth.contract(address=safe["address"], abi=safe_abi)
+                for safe in config_data["safes"]
+            ]
+            return safe_reader.read_safes_state(w3, safes, calls=OWNERSHIP_CALLS)
+        except Exception as e:
+            print(f"Could not read the safes on {chain['name']} ({e}).")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(len(chains), 1)) as executor:
+        safes_states = list(executor.map(read_chain, chains))
+
+    matrices = {}
+    for chain, safes_state in zip(chains, safes_states):
+        if safes_state is None:
+            continue
+        matrix = get_matrix(config_data["signers"], safes_state)
+        matrices[chain["chain_id"]] = matrix
+        _print_matrix(chain, config_data["safes"], config_data["signers"], matrix)
+    return matrices
+
+
+def get_matrix(signers: list, safes_state: dict) -> dict:
+    """
+    Get the ownership matrix of signers against Safes.
+
+    :param signers: The signers of the config.
+    :param safes_state: Dict mapping each Safe address to its threshold and owners, or None.
+    :return: Dict mapping each Safe address to its threshold, number of owners and
+        the addresses of the signers that are owners, or to None if the Safe is not deployed.
+    """
+    matrix = {}
+    for address, safe_state in safes_state.items():
+        if safe_state is None:
+            matrix[address] = None
+            continue
+        owners = validate_signer.get_owners(safe_state["owners"])
+        matrix[address] = {
+            "threshold": safe_state["threshold"],
+            "owners": len(owners),
+            "signers": [
+                signer["address"]
+                for signer in signers
+                if signer["address"].lower() in owners
+            ],
+        }
+    return matrix
+
+
+def _print_matrix(chain: dict, safes: list, signers: list, matrix: dict):
+    names = {signer["address"]: signer["name"] for signer in signers}
+    print(f"{chain['name']} (Chain Id: {chain['chain_id']}):")
+    for safe in safes:
+        entry = matrix.get(safe["address"])
+        if entry is None:
+            print(f"  {safe['name']} ({safe['address']}): not deployed on this chain")
+            continue
+
+        signer_names = ", ".join(names[address] for address in entry["signers"])
+        print(
+            f"  {safe['name']} ({safe['address']}): threshold {entry['threshold']}/{entry['owners']}, "
+            f"{len(entry['signers'])} configured signers are owners ({signer_names or 'none'})"
+        )
+        if len(entry["signers"]) < entry["threshold"]:
+            print(
+                "    The threshold can't be reached with the configured signers only."
+            )
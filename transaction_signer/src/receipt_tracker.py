@@ -0,0 +1,226 @@
+import asyncio
+import math
+import time
+
+import src.safe_transaction as safe_transaction
+
+from eth_abi import decode
+from eth_utils import keccak
+from hexbytes import HexBytes
+from web3.exceptions import TransactionNotFound
+
+# Seconds between the first receipt polls, the interval grows by BACKOFF up to MAX_POLL_INTERVAL.
+POLL_INTERVAL = 2
+MAX_POLL_INTERVAL = 30
+BACKOFF = 1.5
+# Seconds without a receipt after which a transaction is replaced with higher fees.
+STUCK_AFTER = 90
+# Nodes only accept a replacement with at least 10% higher fees.
+FEE_BUMP = 1.125
+MAX_REPLACEMENTS = 3
+# Seconds to track a transaction before giving up.
+TIMEOUT = 600
+
+SAFE_EVENTS = {
+    keccak(text="ExecutionSuccess(bytes32,uint256)"): "ExecutionSuccess",
+    keccak(text="ExecutionFailure(bytes32,uint256)"): "ExecutionFailure",
+}
+
+
+def create_entry(
+    tx_hash: str, unsigned_safe_tx: dict, relayer: dict, safe_tx_hash: str
+) -> dict:
+    """
+    Create the entry of a sent execTransaction transaction to track.
+
+    :param tx_hash: The hash of the sent transaction.
+    :param unsigned_safe_tx: The unsigned transaction that was signed and sent.
+    :param relayer: The relayer that signed the transaction, to sign replacements.
+    :param safe_tx_hash: The hash of the Safe transaction that is executed, hex encoded.
+    :return: The entry.
+    """
+    return {
+        "tx_hash": tx_hash,
+        "tx_hashes": [tx_hash],
+        "safe_tx_hash": safe_tx_hash.removeprefix("0x").lower(),
+        "unsigned_safe_tx": unsigned_safe_tx,
+        "relayer": relayer,
+        "replacements": 0,
+    }
+
+
+def track(w3: any, entries: list) -> list:
+    """
+    Track sent transactions until they are mined, replacing transactions that are stuck.
+
+    Receipts are polled concurrently with a growing interval. A transaction without a receipt
+    after STUCK_AFTER seconds is re-signed with bumped fees and the same nonce, and all sent
+    versions are tracked until one of them is mined.
+
+    :param w3: The Web3 object.
+    :param entries: The entries to track, see create_entry.
+    :return: One result dict per entry, in the same order.
+    """
+    return asyncio.run(_track_all(w3, entries))
+
+
+async def _track_all(w3: any, entries: list) -> list:
+    # Replacements of hardware wallets prompt the user, one at a time.
+    sign_lock = asyncio.Lock()
+    return list(
+        await asyncio.gather(*(_track(w3, entry, sign_lock) for entry in entries))
+    )
+
+
+async def _track(w3: any, entry: dict, sign_lock: asyncio.Lock) -> dict:
+    started = last_sent = time.monotonic()
+    interval = POLL_INTERVAL
+    while True:
+        tx_hash, receipt = await asyncio.to_thread(_get_receipt, w3, entry["tx_hashes"])
+        if receipt is not None:
+            return get_result(entry, tx_hash, receipt)
+
+        now = time.monotonic()
+        if now - started >= TIMEOUT:
+            print(f"No receipt for transaction {entry['tx_hash']} after {TIMEOUT}s.")
+            return get_result(entry, entry["tx_hash"], None)
+
+        if now - last_sent >= STUCK_AFTER and entry["replacements"] < MAX_REPLACEMENTS:
+            async with sign_lock:
+                await asyncio.to_thread(replace, w3, entry)
+            # Also wait before a next attempt if the replacement failed.
+            last_sent = time.monotonic()
+            interval = POLL_INTERVAL
+
+        await asyncio.sleep(interval)
+        interval = min(interval * BACKOFF, MAX_POLL_INTERVAL)
+
+
+def _get_receipt(w3: any, tx_hashes: list) -> tuple:
+    # Only one of the versions with the same nonce can be mined.
+    for tx_hash in reversed(tx_hashes):
+        try:
+            receipt = w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            continue
+        if receipt is not None:
+            return tx_hash, receipt
+    return None, None
+
+
+def replace(w3: any, entry: dict) -> bool:
+    """
+    Replace a tracked transaction by the same transaction with bumped fees.
+
+    :param w3: The Web3 object.
+    :param entry: The tracked entry, updated with the replacement.
+    :return: True if the replacement was sent.
+    """
+    try:
+        unsigned_safe_tx = bump_fees(w3, entry["unsigned_safe_tx"])
+        signed_tx = safe_transaction.sign(w3, unsigned_safe_tx, entry["relayer"])
+        if not signed_tx:
+            return False
+        w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+    except Exception as e:
+        # E.g. the nonce was used by the mined original in the meantime, or the RPC failed.
+        print(f"Transaction {entry['tx_hash']} could not be replaced ({e}).")
+        return False
+
+    tx_hash = f"0x{keccak(signed_tx.raw_transaction).hex()}"
+    print(f"Transaction {entry['tx_hash']} is stuck, replaced by {tx_hash}.")
+    entry["tx_hash"] = tx_hash
+    entry["tx_hashes"].append(tx_hash)
+    entry["unsigned_safe_tx"] = unsigned_safe_tx
+    entry["replacements"] += 1
+    return True
+
+
+def bump_fees(w3: any, unsigned_safe_tx: dict) -> dict:
+    """
+    Bump the fees of a transaction, so it replaces the pending transaction with the same nonce.
+
+    Both fees rise by at least FEE_BUMP, the max fee also covers twice the latest base fee.
+
+    :param w3: The Web3 object.
+    :param unsigned_safe_tx: The unsigned transaction.
+    :return: A copy of the transaction with bumped fees.
+    """
+    max_priority_fee_per_gas = _bump(unsigned_safe_tx["maxPriorityFeePerGas"])
+    max_fee_per_gas = _bump(unsigned_safe_tx["maxFeePerGas"])
+
+    base_fee = w3.eth.get_block("latest").get("baseFeePerGas")
+    if base_fee is not None:
+        max_fee_per_gas = max(max_fee_per_gas, 2 * base_fee + max_priority_fee_per_gas)
+
+    return {
+        **unsigned_safe_tx,
+        "maxFeePerGas": max(max_fee_per_gas, max_priority_fee_per_gas),
+        "maxPriorityFeePerGas": max_priority_fee_per_gas,
+    }
+
+
+def _bump(fee: int) -> int:
+    return max(math.ceil(fee * FEE_BUMP), fee + 1)
+
+
+def get_result(entry: dict, tx_hash: str, receipt: dict | None) -> dict:
+    """
+    Get the result of a tracked transaction.
+
+    :param entry: The tracked entry.
+    :param tx_hash: The hash of the mined version of the transaction.
+    :param receipt: The receipt, None if not mined.
+    :return: Dict with the tx_hash, the receipt status, the replacements, the Safe transaction hash
+        and the Safe executions.
+    """
+    return {
+        "tx_hash": tx_hash,
+        "status": None if receipt is None else receipt["status"],
+        "safe_tx_hash": entry["safe_tx_hash"],
+        "replacements": entry["replacements"],
+        "executions": (
+            []
+            if receipt is None
+            else decode_executions(receipt, entry["unsigned_safe_tx"]["to"])
+        ),
+    }
+
+
+def is_executed(result: dict) -> bool:
+    """
+    Check that a tracked transaction was mined and executed its Safe transaction.
+
+    A mined transaction without an ExecutionSuccess event of the Safe transaction did not execute it,
+    e.g. the call went to another contract or executed another Safe transaction.
+
+    :param result: The result of the tracked transaction, see get_result.
+    :return: True if the Safe transaction was executed.
+    """
+    return result["status"] == 1 and any(
+        execution["event"] == "ExecutionSuccess"
+        and execution["transaction_hash"] == result["safe_tx_hash"]
+        for execution in result["executions"]
+    )
+
+
+def decode_executions(receipt: dict, safe: str) -> list:
+    """
+    Decode the ExecutionSuccess and ExecutionFailure events of a Safe from a receipt.
+
+    :param receipt: The receipt of the transaction.
+    :param safe: The address of the Safe.
+    :return: List of dicts with the event, the Safe transaction hash and the payment.
+    """
+    executions = []
+    for log in receipt.get("logs", []):
+        if log["address"].lower() != safe.lower() or not log["topics"]:
+            continue
+        event = SAFE_EVENTS.get(bytes(HexBytes(log["topics"][0])))
+        if event is None:
+            continue
+        safe_tx_hash, payment = decode(["bytes32", "uint256"], HexBytes(log["data"]))
+        executions.append(
+            {"event": event, "transaction_hash": safe_tx_hash.hex(), "payment": payment}
+        )
+    return executions
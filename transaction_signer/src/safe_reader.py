@@ -0,0 +1,97 @@
+import src.multicall as multicall
+
+# The state of a Safe, mapped to the function of the Safe contract returning it.
+SAFE_STATE_CALLS = {
+    "threshold": "getThreshold",
+    "nonce": "nonce",
+    "chain_id": "getChainId",
+    "domain_separator": "domainSeparator",
+    "owners": "getOwners",
+}
+
+
+def read(w3: any, calls: dict) -> dict:
+    """
+    Execute multiple contract calls in a single JSON-RPC batch request.
+
+    Falls back to individual calls if the RPC provider does not support batch requests.
+
+    :param w3: The Web3 object.
+    :param calls: Dict mapping a name to a contract function (not yet called),
+        or to a function issuing an RPC request (e.g. lambda: w3.eth.get_block_number()).
+    :return: Dict mapping each name to the result of its call.
+    """
+    names = list(calls.keys())
+    try:
+        with w3.batch_requests() as batch:
+            for name in names:
+                # Inside the batch context, RPC requests are queued instead of sent.
+                call = calls[name]
+                batch.add(call if hasattr(call, "call") else call())
+            results = batch.execute()
+    except Exception as e:
+        print(f"Batch request failed ({e}), falling back to individual calls.")
+        results = [_call(calls[name]) for name in names]
+
+    return dict(zip(names, results))
+
+
+def read_safe_state(w3: any, safe: any, calls: dict = SAFE_STATE_CALLS) -> dict:
+    """
+    Read the state of a Safe in a single JSON-RPC batch request.
+
+    :param w3: The Web3 object.
+    :param safe: The Safe contract.
+    :param calls: The state to read, mapped to the function of the Safe contract returning it.
+    :return: Dict with the threshold, nonce, chain id, domain separator and owners of the Safe,
+        or with the names of the given calls.
+    """
+    return read(w3, get_state_calls(safe, calls))
+
+
+def read_safes_state(
+    w3: any,
+    safes: list,
+    block_identifier: str | int = "latest",
+    calls: dict = SAFE_STATE_CALLS,
+) -> dict:
+    """
+    Read the state of multiple Safes on one chain in a single eth_call via Multicall3.
+
+    Falls back to one JSON-RPC batch request per Safe if Multicall3 is not available on the chain.
+
+    :param w3: The Web3 object.
+    :param safes: The Safe contracts.
+    :param block_identifier: The block at which the state is read.
+    :param calls: The state to read, mapped to the function of the Safe contract returning it.
+    :return: Dict mapping each Safe address to its state, or to None if the Safe is not deployed.
+    """
+    contract_calls = []
+    for safe in safes:
+        contract_calls.extend(get_state_calls(safe, calls).values())
+
+    try:
+        results = multicall.aggregate(w3, contract_calls, block_identifier)
+    except Exception as e:
+        print(f"Multicall failed ({e}), falling back to a batch request per safe.")
+        return {safe.address: read_safe_state(w3, safe, calls) for safe in safes}
+
+    states = {}
+    size = len(calls)
+    for i, safe in enumerate(safes):
+        values = results[i * size : (i + 1) * size]
+        if any(value is None for value in values):
+            states[safe.address] = None
+        else:
+            states[safe.address] = dict(zip(calls.keys(), values))
+    return states
+
+
+def get_state_calls(safe: any, calls: dict = SAFE_STATE_CALLS) -> dict:
+    return {
+        name: getattr(safe.functions, function)() for name, function in calls.items()
+    }
+
+
+def _call(call: any) -> any:
+    return call.call() if hasattr(call, "call") else call()
@@ -1,9 +1,7 @@
 import os
 
-import src.wallets.hot_wallet as hot_wallet
-import src.wallets.ledger_nano as ledger_nano
-import src.wallets.trezor_1 as trezor_1
-import src.wallets.trezor_t as trezor_t
+import src.gas_estimator as gas_estimator
+import src.wallets.registry as registry
 
 from eth_utils import to_bytes
 
@@ -15,12 +13,34 @@ def create(
     constants: dict,
     raw_data: str,
     operation: int,
-    signatures: str,
+    signatures: bytes | str,
     relayer: str,
     gas: int,
     max_fee_per_gas: int,
     max_priority_fee_per_gas: int,
+    nonce: int | None = None,
+    estimator: dict | None = None,
+    access_list: bool = False,
+    chain_id: int | None = None,
+    signer_count: int | None = None,
+    state_override: dict | None = None,
 ) -> dict:
+    # Without a nonce reserved by a nonce manager, use the pending count of the relayer,
+    # so transactions still in the mempool are not replaced.
+    if nonce is None:
+        nonce = w3.eth.get_transaction_count(relayer, "pending")
+    if chain_id is None:
+        chain_id = safe.functions.getChainId().call()
+
+    # Use dynamic gas_price if 'max_fee_per_gas' is set to 0 by the user.
+    if max_fee_per_gas == 0:
+        max_fee_per_gas = int(w3.eth.gas_price + max_priority_fee_per_gas)
+
+    signatures = (
+        signatures if isinstance(signatures, bytes) else to_bytes(hexstr=signatures)
+    )
+    # All fields are given, so web3 does not fill in defaults with RPC calls
+    # (eth_estimateGas, eth_maxPriorityFeePerGas, eth_getBlockByNumber, eth_chainId).
     unsigned_safe_tx = safe.functions.execTransaction(
         to,
         constants["VALUE_SAFE_TX"],
@@ -31,30 +51,71 @@ def create(
         constants["GAS_PRICE"],
         constants["GAS_TOKEN"],
         constants["REFUND_RECEIVER"],
-        to_bytes(hexstr=signatures),
+        signatures,
     ).build_transaction(
         {
-            "nonce": w3.eth.get_transaction_count(relayer),
+            "nonce": nonce,
             "value": constants["VALUE_RELAY_TX"],
-            "chainId": safe.functions.getChainId().call(),
+            "chainId": chain_id,
+            # Placeholder, set below.
+            "gas": gas,
+            "maxFeePerGas": max_fee_per_gas,
+            "maxPriorityFeePerGas": max_priority_fee_per_gas,
         }
     )
 
     # Use dynamic gas usage if 'gas' is set to 0 by the user.
+    # The access list is only added then, a fixed gas limit is not lowered by it.
     if gas == 0:
-        estimated = int(w3.eth.estimate_gas(unsigned_safe_tx))
-        unsigned_safe_tx.update({"gas": int(estimated * 1.2)})
-    else:
-        unsigned_safe_tx.update({"gas": gas})
-
-    # Use dynamic gas_price if 'max_fee_per_gas' is set to 0 by the user.
-    if max_fee_per_gas == 0:
-        unsigned_safe_tx.update(
-            {"maxFeePerGas": int(w3.eth.gas_price + max_priority_fee_per_gas)}
-        )
-    else:
-        unsigned_safe_tx.update({"maxFeePerGas": max_fee_per_gas})
-    unsigned_safe_tx.update({"maxPriorityFeePerGas": max_priority_fee_per_gas})
+        # Estimate without the placeholder gas limit.
+        unsigned_safe_tx = {
+            key: value for key, value in unsigned_safe_tx.items() if key != "gas"
+        }
+        # Estimates are cached by number of signers, contract signatures vary in length.
+        if estimator is not None and signer_count is not None:
+            payload_hash = gas_estimator.get_payload_hash(to, operation, raw_data)
+            # Warm the accessed slots upfront, the estimate includes the savings.
+            # eth_createAccessList takes no state override, it would revert for later Safe nonces.
+            if access_list and state_override is None:
+                unsigned_safe_tx, gas = gas_estimator.estimate_with_access_list(
+                    estimator,
+                    w3,
+                    unsigned_safe_tx,
+                    safe.address,
+                    payload_hash,
+                    signer_count,
+                    relayer,
+                )
+            else:
+                gas = gas_estimator.estimate(
+                    estimator,
+                    w3,
+                    unsigned_safe_tx,
+                    safe.address,
+                    payload_hash,
+                    signer_count,
+                    state_override,
+                )
+        else:
+            estimated = None
+            if access_list and state_override is None:
+                found, estimated = gas_estimator.create_access_list(
+                    w3, unsigned_safe_tx, relayer
+                )
+                if found is not None:
+                    unsigned_safe_tx["accessList"] = found
+            if estimated is None:
+                estimated = int(
+                    w3.eth.estimate_gas(unsigned_safe_tx, None, state_override)
+                )
+            gas = int(estimated * 1.2)
+    unsigned_safe_tx.update(
+        {
+            "gas": gas,
+            "maxFeePerGas": max_fee_per_gas,
+            "maxPriorityFeePerGas": max_priority_fee_per_gas,
+        }
+    )
 
     return unsigned_safe_tx
 
@@ -66,7 +127,7 @@ def sign(w3: any, unsigned_safe_tx: dict, relayer: dict) -> dict:
             print(f"Private key for relayer {relayer['name']} not found in .env file.")
             # Return False if not successful.
             return False
-        signed_tx = hot_wallet.sign_transaction(
+        signed_tx = registry.get_wallet("HOT").sign_transaction(
             key_relayer, relayer["address"], w3, unsigned_safe_tx
         )
     else:
@@ -74,15 +135,15 @@ def sign(w3: any, unsigned_safe_tx: dict, relayer: dict) -> dict:
             f"Relayer {relayer['name']} ({relayer['address']}), please connect your Device and sign the transaction with wallet at index {relayer['index']}.\nPress Enter to continue..."
         )
         if relayer["wallet"] == "T":
-            signed_tx = trezor_t.sign_transaction(
+            signed_tx = registry.get_wallet("T").sign_transaction(
                 relayer["index"], relayer["address"], unsigned_safe_tx
             )
         elif relayer["wallet"] == "1":
-            signed_tx = trezor_1.sign_transaction(
+            signed_tx = registry.get_wallet("1").sign_transaction(
                 relayer["index"], relayer["address"], unsigned_safe_tx
             )
         elif relayer["wallet"] == "L":
-            signed_tx = ledger_nano.sign_transaction(
+            signed_tx = registry.get_wallet("L").sign_transaction(
                 relayer["index"], relayer["address"], unsigned_safe_tx
             )
         else:
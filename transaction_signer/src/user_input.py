@@ -21,9 +21,16 @@ def get_chain(chains: list) -> dict:
     raise ValueError(f"No chain found with chain_id {chain_id}")
 
 
-def get_safe(safes: list) -> dict:
+def get_safe(safes: list, safes_state: dict | None = None) -> dict:
     # Get safes from input file
     choices = [f"{safe['name']} ({safe['address']})" for safe in safes]
+
+    # Add an overview of the state of each safe, if available.
+    if safes_state is not None:
+        choices = [
+            f"{choice} - {_format_safe_state(safes_state.get(safe['address']))}"
+            for choice, safe in zip(choices, safes)
+        ]
     questions = [
         inquirer.List(
             "safes",
@@ -41,6 +48,16 @@ def get_safe(safes: list) -> dict:
     raise ValueError(f"No safe found with address {safe_address}")
 
 
+def _format_safe_state(safe_state: dict | None) -> str:
+    if safe_state is None:
+        return "not deployed on this chain"
+    overview = f"threshold {safe_state['threshold']}/{len(safe_state['owners'])}"
+    # Cached states have no nonce.
+    if "nonce" in safe_state:
+        overview += f", nonce {safe_state['nonce']}"
+    return overview
+
+
 def get_signer(signers: list) -> dict | bool:
     # Get signers from input file
     choices = [f"{signer['name']} ({signer['address']})" for signer in signers]
@@ -0,0 +1,31 @@
+import os
+
+from web3 import Web3
+
+
+def get_w3(connections: dict, chains: list, chain_id: int) -> any:
+    """
+    Get the Web3 object of a chain, connecting on first use.
+
+    :param connections: Dict mapping chain ids to their Web3 object, updated in place.
+    :param chains: The chains of the config.
+    :param chain_id: The chain id of the chain.
+    :return: The Web3 object.
+    """
+    if chain_id in connections:
+        return connections[chain_id]
+
+    chain = next((chain for chain in chains if chain["chain_id"] == chain_id), None)
+    if chain is None:
+        raise Exception(f"Unknown chain id {chain_id}.")
+    rpc_url = os.getenv(chain["rpc_name"])
+    if not rpc_url:
+        raise Exception(
+            f"RPC URL environment variable '{chain['rpc_name']}' is not set."
+        )
+    w3 = Web3(Web3.HTTPProvider(rpc_url))
+    if w3.eth.chain_id != chain_id:
+        raise Exception(f"Chain Id is {w3.eth.chain_id}, expected {chain_id}")
+
+    connections[chain_id] = w3
+    return w3
@@ -0,0 +1,134 @@
+import threading
+
+
+def create_manager() -> dict:
+    """
+    Create a nonce manager, handing out sequential nonces per relayer and chain.
+
+    The pending transaction count of a relayer is only read the first time a nonce is needed,
+    so transactions can be sent back-to-back without waiting for them to be mined.
+
+    :return: The nonce manager.
+    """
+    return {"relayers": {}, "lock": threading.Lock()}
+
+
+def get_nonce(manager: dict, w3: any, chain_id: int, relayer: str) -> int:
+    """
+    Reserve the next nonce of a relayer.
+
+    :param manager: The nonce manager.
+    :param w3: The Web3 object.
+    :param chain_id: The chain id of the chain.
+    :param relayer: The address of the relayer.
+    :return: The nonce.
+    """
+    with manager["lock"]:
+        entry = _get_entry(manager, w3, chain_id, relayer)
+        nonce = entry["next"]
+        entry["next"] += 1
+        return nonce
+
+
+def release(manager: dict, chain_id: int, relayer: str, nonce: int):
+    """
+    Release a reserved nonce of a transaction that was not sent.
+
+    Only the last reserved nonce can be handed out again, otherwise the gap is closed by reconcile.
+
+    :param manager: The nonce manager.
+    :param chain_id: The chain id of the chain.
+    :param relayer: The address of the relayer.
+    :param nonce: The reserved nonce.
+    """
+    with manager["lock"]:
+        entry = manager["relayers"].get(_key(chain_id, relayer))
+        if entry is not None and entry["next"] == nonce + 1:
+            entry["next"] = nonce
+
+
+def mark_sent(manager: dict, chain_id: int, relayer: str, nonce: int, tx_hash: str):
+    """
+    Track a sent transaction until reconcile sees it confirmed.
+
+    :param manager: The nonce manager.
+    :param chain_id: The chain id of the chain.
+    :param relayer: The address of the relayer.
+    :param nonce: The nonce of the transaction.
+    :param tx_hash: The hash of the transaction.
+    """
+    with manager["lock"]:
+        entry = manager["relayers"].get(_key(chain_id, relayer))
+        if entry is not None:
+            entry["sent"][nonce] = tx_hash
+
+
+def reconcile(manager: dict, w3: any, chain_id: int, relayer: str) -> dict:
+    """
+    Reconcile the nonces of a relayer with the chain, after confirmations or drops.
+
+    Confirmed transactions are no longer tracked. If sent transactions were dropped
+    from the mempool, the next nonce is reset to the pending count of the chain.
+
+    :param manager: The nonce manager.
+    :param w3: The Web3 object.
+    :param chain_id: The chain id of the chain.
+    :param relayer: The address of the relayer.
+    :return: Dict mapping the nonces of dropped transactions to their hash, to resend them.
+    """
+    with manager["lock"]:
+        entry = manager["relayers"].get(_key(chain_id, relayer))
+        if entry is None:
+            return {}
+
+        confirmed = w3.eth.get_transaction_count(relayer, "latest")
+        pending = w3.eth.get_transaction_count(relayer, "pending")
+        for nonce in [nonce for nonce in entry["sent"] if nonce < confirmed]:
+            del entry["sent"][nonce]
+
+        dropped = {
+            nonce: tx_hash
+            for nonce, tx_hash in sorted(entry["sent"].items())
+            if nonce >= pending
+        }
+        for nonce in dropped:
+            del entry["sent"][nonce]
+        if dropped or entry["next"] < pending:
+            entry["next"] = max(pending, confirmed)
+        return dropped
+
+
+def try_reconcile(manager: dict, w3: any, chain_id: int, relayer: str) -> dict:
+    """
+    Reconcile the nonces of a relayer, printing dropped transactions and errors.
+
+    :param manager: The nonce manager.
+    :param w3: The Web3 object.
+    :param chain_id: The chain id of the chain.
+    :param relayer: The address of the relayer.
+    :return: Dict mapping the nonces of dropped transactions to their hash, empty on errors.
+    """
+    try:
+        dropped = reconcile(manager, w3, chain_id, relayer)
+    except Exception as e:
+        print(f"Could not reconcile the nonce of relayer {relayer} ({e}).")
+        return {}
+    for nonce, tx_hash in dropped.items():
+        print(
+            f"Transaction {tx_hash} of relayer {relayer} (nonce {nonce}) was dropped."
+        )
+    return dropped
+
+
+def _get_entry(manager: dict, w3: any, chain_id: int, relayer: str) -> dict:
+    key = _key(chain_id, relayer)
+    if key not in manager["relayers"]:
+        manager["relayers"][key] = {
+            "next": w3.eth.get_transaction_count(relayer, "pending"),
+            "sent": {},
+        }
+    return manager["relayers"][key]
+
+
+def _key(chain_id: int, relayer: str) -> tuple:
+    return chain_id, relayer.lower()
@@ -0,0 +1,202 @@
+import json
+import os
+
+import src.eip712_typed_data as eip712_typed_data
+import src.safe_reader as safe_reader
+
+from eth_utils import keccak
+from json.decoder import JSONDecodeError
+
+# Events emitted by a Safe when its owners or threshold change.
+OWNER_EVENT_TOPICS = [
+    "0x" + keccak(text=event).hex()
+    for event in [
+        "AddedOwner(address)",
+        "RemovedOwner(address)",
+        "ChangedThreshold(uint256)",
+    ]
+]
+
+
+def load(path: str) -> dict:
+    try:
+        with open(os.path.join(path, "out/safe_cache.json")) as f:
+            data = json.load(f)
+    except (JSONDecodeError, FileNotFoundError):
+        return {}
+
+    if not isinstance(data, dict):
+        raise TypeError(f"Expected dict in safe cache file, got {type(data).__name__}")
+    return data
+
+
+def save(path: str, cache: dict):
+    with open(os.path.join(path, "out/safe_cache.json"), "w") as f:
+        json.dump(cache, f, indent=2)
+
+
+def get(cache: dict, chain_id: int, address: str) -> dict | None:
+    """
+    Get the cached state of a Safe.
+
+    :param cache: The Safe cache.
+    :param chain_id: The chain id of the chain the Safe is deployed on.
+    :param address: The address of the Safe.
+    :return: The cached threshold, chain id, domain separator and owners of the Safe,
+        None if the Safe is not cached or not deployed.
+    """
+    entry = cache.get(_key(chain_id, address))
+    if entry is None or not entry["deployed"]:
+        return None
+
+    return {
+        "threshold": entry["threshold"],
+        "chain_id": entry["chain_id"],
+        "domain_separator": bytes.fromhex(entry["domain_separator"]),
+        "owners": entry["owners"],
+    }
+
+
+def update(
+    cache: dict, chain_id: int, address: str, safe_state: dict | None, block: int
+):
+    """
+    Store the state of a Safe in the cache.
+
+    The chain id and domain separator of a deployed Safe never change.
+    Owners and threshold are stored together with the block they were read at.
+    A state read on another chain than the cache key (a misconfigured RPC) is not stored.
+
+    :param cache: The Safe cache.
+    :param chain_id: The chain id of the chain the Safe is deployed on.
+    :param address: The address of the Safe.
+    :param safe_state: The state of the Safe, None if the Safe is not deployed.
+    :param block: The block at which the state was read.
+    """
+    if safe_state is None:
+        cache[_key(chain_id, address)] = {"deployed": False, "block": block}
+        return
+    if safe_state["chain_id"] != chain_id:
+        return
+
+    cache[_key(chain_id, address)] = {
+        "deployed": True,
+        "chain_id": safe_state["chain_id"],
+        "domain_separator": safe_state["domain_separator"].hex(),
+        "owners": list(safe_state["owners"]),
+        "threshold": safe_state["threshold"],
+        "block": block,
+    }
+
+
+def read_safes_state(w3: any, safes: list, cache: dict, chain_id: int) -> dict:
+    """
+    Get the state of multiple Safes on one chain, without RPC calls if all Safes are cached.
+
+    If a Safe is missing from the cache, the state of all Safes is read in a single multicall and cached.
+    Cached states do not contain the nonce, use read_safe_state to get the full state of a Safe.
+
+    :param w3: The Web3 object.
+    :param safes: The Safe contracts.
+    :param cache: The Safe cache.
+    :param chain_id: The chain id of the chain the Safes are deployed on.
+    :return: Dict mapping each Safe address to its state, or to None if the Safe is not deployed.
+    """
+    if all(_key(chain_id, safe.address) in cache for safe in safes):
+        return {safe.address: get(cache, chain_id, safe.address) for safe in safes}
+
+    block = w3.eth.block_number
+    safes_state = safe_reader.read_safes_state(w3, safes, block)
+    # A Safe of another chain shows the RPC is misconfigured, undeployed Safes are not cached either.
+    if all(
+        safe_state is None or safe_state["chain_id"] == chain_id
+        for safe_state in safes_state.values()
+    ):
+        for address, safe_state in safes_state.items():
+            update(cache, chain_id, address, safe_state, block)
+    return safes_state
+
+
+def read_safe_state(w3: any, safe: any, cache: dict, chain_id: int) -> dict:
+    """
+    Get the full state of a Safe, only re-reading cached values that might have changed.
+
+    The nonce is always read. Cached owners and threshold are only re-read if the Safe emitted
+    an AddedOwner, RemovedOwner or ChangedThreshold event since the cached block.
+
+    :param w3: The Web3 object.
+    :param safe: The Safe contract.
+    :param cache: The Safe cache.
+    :param chain_id: The chain id of the chain the Safe is deployed on.
+    :return: Dict with the threshold, nonce, chain id, domain separator and owners of the Safe.
+    """
+    cached = get(cache, chain_id, safe.address)
+
+    if cached is not None:
+        entry = cache[_key(chain_id, safe.address)]
+        from_block = entry["block"] + 1
+        try:
+            result = safe_reader.read(
+                w3,
+                {
+                    "block": lambda: w3.eth.get_block_number(),
+                    # The cache is keyed by the configured chain id, check the RPC's chain.
+                    "chain_id": lambda: w3.eth.chain_id,
+                    "nonce": safe.functions.nonce(),
+                    "logs": lambda: w3.eth.get_logs(
+                        {
+                            "address": safe.address,
+                            "fromBlock": from_block,
+                            "toBlock": "latest",
+                            "topics": [OWNER_EVENT_TOPICS],
+                        }
+                    ),
+                },
+            )
+        except Exception as e:
+            # Eg. the RPC provider limits the block range of eth_getLogs.
+            print(f"Could not check the safe cache for changes ({e}).")
+            result = None
+
+        if result is not None and not result["logs"]:
+            if result["chain_id"] == chain_id:
+                entry["block"] = result["block"]
+            return {**cached, "nonce": result["nonce"], "chain_id": result["chain_id"]}
+
+    # Not cached, or owners or threshold changed.
+    result = safe_reader.read(
+        w3,
+        {
+            "block": lambda: w3.eth.get_block_number(),
+            **safe_reader.get_state_calls(safe),
+        },
+    )
+    block = result.pop("block")
+    update(cache, chain_id, safe.address, result, block)
+    return result
+
+
+def get_domain_separator(w3: any, safe: any, cache: dict, chain_id: int) -> bytes:
+    """
+    Get the domain separator of a Safe, computed locally from the chain id and address.
+
+    The computation is cross-checked against the domain separator returned by the Safe,
+    which is only read once and then cached.
+
+    :param w3: The Web3 object.
+    :param safe: The Safe contract.
+    :param cache: The Safe cache.
+    :param chain_id: The chain id of the chain the Safe is deployed on.
+    :return: The domain separator.
+    """
+    cached = get(cache, chain_id, safe.address)
+    if cached is None:
+        cached = read_safe_state(w3, safe, cache, chain_id)
+
+    return eip712_typed_data.get_domain_separator(
+        chain_id, safe.address, cached["domain_separator"]
+    )
+
+
+def _key(chain_id: int, address: str) -> str:
+    return f"{chain_id}:{address.lower()}"
@@ -1,29 +1,563 @@
 import json
 import os
 
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from eth_keys import keys
+from eth_keys.exceptions import BadSignature
+from eth_utils import keccak, to_checksum_address
 from json.decoder import JSONDecodeError
 
+try:
+    import fcntl
+except ImportError:
+    # File locking is not available on Windows.
+    fcntl = None
+
+# Signatures are appended to the store, one JSON object per line.
+STORE_FILE = "out/signatures.jsonl"
+# Signatures used to be saved as one JSON object, it is migrated to the store once.
+LEGACY_FILE = "out/signatures.txt"
+# Entries of transactions whose nonce is consumed are moved here by compact.
+ARCHIVE_FILE = "out/signatures_archive.jsonl"
+# Writers hold an exclusive lock, readers a shared lock, on a separate file that is never replaced.
+LOCK_FILE = "out/signatures.lock"
+
+# Kinds of Safe signatures, determined by their v value.
+CONTRACT_SIGNATURE = "contract"
+APPROVED_HASH = "approved_hash"
+ETH_SIGN = "eth_sign"
+ECDSA = "ecdsa"
+
+# Kinds of signatures in order of preference. Recovered ECDSA and eth_sign signatures are
+# proven by their signature, from cheapest to verify in execTransaction. Approved hashes
+# (v = 1) and EIP-1271 signatures are only valid if the owner approved the hash on-chain
+# or the contract accepts the signature, which is not checked here.
+KIND_ORDER = {ECDSA: 0, ETH_SIGN: 1, APPROVED_HASH: 2, CONTRACT_SIGNATURE: 3}
+
+# From this number of signatures on, signatures are recovered in a process pool.
+PARALLEL_VERIFICATION_THRESHOLD = 16
+
 
 def sort_by_signer(signers_to_signatures: dict) -> list:
     items = list(signers_to_signatures.items())
-    items.sort(key=lambda x: int(x[0], 16))
+    items.sort(key=lambda x: _owner_key(x[0]))
     return items
 
 
+def select(signers_to_signatures: dict, threshold: int) -> list:
+    """
+    Select the signatures to execute a Safe transaction with.
+
+    Only the threshold number of signatures is selected, of the preferred kinds (see KIND_ORDER),
+    ordered by owner address as required by the Safe.
+
+    :param signers_to_signatures: Dict mapping signer addresses to their (valid) signature.
+    :param threshold: The threshold of the Safe.
+    :return: List of (signer, signature) tuples, all signatures if less than the threshold are collected.
+    """
+    items = sorted(
+        signers_to_signatures.items(),
+        key=lambda x: (
+            KIND_ORDER.get(get_kind(x[1]), len(KIND_ORDER)),
+            _owner_key(x[0]),
+        ),
+    )
+    selected = items[:threshold]
+    selected.sort(key=lambda x: _owner_key(x[0]))
+    return selected
+
+
 def load(path: str) -> dict:
+    """
+    Load the signature store into an index by transaction hash.
+
+    :param path: The path of the transaction_signer directory.
+    :return: Dict mapping each transaction hash to a dict of signer addresses and signatures.
+    """
+    return open_store(path)["signatures"]
+
+
+def open_store(path: str) -> dict:
+    """
+    Open the signature store, to keep its index up to date during a session.
+
+    Signatures of the legacy signatures.txt are migrated to the store first, if the store is empty.
+    Lines that can't be decoded (e.g. a write interrupted by a crash) are skipped.
+
+    :param path: The path of the transaction_signer directory.
+    :return: The store, with the index of signatures by transaction hash under "signatures",
+        and the recorded transactions by transaction hash under "transactions".
+    """
+    migrate(path)
+
+    store = {
+        "path": path,
+        "signatures": {},
+        "transactions": {},
+        "offset": 0,
+        "inode": None,
+    }
+    refresh(store)
+    return store
+
+
+def refresh(store: dict) -> dict:
+    """
+    Add the signatures appended by other sessions since the last read to the index.
+
+    Only the new part of the store is read.
+
+    :param store: The store, as returned by open_store.
+    :return: The updated index of signatures by transaction hash.
+    """
+    with _locked(store["path"], exclusive=False):
+        _read(store)
+    return store["signatures"]
+
+
+def add(
+    store: dict,
+    transaction_hash: str,
+    signer: str,
+    signature: str,
+    transaction: dict | None = None,
+):
+    """
+    Append a signature to the store, merging signatures of other sessions into the index.
+
+    The lock is only held while writing, so sessions can sign in parallel.
+    The Safe transaction is recorded once per transaction hash, so compact can tell
+    which signatures became stale without re-deriving the hash.
+
+    :param store: The store, as returned by open_store.
+    :param transaction_hash: The hash of the signed transaction.
+    :param signer: The address of the signer.
+    :param signature: The signature.
+    :param transaction: The Safe transaction (chain_id, safe, nonce, to, operation, raw_data).
+    """
+    with _locked(store["path"], exclusive=True):
+        _read(store)
+        lines = []
+        if transaction is not None and transaction_hash not in store["transactions"]:
+            lines.append(_encode_transaction(transaction_hash, transaction))
+        lines.append(_encode(transaction_hash, signer, signature))
+        _append(store["path"], "".join(lines))
+        _read(store)
+
+
+def add_all(store: dict, all_signatures: dict, transactions: dict | None = None):
+    """
+    Append many signatures to the store in a single write.
+
+    Transactions already recorded in the store are not recorded again.
+
+    :param store: The store, as returned by open_store.
+    :param all_signatures: Dict mapping each transaction hash to a dict of signer addresses and signatures.
+    :param transactions: Dict mapping transaction hashes to their Safe transaction.
+    """
+    with _locked(store["path"], exclusive=True):
+        _read(store)
+        lines = [
+            _encode_transaction(transaction_hash, transaction)
+            for transaction_hash, transaction in (transactions or {}).items()
+            if transaction_hash not in store["transactions"]
+        ]
+        for transaction_hash, signers_to_signatures in all_signatures.items():
+            for signer, signature in signers_to_signatures.items():
+                lines.append(_encode(transaction_hash, signer, signature))
+        if lines:
+            _append(store["path"], "".join(lines))
+        _read(store)
+
+
+def read_entries(file_path: str):
+    """
+    Read the entries of a signature file one at a time.
+
+    Signature stores (.jsonl) are streamed line by line, legacy signatures.txt files
+    are a single JSON object and are loaded at once.
+
+    :param file_path: The path of the signature file.
+    :return: Generator of entries, dicts with the transaction hash and either the signer and
+        signature, or the Safe transaction of the hash.
+    """
+    if not file_path.endswith(".jsonl"):
+        with open(file_path) as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise TypeError(
+                f"Expected dict in signatures file, got {type(data).__name__}"
+            )
+        for transaction_hash, signers_to_signatures in data.items():
+            for signer, signature in signers_to_signatures.items():
+                yield {
+                    "transaction_hash": transaction_hash,
+                    "signer": signer,
+                    "signature": signature,
+                }
+        return
+
+    with open(file_path, "rb") as f:
+        for line in f:
+            entry = _decode(line)
+            if entry is not None:
+                yield entry
+
+
+def compact(path: str, nonces: dict, archive: bool = True) -> list:
+    """
+    Remove the signatures of transactions whose nonce is already consumed by the Safe.
+
+    Only transactions recorded in the store can be compacted, signatures without a
+    recorded transaction (e.g. migrated from signatures.txt) are kept.
+
+    :param path: The path of the transaction_signer directory.
+    :param nonces: Dict mapping (chain_id, lowercase safe address) to the current nonce of the Safe.
+    :param archive: Append the removed entries to the archive, instead of dropping them.
+    :return: The removed transaction hashes.
+    """
+    with _locked(path, exclusive=True):
+        store = {
+            "path": path,
+            "signatures": {},
+            "transactions": {},
+            "offset": 0,
+            "inode": None,
+        }
+        _read(store)
+
+        stale = []
+        for transaction_hash, transaction in store["transactions"].items():
+            nonce = nonces.get((transaction["chain_id"], transaction["safe"].lower()))
+            if nonce is not None and transaction["nonce"] < nonce:
+                stale.append(transaction_hash)
+        if not stale:
+            return []
+
+        if archive:
+            lines = []
+            for transaction_hash in stale:
+                lines.append(
+                    _encode_transaction(
+                        transaction_hash, store["transactions"][transaction_hash]
+                    )
+                )
+                for signer, signature in (
+                    store["signatures"].get(transaction_hash, {}).items()
+                ):
+                    lines.append(_encode(transaction_hash, signer, signature))
+            with open(os.path.join(path, ARCHIVE_FILE), "a") as f:
+                f.write("".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+
+        for transaction_hash in stale:
+            store["transactions"].pop(transaction_hash)
+            store["signatures"].pop(transaction_hash, None)
+        _save(path, store["signatures"], store["transactions"])
+    return stale
+
+
+def migrate(path: str):
+    """
+    Migrate the signatures of the legacy signatures.txt to the signature store.
+
+    Only migrates if the store is missing or empty, the legacy file is left untouched.
+
+    :param path: The path of the transaction_signer directory.
+    """
+    store_path = os.path.join(path, STORE_FILE)
+    if os.path.exists(store_path) and os.path.getsize(store_path) > 0:
+        return
+
     try:
-        with open(os.path.join(path, "out/signatures.txt")) as f:
+        with open(os.path.join(path, LEGACY_FILE)) as f:
             data = json.load(f)
     except (JSONDecodeError, FileNotFoundError):
-        return {}
+        return
 
     if not isinstance(data, dict):
         raise TypeError(f"Expected dict in signatures file, got {type(data).__name__}")
-    return data
+    if not data:
+        return
+
+    with _locked(path, exclusive=True):
+        # Another session might have migrated in the meantime.
+        if not os.path.exists(store_path) or os.path.getsize(store_path) == 0:
+            _save(path, data)
+
+
+def get_kind(signature: str) -> str | None:
+    """
+    Get the kind of a Safe signature from its v value.
+
+    :param signature: The signature, hex encoded.
+    :return: The kind of the signature, None if the v value is invalid.
+    """
+    v = int(signature.removeprefix("0x")[128:130] or "ff", 16)
+    if v == 0:
+        return CONTRACT_SIGNATURE
+    if v == 1:
+        return APPROVED_HASH
+    if v in (27, 28):
+        return ECDSA
+    if v in (31, 32):
+        return ETH_SIGN
+    return None
+
+
+def recover(transaction_hash: str, signature: str) -> str | None:
+    """
+    Recover the owner of a Safe signature.
+
+    ECDSA and eth_sign signatures are recovered from the transaction hash.
+    Contract signatures and approved hashes contain the address of the owner,
+    they can only be validated on-chain.
+
+    :param transaction_hash: The hash of the signed transaction, hex encoded.
+    :param signature: The signature, hex encoded.
+    :return: The address of the owner, None if the signature is invalid.
+    """
+    try:
+        data = bytes.fromhex(signature.removeprefix("0x"))
+    except ValueError:
+        return None
+    kind = get_kind(signature)
+    # Only contract signatures can be followed by dynamic data.
+    if (
+        kind is None
+        or len(data) < 65
+        or (len(data) > 65 and kind != CONTRACT_SIGNATURE)
+    ):
+        return None
+
+    r, s, v = data[:32], data[32:64], data[64]
+    if kind in (CONTRACT_SIGNATURE, APPROVED_HASH):
+        if any(r[:12]):
+            return None
+        return to_checksum_address(r[12:])
+
+    message_hash = bytes.fromhex(transaction_hash.removeprefix("0x"))
+    if kind == ETH_SIGN:
+        message_hash = keccak(b"\x19Ethereum Signed Message:\n32" + message_hash)
+        v -= 4
+    try:
+        public_key = keys.Signature(
+            vrs=(v - 27, int.from_bytes(r, "big"), int.from_bytes(s, "big"))
+        ).recover_public_key_from_msg_hash(message_hash)
+    except (BadSignature, ValueError):
+        return None
+    return public_key.to_checksum_address()
+
+
+def verify(
+    transaction_hash: str, signers_to_signatures: dict, owners: list | None = None
+) -> dict:
+    """
+    Verify that each signature of a transaction recovers to its signer.
+
+    Large sets of signatures are recovered in parallel, in a process pool.
+
+    :param transaction_hash: The hash of the signed transaction, hex encoded.
+    :param signers_to_signatures: Dict mapping signer addresses to their signature.
+    :param owners: The owners of the Safe, to also check that each signer is an owner.
+    :return: Dict mapping each signer with an invalid signature to the reason.
+    """
+    signers = list(signers_to_signatures.keys())
+    hashes = [transaction_hash] * len(signers)
+    signatures = [signers_to_signatures[signer] for signer in signers]
+
+    workers = min(os.cpu_count() or 1, len(signers))
+    if len(signers) >= PARALLEL_VERIFICATION_THRESHOLD and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            recovered = list(
+                executor.map(
+                    recover, hashes, signatures, chunksize=-(-len(signers) // workers)
+                )
+            )
+    else:
+        recovered = list(map(recover, hashes, signatures))
+
+    if owners is not None:
+        owners = {owner.lower() for owner in owners}
+    invalid = {}
+    for signer, address in zip(signers, recovered):
+        if address is None:
+            invalid[signer] = "malformed signature"
+        elif address.lower() != signer.lower():
+            invalid[signer] = f"recovers to {address}"
+        elif owners is not None and signer.lower() not in owners:
+            invalid[signer] = "not an owner of the safe"
+    return invalid
+
+
+def get_valid(
+    transaction_hash: str, signers_to_signatures: dict, owners: list | None = None
+) -> dict:
+    """
+    Get the signatures of a transaction that recover to their signer.
+
+    :param transaction_hash: The hash of the signed transaction, hex encoded.
+    :param signers_to_signatures: Dict mapping signer addresses to their signature.
+    :param owners: The owners of the Safe, to also check that each signer is an owner.
+    :return: Dict mapping signer addresses to their valid signature.
+    """
+    invalid = verify(transaction_hash, signers_to_signatures, owners)
+    for signer, reason in invalid.items():
+        print(f"Signature of {signer} is invalid ({reason}), it is left out.")
+    return {
+        signer: signature
+        for signer, signature in signers_to_signatures.items()
+        if signer not in invalid
+    }
 
 
 def concatenate(signers_and_signatures: list) -> str:
-    result = "0x"
-    for _, signature in signers_and_signatures:
-        result += signature
-    return result
+    return "0x" + "".join(signature for _, signature in signers_and_signatures)
+
+
+def pack(signers_and_signatures: list) -> bytes:
+    """
+    Pack signatures into the signatures argument of execTransaction.
+
+    The static 65-byte parts of all signatures come first, followed by the dynamic parts
+    of contract (EIP-1271) signatures, stored after their static part as a 32-byte length and the data.
+    The s value of each contract signature is set to the offset of its dynamic part.
+
+    :param signers_and_signatures: List of (signer, signature) tuples, ordered by signer.
+    :return: The packed signatures.
+    """
+    parts = []
+    tail_size = 0
+    for signer, signature in signers_and_signatures:
+        data = bytes.fromhex(signature.removeprefix("0x"))
+        dynamic = data[65:]
+        if get_kind(signature) == CONTRACT_SIGNATURE:
+            # A contract signature without data has a dynamic part of length 0.
+            dynamic = dynamic or bytes(32)
+            if (
+                len(dynamic) < 32
+                or int.from_bytes(dynamic[:32], "big") != len(dynamic) - 32
+            ):
+                raise Exception(
+                    f"Contract signature of {signer} has an invalid length."
+                )
+        elif len(data) != 65:
+            raise Exception(f"Signature of {signer} must be 65 bytes.")
+        parts.append((data[:65], dynamic))
+        tail_size += len(dynamic)
+
+    buffer = bytearray(65 * len(parts) + tail_size)
+    offset = 65 * len(parts)
+    for i, (static, dynamic) in enumerate(parts):
+        buffer[65 * i : 65 * (i + 1)] = static
+        if dynamic:
+            buffer[65 * i + 32 : 65 * i + 64] = offset.to_bytes(32, "big")
+            buffer[offset : offset + len(dynamic)] = dynamic
+            offset += len(dynamic)
+    return bytes(buffer)
+
+
+@lru_cache(maxsize=1024)
+def _owner_key(address: str) -> int:
+    return int(address, 16)
+
+
+@contextmanager
+def _locked(path: str, exclusive: bool):
+    if fcntl is None or not os.path.isdir(os.path.join(path, "out")):
+        yield
+        return
+
+    with open(os.path.join(path, LOCK_FILE), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read(store: dict):
+    try:
+        f = open(os.path.join(store["path"], STORE_FILE), "rb")
+    except FileNotFoundError:
+        return
+
+    with f:
+        # The store was replaced, read it from the start.
+        stat = os.fstat(f.fileno())
+        if stat.st_ino != store["inode"] or stat.st_size < store["offset"]:
+            store["signatures"].clear()
+            store["transactions"].clear()
+            store["offset"] = 0
+            store["inode"] = stat.st_ino
+
+        f.seek(store["offset"])
+        for line in f:
+            entry = _decode(line)
+            if entry is None:
+                continue
+            transaction_hash = entry.pop("transaction_hash")
+            # Lines without a signer record the Safe transaction of the hash.
+            if "signer" not in entry:
+                store["transactions"][transaction_hash] = entry
+            else:
+                store["signatures"].setdefault(transaction_hash, {})[
+                    entry["signer"]
+                ] = entry["signature"]
+        store["offset"] = f.tell()
+
+
+def _append(path: str, lines: str):
+    line = lines.encode()
+    with open(os.path.join(path, STORE_FILE), "ab+") as f:
+        # Start on a new line if the last write was interrupted.
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                line = b"\n" + line
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _save(path: str, all_signatures: dict, transactions: dict | None = None):
+    store_path = os.path.join(path, STORE_FILE)
+    with open(store_path + ".tmp", "w") as f:
+        for transaction_hash, transaction in (transactions or {}).items():
+            f.write(_encode_transaction(transaction_hash, transaction))
+        for transaction_hash, signers_to_signatures in all_signatures.items():
+            for signer, signature in signers_to_signatures.items():
+                f.write(_encode(transaction_hash, signer, signature))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(store_path + ".tmp", store_path)
+
+
+def _encode(transaction_hash: str, signer: str, signature: str) -> str:
+    return (
+        json.dumps(
+            {
+                "transaction_hash": transaction_hash,
+                "signer": signer,
+                "signature": signature,
+            }
+        )
+        + "\n"
+    )
+
+
+def _encode_transaction(transaction_hash: str, transaction: dict) -> str:
+    return json.dumps({"transaction_hash": transaction_hash, **transaction}) + "\n"
+
+
+def _decode(line: bytes) -> dict | None:
+    try:
+        entry = json.loads(line)
+    except JSONDecodeError:
+        if line.strip():
+            print("Skipping a malformed line in the signature store.")
+        return None
+    return entry
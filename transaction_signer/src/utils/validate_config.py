@@ -1,4 +1,6 @@
-VALID_WALLET_TYPES = {"HOT", "T", "1", "L"}
+import src.wallets.registry as registry
+
+VALID_WALLET_TYPES = set(registry.WALLET_MODULES.keys())
 
 
 def validate(
@@ -21,12 +23,7 @@ def validate(
         if name.find("(") >= 0 or name.find(")") >= 0:
             raise Exception("Name can't contain characters '(' or ').")
 
-    if operation != 0 and operation != 1:
-        raise Exception("Operation must be 0 or 1")
-    if operation == 1 and to != "0xA1dabEF33b3B82c7814B6D82A79e50F4AC44102B":
-        raise Exception(
-            "Inconsistent input, to-address must always be '0xA1dabEF33b3B82c7814B6D82A79e50F4AC44102B' for operation '1'"
-        )
+    validate_transaction(operation, to)
 
     addresses = []
     for signer in signers:
@@ -69,6 +66,15 @@ def validate(
         raise Exception("All relayer addresses must be unique.")
 
 
+def validate_transaction(operation: int, to: str):
+    if operation != 0 and operation != 1:
+        raise Exception("Operation must be 0 or 1")
+    if operation == 1 and to != "0xA1dabEF33b3B82c7814B6D82A79e50F4AC44102B":
+        raise Exception(
+            "Inconsistent input, to-address must always be '0xA1dabEF33b3B82c7814B6D82A79e50F4AC44102B' for operation '1'"
+        )
+
+
 def _validate_wallet_fields(entry: dict):
     wallet = entry["wallet"]
     name = entry["name"]
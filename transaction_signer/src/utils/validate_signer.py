@@ -2,9 +2,24 @@ import inquirer
 
 
 def validate(
-    safe: any, all_signatures: dict, transaction_hash: str, signer: dict
+    safe: any,
+    all_signatures: dict,
+    transaction_hash: str,
+    signer: dict,
+    owners: set | None = None,
 ) -> bool:
-    if safe.functions.isOwner(signer["address"]).call():
+    """
+    Validate that a signer is an owner of the Safe, and can (re)sign the transaction.
+
+    :param safe: The Safe contract.
+    :param all_signatures: Dict mapping each transaction hash to a dict of signer addresses and signatures.
+    :param transaction_hash: The hash of the transaction to sign.
+    :param signer: The signer.
+    :param owners: The lowercase owner addresses of the Safe, read once per session.
+        If not given, the Safe is called to check the signer.
+    :return: True if the signer can sign the transaction.
+    """
+    if is_owner(safe, signer["address"], owners):
         # Check if signer already has a signature for the given message hash.
         if all_signatures.get(transaction_hash, {}).get(signer["address"], "") != "":
             # If yes, user must confirm to sign again.
@@ -27,3 +42,19 @@ def validate(
         )
     # Return False if not successful.
     return False
+
+
+def is_owner(safe: any, address: str, owners: set | None = None) -> bool:
+    if owners is None:
+        return safe.functions.isOwner(address).call()
+    return address.lower() in owners
+
+
+def get_owners(owners: list) -> set:
+    """
+    Get the owner addresses of a Safe as a set, to check many signers without RPC calls.
+
+    :param owners: The owners of the Safe, as returned by getOwners.
+    :return: The lowercase owner addresses.
+    """
+    return {owner.lower() for owner in owners}
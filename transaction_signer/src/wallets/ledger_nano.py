@@ -1,12 +1,16 @@
-import rlp
+import itertools
 import struct
+import time
+
+import src.wallets.serializer as serializer
 
-from eth_utils import keccak, to_bytes
-from hexbytes import HexBytes
 from ledgerblue.comm import getDongle
 from ledgerblue.commException import CommException
 from web3.datastructures import AttributeDict
 
+# The Ledger Ethereum app accepts up to 255 bytes per APDU payload.
+CHUNK_SIZE = 255
+
 
 def sign_typed_data_hash(
     signer_index: int, signer_address: str, domain_hash: bytes, message_hash: bytes
@@ -112,39 +116,19 @@ def sign_transaction(
 
     # Sign transaction.
     try:
-        (v, r, s) = _sign_transaction(dongle, dongle_path, unsigned_safe_tx)
-        dongle.close()
-
-        # RLP encoding
-        signed_raw_tx = HexBytes(
-            "0x02"
-            + rlp.encode(
-                [
-                    unsigned_safe_tx["chainId"],
-                    unsigned_safe_tx["nonce"],
-                    unsigned_safe_tx["maxPriorityFeePerGas"],
-                    unsigned_safe_tx["maxFeePerGas"],
-                    unsigned_safe_tx["gas"],
-                    to_bytes(hexstr=unsigned_safe_tx["to"]),
-                    unsigned_safe_tx["value"],
-                    to_bytes(hexstr=unsigned_safe_tx["data"]),
-                    [],  # Access list
-                    v,
-                    int.from_bytes(r, "big"),
-                    int.from_bytes(s, "big"),
-                ],
-                sedes=None,
-            ).hex()
+        # The fields are encoded once, for the signing payload and the signed transaction.
+        encoded = serializer.encode(unsigned_safe_tx)
+        timings = []
+        (v, r, s) = _sign_transaction(
+            dongle, dongle_path, serializer.iter_payload(encoded), timings
         )
+        dongle.close()
+        _print_timings(timings)
 
         signed_tx = AttributeDict(
-            {
-                "raw_transaction": signed_raw_tx,
-                "hash": HexBytes(keccak(signed_raw_tx)),
-                "r": int.from_bytes(r, "big"),
-                "s": int.from_bytes(s, "big"),
-                "v": v,
-            }
+            serializer.to_signed_tx(
+                encoded, v, int.from_bytes(r, "big"), int.from_bytes(s, "big")
+            )
         )
         return signed_tx
     except CommException as e:
@@ -157,6 +141,17 @@ def sign_transaction(
         return None
 
 
+def _print_timings(timings: list):
+    if not timings:
+        return
+    # The last APDU waits for the confirmation on the device.
+    transfer = timings[:-1]
+    print(
+        f"Sent the transaction in {len(timings)} APDUs: {sum(transfer):.2f}s transfer "
+        f"(slowest APDU {max(transfer, default=0) * 1000:.0f}ms), {timings[-1]:.2f}s to confirm."
+    )
+
+
 def _safe_close(device):
     try:
         device.close()
@@ -233,46 +228,53 @@ def _sign_typed_data_hash(
     return signature
 
 
-def _sign_transaction(dongle: any, dongle_path: bytes, unsigned_safe_tx: dict) -> tuple:
-    # RLP-encode the unsigned EIP-1559 transaction.
-    encoded_tx = rlp.encode(
-        [
-            unsigned_safe_tx["chainId"],
-            unsigned_safe_tx["nonce"],
-            unsigned_safe_tx["maxPriorityFeePerGas"],
-            unsigned_safe_tx["maxFeePerGas"],
-            unsigned_safe_tx["gas"],
-            to_bytes(hexstr=unsigned_safe_tx["to"]),
-            unsigned_safe_tx["value"],
-            to_bytes(hexstr=unsigned_safe_tx["data"]),
-            [],
-        ],
-        sedes=None,
-    )
-    # EIP-1559 tx type prefix.
-    payload = b"\x02" + encoded_tx
-
+def _sign_transaction(
+    dongle: any, dongle_path: bytes, payload: any, timings: list | None = None
+) -> tuple:
     # First chunk includes the BIP32 path.
     path_len = len(dongle_path) // 4
-    first_chunk = bytes([path_len]) + dongle_path + payload
-    chunks = [first_chunk]
-
-    # The Ledger Ethereum app accepts up to 255 bytes per APDU payload.
-    while len(chunks[-1]) > 255:
-        oversized = chunks.pop()
-        chunks.append(oversized[:255])
-        chunks.append(oversized[255:])
+    if isinstance(payload, (bytes, bytearray)):
+        payload = [payload]
 
     result = None
-    for i, chunk in enumerate(chunks):
+    for i, chunk in enumerate(
+        iter_chunks(itertools.chain([bytes([path_len]), dongle_path], payload))
+    ):
         # P1: 0x00 for first chunk, 0x80 for subsequent chunks.
         p1 = 0x00 if i == 0 else 0x80
         apdu = bytearray.fromhex("e004") + bytes([p1, 0x02])
         apdu.append(len(chunk))
         apdu += chunk
+        started = time.perf_counter()
         result = dongle.exchange(bytes(apdu))
+        if timings is not None:
+            timings.append(time.perf_counter() - started)
 
     v = result[0]
     r = bytes(result[1 : 1 + 32])
     s = bytes(result[1 + 32 : 1 + 64])
     return (v, r, s)
+
+
+def iter_chunks(pieces: any, size: int = CHUNK_SIZE) -> iter:
+    """
+    Split a stream of byte pieces into chunks of at most size bytes.
+
+    Pieces are sliced through memoryviews, so a large payload is copied once into its chunks.
+
+    :param pieces: Iterable of bytes-like pieces.
+    :param size: The maximum size of a chunk.
+    :return: Iterator over the chunks.
+    """
+    chunk = bytearray()
+    for piece in pieces:
+        view = memoryview(piece)
+        while view:
+            taken = view[: size - len(chunk)]
+            chunk += taken
+            view = view[len(taken) :]
+            if len(chunk) == size:
+                yield bytes(chunk)
+                chunk = bytearray()
+    if chunk:
+        yield bytes(chunk)
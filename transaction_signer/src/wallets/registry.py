@@ -0,0 +1,22 @@
+import importlib
+
+# The module implementing each wallet type.
+# Modules are only imported on first use, as the hardware wallet libraries are slow to import.
+WALLET_MODULES = {
+    "HOT": "src.wallets.hot_wallet",
+    "T": "src.wallets.trezor_t",
+    "1": "src.wallets.trezor_1",
+    "L": "src.wallets.ledger_nano",
+}
+
+
+def get_wallet(wallet: str) -> any:
+    """
+    Returns the module implementing a wallet type, importing it on first use.
+
+    :param wallet: The wallet type ("HOT", "T", "1" or "L").
+    :return: The wallet module.
+    """
+    if wallet not in WALLET_MODULES:
+        raise Exception(f"Unknown wallet type '{wallet}'.")
+    return importlib.import_module(WALLET_MODULES[wallet])
@@ -0,0 +1,163 @@
+import rlp
+
+from eth_utils import keccak, to_bytes
+from hexbytes import HexBytes
+from rlp.codec import length_prefix
+
+# Offset of the RLP prefix of a list.
+LIST_OFFSET = 0xC0
+
+LEGACY = 0
+ACCESS_LIST = 1
+DYNAMIC_FEE = 2
+
+
+def get_type(unsigned_tx: dict) -> int:
+    """
+    Get the type of a transaction.
+
+    :param unsigned_tx: The unsigned transaction.
+    :return: LEGACY, ACCESS_LIST (EIP-2930) or DYNAMIC_FEE (EIP-1559).
+    """
+    if "type" in unsigned_tx:
+        tx_type = unsigned_tx["type"]
+        return int(tx_type, 16) if isinstance(tx_type, str) else int(tx_type)
+    if "maxFeePerGas" in unsigned_tx:
+        return DYNAMIC_FEE
+    if "accessList" in unsigned_tx:
+        return ACCESS_LIST
+    return LEGACY
+
+
+def encode(unsigned_tx: dict) -> dict:
+    """
+    RLP-encode the fields of an unsigned transaction once, for signing and for the signed transaction.
+
+    The encoded fields are the body of both the signing payload and the signed transaction,
+    the signed transaction only appends v, r and s, so the calldata is never encoded twice.
+
+    :param unsigned_tx: The unsigned transaction.
+    :return: Dict with the type, the encoded fields (body) and the encoded items after the body to sign.
+    """
+    tx_type = get_type(unsigned_tx)
+    fields = _get_fields(unsigned_tx, tx_type)
+    body = _encode_items(fields)
+
+    # EIP-155 replay protection signs the chain id in place of v, r and s.
+    tail = [unsigned_tx["chainId"], 0, 0] if tx_type == LEGACY else []
+    return {"type": tx_type, "body": body, "tail": _encode_items(tail)}
+
+
+def iter_payload(encoded: dict) -> iter:
+    """
+    Stream the payload to sign in pieces, without concatenating the body into one new buffer.
+
+    :param encoded: The encoded unsigned transaction, see encode.
+    :return: Iterator over the pieces of the payload.
+    """
+    return _iter_envelope(encoded["type"], encoded["body"], encoded["tail"])
+
+
+def get_payload(encoded: dict) -> bytes:
+    """
+    Get the payload to sign.
+
+    :param encoded: The encoded unsigned transaction, see encode.
+    :return: The payload, its keccak hash is signed.
+    """
+    return b"".join(iter_payload(encoded))
+
+
+def encode_signed(encoded: dict, v: int, r: int, s: int) -> HexBytes:
+    """
+    Get the raw signed transaction, from the encoded unsigned transaction and the signature.
+
+    :param encoded: The encoded unsigned transaction, see encode.
+    :param v: The v value of the signature (the y parity for typed transactions).
+    :param r: The r value of the signature.
+    :param s: The s value of the signature.
+    :return: The raw signed transaction.
+    """
+    return HexBytes(
+        b"".join(
+            _iter_envelope(encoded["type"], encoded["body"], _encode_items([v, r, s]))
+        )
+    )
+
+
+def to_signed_tx(encoded: dict, v: int, r: int, s: int) -> dict:
+    """
+    Get the signed transaction, in the format of eth_account.
+
+    :param encoded: The encoded unsigned transaction, see encode.
+    :param v: The v value of the signature.
+    :param r: The r value of the signature.
+    :param s: The s value of the signature.
+    :return: Dict with the raw transaction, its hash, and v, r and s.
+    """
+    raw_transaction = encode_signed(encoded, v, r, s)
+    return {
+        "raw_transaction": raw_transaction,
+        "hash": HexBytes(keccak(raw_transaction)),
+        "r": r,
+        "s": s,
+        "v": v,
+    }
+
+
+def encode_access_list(access_list: list) -> list:
+    """
+    Get the RLP items of an EIP-2930 access list.
+
+    :param access_list: List of dicts with an address and its storage keys.
+    :return: The RLP items.
+    """
+    return [
+        [
+            to_bytes(hexstr=entry["address"]),
+            [to_bytes(hexstr=key) for key in entry["storageKeys"]],
+        ]
+        for entry in access_list
+    ]
+
+
+def _get_fields(unsigned_tx: dict, tx_type: int) -> list:
+    common = [
+        unsigned_tx["gas"],
+        to_bytes(hexstr=unsigned_tx["to"]),
+        unsigned_tx["value"],
+        to_bytes(hexstr=unsigned_tx["data"]),
+    ]
+    if tx_type == LEGACY:
+        return [unsigned_tx["nonce"], unsigned_tx["gasPrice"], *common]
+
+    access_list = encode_access_list(unsigned_tx.get("accessList", []))
+    if tx_type == ACCESS_LIST:
+        return [
+            unsigned_tx["chainId"],
+            unsigned_tx["nonce"],
+            unsigned_tx["gasPrice"],
+            *common,
+            access_list,
+        ]
+    return [
+        unsigned_tx["chainId"],
+        unsigned_tx["nonce"],
+        unsigned_tx["maxPriorityFeePerGas"],
+        unsigned_tx["maxFeePerGas"],
+        *common,
+        access_list,
+    ]
+
+
+def _encode_items(items: list) -> bytes:
+    return b"".join(rlp.encode(item) for item in items)
+
+
+def _iter_envelope(tx_type: int, body: bytes, tail: bytes) -> iter:
+    # Typed transactions are prefixed by their type, a list by the length of its items.
+    if tx_type != LEGACY:
+        yield bytes([tx_type])
+    yield length_prefix(len(body) + len(tail), LIST_OFFSET)
+    yield body
+    yield tail
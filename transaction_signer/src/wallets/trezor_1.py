@@ -1,8 +1,7 @@
-import rlp
+import src.wallets.serializer as serializer
 
-from eth_utils import keccak, to_bytes
-from hexbytes import HexBytes
-from trezorlib import ethereum
+from eth_utils import to_bytes
+from trezorlib import ethereum, messages
 from trezorlib.client import TrezorClient
 from trezorlib.tools import parse_path
 from trezorlib.transport import get_transport, TransportException
@@ -114,39 +113,23 @@ def sign_transaction(
             chain_id=unsigned_safe_tx["chainId"],
             max_gas_fee=unsigned_safe_tx["maxFeePerGas"],
             max_priority_fee=unsigned_safe_tx["maxPriorityFeePerGas"],
+            access_list=[
+                messages.EthereumAccessList(
+                    address=entry["address"],
+                    storage_keys=[to_bytes(hexstr=key) for key in entry["storageKeys"]],
+                )
+                for entry in unsigned_safe_tx.get("accessList", [])
+            ],
         )
         client.close()
 
-        # RLP encoding
-        signed_raw_tx = HexBytes(
-            "0x02"
-            + rlp.encode(
-                [
-                    unsigned_safe_tx["chainId"],
-                    unsigned_safe_tx["nonce"],
-                    unsigned_safe_tx["maxPriorityFeePerGas"],
-                    unsigned_safe_tx["maxFeePerGas"],
-                    unsigned_safe_tx["gas"],
-                    to_bytes(hexstr=unsigned_safe_tx["to"]),
-                    unsigned_safe_tx["value"],
-                    to_bytes(hexstr=unsigned_safe_tx["data"]),
-                    [],  # Access list
-                    v,
-                    int.from_bytes(r, "big"),
-                    int.from_bytes(s, "big"),
-                ],
-                sedes=None,
-            ).hex()
-        )
-
         signed_tx = AttributeDict(
-            {
-                "raw_transaction": signed_raw_tx,
-                "hash": HexBytes(keccak(signed_raw_tx)),
-                "r": int.from_bytes(r, "big"),
-                "s": int.from_bytes(s, "big"),
-                "v": v,
-            }
+            serializer.to_signed_tx(
+                serializer.encode(unsigned_safe_tx),
+                v,
+                int.from_bytes(r, "big"),
+                int.from_bytes(s, "big"),
+            )
         )
         return signed_tx
     except Exception as e:
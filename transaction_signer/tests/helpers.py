@@ -1,5 +1,8 @@
 from unittest.mock import MagicMock
 
+from eth_abi import encode
+from eth_utils import keccak
+
 SAFE_TX_CONSTANTS = {
     "VALUE_SAFE_TX": 0,
     "SAFE_TX_GAS": 0,
@@ -20,6 +23,33 @@ ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
 
 HW_SIGNER_ADDRESS = "0x1234567890abcdef1234567890abcdef12345678"
 
+
+def make_approved_hash_signature(owner):
+    # Safe signature of an owner that approved the hash on-chain (v = 1), valid for any hash.
+    return "00" * 12 + owner[2:].lower() + "00" * 32 + "01"
+
+
+def make_record(safe, nonce, chain_id=8453, raw_data="0x1234"):
+    # Safe transaction as recorded in the signature store with its first signature.
+    return {
+        "chain_id": chain_id,
+        "safe": safe,
+        "nonce": nonce,
+        "to": MULTISEND_ADDRESS,
+        "operation": 1,
+        "raw_data": raw_data,
+    }
+
+
+def make_execution_log(safe, safe_tx_hash, event="ExecutionSuccess", payment=0):
+    # Log of the ExecutionSuccess or ExecutionFailure event of a Safe, the fields are not indexed.
+    return {
+        "address": safe,
+        "topics": [keccak(text=f"{event}(bytes32,uint256)")],
+        "data": encode(["bytes32", "uint256"], [bytes.fromhex(safe_tx_hash), payment]),
+    }
+
+
 HW_DOMAIN_HASH = b"\x01" * 32
 HW_MESSAGE_HASH = b"\x02" * 32
 
@@ -0,0 +1,332 @@
+import json
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+from eth_abi import encode
+
+from helpers import (
+    MULTISEND_ADDRESS,
+    RELAY_TX_CONSTANTS,
+    make_approved_hash_signature,
+    make_mock_safe,
+)
+from src.batch import load_queue, run, validate_queue
+from src.eip712_typed_data import get_domain_separator
+from src.safe_reader import SAFE_STATE_CALLS
+from src.utils.signatures import load
+
+SAFE_ADDRESS = "0x1111111111111111111111111111111111111111"
+SIGNER_ADDRESS = "0x2222222222222222222222222222222222222222"
+RELAYER_ADDRESS = "0x3333333333333333333333333333333333333333"
+DOMAIN_SEPARATOR = get_domain_separator(8453, SAFE_ADDRESS)
+SIGNATURE = make_approved_hash_signature(SIGNER_ADDRESS)
+
+with open(os.path.join(os.path.dirname(__file__), "..", "data/abis/safe.json")) as f:
+    SAFE_ABI = json.load(f)
+
+CONSTANTS = {**RELAY_TX_CONSTANTS, "SIGN_MAGIC": "0x1901"}
+
+CHAINS = [{"name": "Base", "chain_id": 8453, "rpc_name": "RPC_BASE"}]
+SIGNERS = [
+    {
+        "name": "Signer",
+        "address": SIGNER_ADDRESS,
+        "wallet": "HOT",
+        "key_name": "KEY_SIGNER",
+    }
+]
+RELAYERS = [
+    {
+        "name": "Relayer",
+        "address": RELAYER_ADDRESS,
+        "wallet": "HOT",
+        "key_name": "KEY_RELAYER",
+    }
+]
+CONFIG_DATA = {
+    "chains": CHAINS,
+    "signers": SIGNERS,
+    "relayers": RELAYERS,
+    "gas": 100000,
+    "max_fee_per_gas": 100,
+    "max_priority_fee_per_gas": 10,
+}
+
+
+def make_transaction(**overrides):
+    return {
+        "chain_id": 8453,
+        "safe": SAFE_ADDRESS,
+        "to": MULTISEND_ADDRESS,
+        "operation": 1,
+        "raw_data": "0x1234",
+        "signers": [SIGNER_ADDRESS],
+        **overrides,
+    }
+
+
+def make_batch_safe(nonce=0):
+    safe = make_mock_safe(nonce=nonce)
+    # Give the state functions their ABI, so they can be encoded in a multicall.
+    for function in SAFE_ABI:
+        if function.get("name") in SAFE_STATE_CALLS.values():
+            call = getattr(safe.functions, function["name"]).return_value
+            call.abi = function
+            call.args = ()
+            call.address = SAFE_ADDRESS
+    return safe
+
+
+def make_batch_w3(nonce=0, threshold=1, owners=None):
+    w3 = MagicMock()
+    w3.eth.contract.return_value = make_batch_safe(nonce=nonce)
+    w3.eth.get_transaction_count.return_value = 0
+    # State of the safe, as returned by the multicall.
+    w3.eth.call.return_value = encode(
+        ["(bool,bytes)[]"],
+        [
+            [
+                (True, encode(["uint256"], [threshold])),
+                (True, encode(["uint256"], [nonce])),
+                (True, encode(["uint256"], [8453])),
+                (True, encode(["bytes32"], [DOMAIN_SEPARATOR])),
+                (True, encode(["address[]"], [owners or [SIGNER_ADDRESS]])),
+            ]
+        ],
+    )
+    return w3
+
+
+class TestLoadQueue:
+    def test_loads_transactions(self, tmp_path):
+        queue_file = tmp_path / "queue.toml"
+        queue_file.write_text(
+            f'transactions = [{{chain_id = 8453, safe = "{SAFE_ADDRESS}", to = "{MULTISEND_ADDRESS}", operation = 1, raw_data = "0x1234"}}]'
+        )
+        queue = load_queue(str(queue_file))
+        assert len(queue) == 1
+        assert queue[0]["safe"] == SAFE_ADDRESS
+
+    def test_empty_queue_raises(self, tmp_path):
+        queue_file = tmp_path / "queue.toml"
+        queue_file.write_text("transactions = []")
+        with pytest.raises(Exception, match="No transactions found"):
+            load_queue(str(queue_file))
+
+
+class TestValidateQueue:
+    def test_valid_queue(self):
+        validate_queue([make_transaction()], CHAINS, SIGNERS, RELAYERS)
+
+    def test_missing_field_raises(self):
+        transaction = make_transaction()
+        del transaction["raw_data"]
+        with pytest.raises(Exception, match="missing field 'raw_data'"):
+            validate_queue([transaction], CHAINS, SIGNERS, RELAYERS)
+
+    def test_unknown_chain_raises(self):
+        with pytest.raises(Exception, match="unknown chain id"):
+            validate_queue([make_transaction(chain_id=1)], CHAINS, SIGNERS, RELAYERS)
+
+    def test_unknown_signer_raises(self):
+        transaction = make_transaction(
+            signers=["0x9999999999999999999999999999999999999999"]
+        )
+        with pytest.raises(Exception, match="unknown signer"):
+            validate_queue([transaction], CHAINS, SIGNERS, RELAYERS)
+
+    def test_unknown_relayer_raises(self):
+        transaction = make_transaction(relayer=SIGNER_ADDRESS)
+        with pytest.raises(Exception, match="unknown relayer"):
+            validate_queue([transaction], CHAINS, SIGNERS, RELAYERS)
+
+    def test_inconsistent_operation_raises(self):
+        transaction = make_transaction(to=SAFE_ADDRESS)
+        with pytest.raises(Exception, match="Inconsistent input"):
+            validate_queue([transaction], CHAINS, SIGNERS, RELAYERS)
+
+
+class TestRun:
+    @patch("src.batch.eip712_typed_data.sign", return_value=SIGNATURE)
+    def test_shares_connection_and_safe_state(self, mock_sign, tmp_path):
+        (tmp_path / "out").mkdir()
+        w3 = make_batch_w3(nonce=7)
+
+        with (
+            patch("src.utils.connections.Web3") as mock_web3,
+            patch.dict("os.environ", {"RPC_BASE": "http://rpc"}),
+        ):
+            mock_web3.return_value = w3
+            w3.eth.chain_id = 8453
+            results = run(
+                str(tmp_path),
+                [make_transaction(), make_transaction(raw_data="0x5678")],
+                CONFIG_DATA,
+                CONSTANTS,
+                [],
+            )
+
+        assert mock_web3.call_count == 1
+        w3.eth.contract.assert_called_once()
+        w3.eth.call.assert_called_once()
+        assert [result["nonce"] for result in results] == [7, 8]
+        assert mock_sign.call_count == 2
+
+    @patch("src.batch.connections.get_w3")
+    @patch("src.batch.eip712_typed_data.sign", return_value=SIGNATURE)
+    def test_saves_signatures(self, _mock_sign, mock_get_w3, tmp_path):
+        (tmp_path / "out").mkdir()
+        mock_get_w3.return_value = make_batch_w3()
+
+        results = run(str(tmp_path), [make_transaction()], CONFIG_DATA, CONSTANTS, [])
+
+        saved = load(str(tmp_path))
+        assert saved[results[0]["transaction_hash"]] == {SIGNER_ADDRESS: SIGNATURE}
+        assert results[0]["signatures"] == 1
+
+    @patch("src.batch.connections.get_w3")
+    @patch("src.batch.eip712_typed_data.sign", return_value=SIGNATURE)
+    def test_skips_existing_signatures(self, mock_sign, mock_get_w3, tmp_path):
+        (tmp_path / "out").mkdir()
+        mock_get_w3.return_value = make_batch_w3()
+        run(str(tmp_path), [make_transaction()], CONFIG_DATA, CONSTANTS, [])
+        run(str(tmp_path), [make_transaction()], CONFIG_DATA, CONSTANTS, [])
+
+        mock_sign.assert_called_once()
+
+    @patch("src.batch.connections.get_w3")
+    @patch("src.batch.eip712_typed_data.sign")
+    def test_skips_non_owner(self, mock_sign, mock_get_w3, tmp_path):
+        (tmp_path / "out").mkdir()
+        mock_get_w3.return_value = make_batch_w3(owners=[RELAYER_ADDRESS])
+
+        results = run(str(tmp_path), [make_transaction()], CONFIG_DATA, CONSTANTS, [])
+
+        mock_sign.assert_not_called()
+        assert results[0]["signatures"] == 0
+
+    @patch("src.batch.connections.get_w3")
+    @patch("src.batch.safe_transaction.sign")
+    @patch("src.batch.eip712_typed_data.sign", return_value=SIGNATURE)
+    def test_builds_without_broadcast(
+        self, _mock_sign, mock_sign_tx, mock_get_w3, tmp_path
+    ):
+        (tmp_path / "out").mkdir()
+        w3 = make_batch_w3()
+        mock_get_w3.return_value = w3
+
+        results = run(
+            str(tmp_path),
+            [make_transaction(relayer=RELAYER_ADDRESS)],
+            CONFIG_DATA,
+            CONSTANTS,
+            [],
+        )
+
+        assert "unsigned_safe_tx" in results[0]
+        mock_sign_tx.assert_not_called()
+        w3.eth.send_raw_transaction.assert_not_called()
+
+    @patch("src.batch.connections.get_w3")
+    @patch("src.batch.safe_transaction.sign")
+    @patch("src.batch.eip712_typed_data.sign", return_value=SIGNATURE)
+    def test_broadcasts_executable_transactions_only(
+        self, _mock_sign, mock_sign_tx, mock_get_w3, tmp_path
+    ):
+        (tmp_path / "out").mkdir()
+        w3 = make_batch_w3(nonce=3)
+        mock_get_w3.return_value = w3
+        mock_sign_tx.return_value = MagicMock(raw_transaction=b"\x02")
+
+        results = run(
+            str(tmp_path),
+            [
+                make_transaction(relayer=RELAYER_ADDRESS),
+                make_transaction(relayer=RELAYER_ADDRESS, nonce=5),
+            ],
+            CONFIG_DATA,
+            CONSTANTS,
+            [],
+            broadcast=True,
+        )
+
+        w3.eth.send_raw_transaction.assert_called_once_with(b"\x02")
+        w3.eth.get_transaction_receipt.assert_called_once()
+        # The relayer nonces are reconciled once the transaction is mined.
+        w3.eth.get_transaction_count.assert_any_call(RELAYER_ADDRESS, "latest")
+        assert "tx_hash" in results[0]
+        assert "tx_hash" not in results[1]
+
+    @patch("src.batch.connections.get_w3")
+    @patch("src.batch.eip712_typed_data.sign", return_value=SIGNATURE)
+    def test_threshold_not_met_does_not_build(self, _mock_sign, mock_get_w3, tmp_path):
+        (tmp_path / "out").mkdir()
+        w3 = make_batch_w3(threshold=2)
+        mock_get_w3.return_value = w3
+
+        results = run(
+            str(tmp_path),
+            [make_transaction(relayer=RELAYER_ADDRESS)],
+            CONFIG_DATA,
+            CONSTANTS,
+            [],
+        )
+
+        assert "unsigned_safe_tx" not in results[0]
+        w3.eth.contract.return_value.functions.execTransaction.assert_not_called()
+
+    @patch("src.batch.connections.get_w3")
+    @patch("src.batch.eip712_typed_data.sign", return_value=SIGNATURE)
+    def test_later_nonce_is_not_estimated(self, _mock_sign, mock_get_w3, tmp_path):
+        (tmp_path / "out").mkdir()
+        w3 = make_batch_w3()
+        w3.eth.estimate_gas.return_value = 100000
+        mock_get_w3.return_value = w3
+
+        results = run(
+            str(tmp_path),
+            [
+                make_transaction(relayer=RELAYER_ADDRESS),
+                make_transaction(relayer=RELAYER_ADDRESS, raw_data="0x5678"),
+            ],
+            {**CONFIG_DATA, "gas": 0},
+            CONSTANTS,
+            [],
+        )
+
+        # The signatures of the next nonce would make the estimate revert.
+        w3.eth.estimate_gas.assert_called_once()
+        assert "unsigned_safe_tx" in results[0]
+        assert "unsigned_safe_tx" not in results[1]
+
+    @patch("src.batch.connections.get_w3")
+    @patch("src.batch.safe_transaction.sign")
+    @patch("src.batch.eip712_typed_data.sign", return_value=SIGNATURE)
+    def test_failed_send_is_recorded(
+        self, _mock_sign, mock_sign_tx, mock_get_w3, tmp_path
+    ):
+        (tmp_path / "out").mkdir()
+        w3 = make_batch_w3()
+        w3.eth.send_raw_transaction.side_effect = Exception("nonce too low")
+        mock_get_w3.return_value = w3
+        mock_sign_tx.return_value = MagicMock(raw_transaction=b"\x02")
+
+        results = run(
+            str(tmp_path),
+            [
+                make_transaction(relayer=RELAYER_ADDRESS),
+                make_transaction(relayer=RELAYER_ADDRESS, raw_data="0x5678"),
+            ],
+            CONFIG_DATA,
+            CONSTANTS,
+            [],
+            broadcast=True,
+        )
+
+        assert results[0]["error"] == "nonce too low"
+        assert "tx_hash" not in results[0]
+        # The rest of the queue is still processed.
+        assert "unsigned_safe_tx" in results[1]
+        # The released relayer nonce is reconciled with the chain.
+        w3.eth.get_transaction_count.assert_any_call(RELAYER_ADDRESS, "latest")
@@ -0,0 +1,81 @@
+from unittest.mock import MagicMock, patch
+
+from helpers import make_mock_safe, make_record
+from src.compaction import get_nonces, run
+from src.utils.signatures import add, load, open_store
+
+CHAIN_ID = 8453
+SAFE_A = "0x1111111111111111111111111111111111111111"
+SAFE_B = "0x2222222222222222222222222222222222222222"
+SIGNER = "0x3333333333333333333333333333333333333333"
+CONFIG_DATA = {
+    "chains": [{"name": "Base", "chain_id": CHAIN_ID, "rpc_name": "RPC_BASE"}]
+}
+
+
+def make_safe(address):
+    safe = make_mock_safe()
+    safe.address = address
+    return safe
+
+
+class TestGetNonces:
+    @patch("src.safe_reader.multicall.aggregate", return_value=[5, None])
+    def test_single_multicall(self, mock_aggregate):
+        w3 = MagicMock()
+        safes = [make_safe(SAFE_A), make_safe(SAFE_B)]
+
+        result = get_nonces(w3, safes)
+
+        mock_aggregate.assert_called_once()
+        assert len(mock_aggregate.call_args[0][1]) == 2
+        # Safes that are not deployed are left out.
+        assert result == {SAFE_A: 5}
+
+    @patch("src.safe_reader.read", side_effect=[{"nonce": 5}, {"nonce": 7}])
+    @patch("src.safe_reader.multicall.aggregate", side_effect=Exception("no code"))
+    def test_falls_back_to_batch_per_safe(self, _mock_aggregate, mock_read, capsys):
+        result = get_nonces(MagicMock(), [make_safe(SAFE_A), make_safe(SAFE_B)])
+
+        assert mock_read.call_count == 2
+        assert result == {SAFE_A: 5, SAFE_B: 7}
+        assert "falling back" in capsys.readouterr().out
+
+
+class TestRun:
+    @patch("src.compaction.get_nonces")
+    @patch("src.compaction.connections.get_w3")
+    def test_removes_signatures_of_executed_transactions(
+        self, mock_get_w3, mock_get_nonces, tmp_path
+    ):
+        (tmp_path / "out").mkdir()
+        store = open_store(str(tmp_path))
+        add(store, "aa" * 32, SIGNER, "sig1", make_record(SAFE_A, 4))
+        add(store, "bb" * 32, SIGNER, "sig2", make_record(SAFE_A, 5))
+        add(store, "cc" * 32, SIGNER, "sig3", make_record(SAFE_B, 1))
+        add(store, "dd" * 32, SIGNER, "sig4")
+        mock_get_nonces.return_value = {SAFE_A: 5, SAFE_B: 1}
+        mock_get_w3.return_value.eth.contract.side_effect = lambda address, abi: (
+            make_safe(address)
+        )
+
+        removed = run(str(tmp_path), CONFIG_DATA, [])
+
+        # One nonce read for all safes of the chain.
+        mock_get_nonces.assert_called_once()
+        safes = mock_get_nonces.call_args[0][1]
+        assert [safe.address for safe in safes] == [SAFE_A, SAFE_B]
+        assert removed == ["aa" * 32]
+        assert set(load(str(tmp_path))) == {"bb" * 32, "cc" * 32, "dd" * 32}
+        assert (tmp_path / "out" / "signatures_archive.jsonl").exists()
+
+    @patch("src.compaction.get_nonces")
+    def test_skips_unknown_chains(self, mock_get_nonces, tmp_path, capsys):
+        (tmp_path / "out").mkdir()
+        store = open_store(str(tmp_path))
+        add(store, "aa" * 32, SIGNER, "sig1", make_record(SAFE_A, 4, chain_id=1))
+
+        assert run(str(tmp_path), CONFIG_DATA, []) == []
+
+        mock_get_nonces.assert_not_called()
+        assert "Skipping the safes on chain 1" in capsys.readouterr().out
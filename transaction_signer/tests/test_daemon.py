@@ -0,0 +1,513 @@
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from eth_account import Account
+from helpers import (
+    MULTISEND_ADDRESS,
+    RELAY_TX_CONSTANTS,
+    make_approved_hash_signature,
+    make_mock_safe,
+)
+from src.daemon import (
+    SAFE_CHECK_INTERVAL,
+    broadcast_safe_tx,
+    create_server,
+    create_state,
+    create_token,
+    get_safe_tx_hash,
+    get_signed_safe_tx,
+    get_unsigned_safe_tx,
+    submit_signature,
+)
+from src.eip712_typed_data import (
+    get_domain_separator,
+    get_transaction_hash,
+    get_typed_data,
+    get_typed_data_hash,
+)
+from src.utils.safe_cache import update
+from src.utils.signatures import load
+
+CHAIN_ID = 8453
+SAFE_ADDRESS = "0x1111111111111111111111111111111111111111"
+OWNER_ADDRESS = "0x2222222222222222222222222222222222222222"
+RELAYER_ADDRESS = "0x3333333333333333333333333333333333333333"
+DOMAIN_SEPARATOR = get_domain_separator(CHAIN_ID, SAFE_ADDRESS)
+SIGNATURE = make_approved_hash_signature(OWNER_ADDRESS)
+TOKEN = "token"
+
+CONSTANTS = {**RELAY_TX_CONSTANTS, "SIGN_MAGIC": "0x1901"}
+CONFIG_DATA = {
+    "chains": [{"name": "Base", "chain_id": CHAIN_ID, "rpc_name": "RPC_BASE"}],
+    "relayers": [
+        {
+            "name": "Relayer",
+            "address": RELAYER_ADDRESS,
+            "wallet": "HOT",
+            "key_name": "KEY_RELAYER",
+        }
+    ],
+    "gas": 100000,
+    "max_fee_per_gas": 100,
+    "max_priority_fee_per_gas": 10,
+}
+
+
+def make_state(tmp_path, threshold=1):
+    (tmp_path / "out").mkdir(exist_ok=True)
+    state = create_state(str(tmp_path), CONFIG_DATA, CONSTANTS, [])
+    w3 = MagicMock()
+    w3.eth.get_transaction_count.return_value = 0
+    state["connections"][CHAIN_ID] = w3
+    state["contracts"][(CHAIN_ID, SAFE_ADDRESS)] = make_mock_safe()
+    update(
+        state["cache"],
+        CHAIN_ID,
+        SAFE_ADDRESS,
+        {
+            "threshold": threshold,
+            "chain_id": CHAIN_ID,
+            "domain_separator": DOMAIN_SEPARATOR,
+            "owners": [OWNER_ADDRESS],
+        },
+        100,
+    )
+    # The cached state was just checked for owner changes.
+    state["checked"][(CHAIN_ID, SAFE_ADDRESS)] = time.monotonic()
+    return state, w3
+
+
+def make_request(**overrides):
+    return {
+        "chain_id": CHAIN_ID,
+        "safe": SAFE_ADDRESS,
+        "to": MULTISEND_ADDRESS,
+        "operation": 1,
+        "raw_data": "0x1234",
+        "nonce": 3,
+        **overrides,
+    }
+
+
+def expected_hash(nonce=3):
+    typed_data = get_typed_data(
+        make_mock_safe(), MULTISEND_ADDRESS, "0x1234", 1, CONSTANTS, nonce, CHAIN_ID
+    )
+    return get_transaction_hash(
+        DOMAIN_SEPARATOR, get_typed_data_hash(typed_data), CONSTANTS
+    )
+
+
+def submit(state, transaction_hash):
+    return submit_signature(
+        state,
+        {
+            "chain_id": CHAIN_ID,
+            "safe": SAFE_ADDRESS,
+            "transaction_hash": transaction_hash,
+            "signer": OWNER_ADDRESS,
+            "signature": "0x" + SIGNATURE,
+        },
+    )
+
+
+class TestGetSafeTxHash:
+    def test_given_nonce_needs_no_rpc(self, tmp_path):
+        state, w3 = make_state(tmp_path)
+
+        result = get_safe_tx_hash(state, make_request())
+
+        assert result == {
+            "safe": SAFE_ADDRESS,
+            "nonce": 3,
+            "transaction_hash": expected_hash(),
+            "signatures": 0,
+            "threshold": 1,
+        }
+        assert w3.mock_calls == []
+
+    @patch("src.daemon.safe_cache.read_safe_state")
+    def test_reads_current_nonce(self, mock_read, tmp_path):
+        state, w3 = make_state(tmp_path)
+        mock_read.return_value = {
+            "threshold": 1,
+            "nonce": 8,
+            "chain_id": CHAIN_ID,
+            "domain_separator": DOMAIN_SEPARATOR,
+            "owners": [OWNER_ADDRESS],
+        }
+        request = make_request()
+        del request["nonce"]
+
+        result = get_safe_tx_hash(state, request)
+
+        mock_read.assert_called_once()
+        assert result["transaction_hash"] == expected_hash(nonce=8)
+
+    @patch("src.daemon.safe_cache.read_safe_state")
+    def test_given_nonce_checks_owners_after_interval(self, mock_read, tmp_path):
+        state, _ = make_state(tmp_path)
+        state["checked"][(CHAIN_ID, SAFE_ADDRESS)] -= SAFE_CHECK_INTERVAL
+        mock_read.return_value = {
+            "threshold": 2,
+            "nonce": 8,
+            "chain_id": CHAIN_ID,
+            "domain_separator": DOMAIN_SEPARATOR,
+            "owners": [OWNER_ADDRESS],
+        }
+
+        result = get_safe_tx_hash(state, make_request())
+        get_safe_tx_hash(state, make_request())
+
+        # The state with the threshold changed since the cached block is used.
+        mock_read.assert_called_once()
+        assert result["nonce"] == 3
+        assert result["threshold"] == 2
+
+    @patch("src.daemon.safe_cache.read_safe_state")
+    def test_other_chain_raises_before_saving(self, mock_read, tmp_path):
+        state, _ = make_state(tmp_path)
+        mock_read.return_value = {
+            "threshold": 1,
+            "nonce": 8,
+            "chain_id": 1,
+            "domain_separator": DOMAIN_SEPARATOR,
+            "owners": [OWNER_ADDRESS],
+        }
+        request = make_request()
+        del request["nonce"]
+
+        with pytest.raises(Exception, match="Chain Id is 1, expected 8453"):
+            get_safe_tx_hash(state, request)
+        assert not (tmp_path / "out" / "safe_cache.json").exists()
+
+    def test_missing_field_raises(self, tmp_path):
+        state, _ = make_state(tmp_path)
+        request = make_request()
+        del request["to"]
+        with pytest.raises(Exception, match="missing field 'to'"):
+            get_safe_tx_hash(state, request)
+
+
+class TestSubmitSignature:
+    def test_stores_signature(self, tmp_path):
+        state, _ = make_state(tmp_path)
+
+        result = submit(state, "0x" + expected_hash())
+
+        assert result == {
+            "transaction_hash": expected_hash(),
+            "signatures": 1,
+            "threshold": 1,
+        }
+        assert load(str(tmp_path)) == {expected_hash(): {OWNER_ADDRESS: SIGNATURE}}
+        assert get_safe_tx_hash(state, make_request())["signatures"] == 1
+
+    def test_records_transaction_of_computed_hash(self, tmp_path):
+        state, _ = make_state(tmp_path)
+        get_safe_tx_hash(state, make_request())
+
+        submit(state, expected_hash())
+
+        transaction = state["signatures"]["transactions"][expected_hash()]
+        assert transaction["safe"] == SAFE_ADDRESS
+        assert transaction["nonce"] == 3
+
+    def test_non_owner_raises(self, tmp_path):
+        state, _ = make_state(tmp_path)
+        with pytest.raises(Exception, match="not an owner"):
+            submit_signature(
+                state,
+                {
+                    "chain_id": CHAIN_ID,
+                    "safe": SAFE_ADDRESS,
+                    "transaction_hash": expected_hash(),
+                    "signer": RELAYER_ADDRESS,
+                    "signature": "aa" * 65,
+                },
+            )
+
+    @patch("src.daemon.safe_cache.read_safe_state")
+    def test_removed_owner_raises_after_interval(self, mock_read, tmp_path):
+        state, _ = make_state(tmp_path)
+        state["checked"][(CHAIN_ID, SAFE_ADDRESS)] -= SAFE_CHECK_INTERVAL
+        mock_read.return_value = {
+            "threshold": 1,
+            "nonce": 8,
+            "chain_id": CHAIN_ID,
+            "domain_separator": DOMAIN_SEPARATOR,
+            "owners": [RELAYER_ADDRESS],
+        }
+
+        with pytest.raises(Exception, match="not an owner"):
+            submit(state, expected_hash())
+
+    def test_signature_of_another_signer_raises(self, tmp_path):
+        state, _ = make_state(tmp_path)
+        account = Account.from_key(b"\x01" * 32)
+        signature = account.unsafe_sign_hash(bytes.fromhex(expected_hash()))
+        with pytest.raises(Exception, match=f"recovers to {account.address}"):
+            submit_signature(
+                state,
+                {
+                    "chain_id": CHAIN_ID,
+                    "safe": SAFE_ADDRESS,
+                    "transaction_hash": expected_hash(),
+                    "signer": OWNER_ADDRESS,
+                    "signature": signature.signature.hex(),
+                },
+            )
+        assert expected_hash() not in state["signatures"]["signatures"]
+
+    def test_stores_contract_signature_with_data(self, tmp_path):
+        state, _ = make_state(tmp_path)
+        data = b"\x12" * 70
+        signature = (
+            "00" * 12 + OWNER_ADDRESS[2:] + f"{65:064x}00{len(data):064x}" + data.hex()
+        )
+
+        result = submit_signature(
+            state,
+            {
+                "chain_id": CHAIN_ID,
+                "safe": SAFE_ADDRESS,
+                "transaction_hash": expected_hash(),
+                "signer": OWNER_ADDRESS,
+                "signature": signature,
+            },
+        )
+
+        assert result["signatures"] == 1
+
+    def test_contract_signature_with_invalid_length_raises(self, tmp_path):
+        state, _ = make_state(tmp_path)
+        signature = "00" * 12 + OWNER_ADDRESS[2:] + f"{65:064x}00{70:064x}" + "12"
+        with pytest.raises(Exception, match="invalid length"):
+            submit_signature(
+                state,
+                {
+                    "chain_id": CHAIN_ID,
+                    "safe": SAFE_ADDRESS,
+                    "transaction_hash": expected_hash(),
+                    "signer": OWNER_ADDRESS,
+                    "signature": signature,
+                },
+            )
+
+    def test_malformed_signature_raises(self, tmp_path):
+        state, _ = make_state(tmp_path)
+        with pytest.raises(Exception, match="65 bytes"):
+            submit_signature(
+                state,
+                {
+                    "chain_id": CHAIN_ID,
+                    "safe": SAFE_ADDRESS,
+                    "transaction_hash": expected_hash(),
+                    "signer": OWNER_ADDRESS,
+                    "signature": "zz" * 65,
+                },
+            )
+
+
+class TestSafeTx:
+    def test_below_threshold_raises(self, tmp_path):
+        state, _ = make_state(tmp_path, threshold=2)
+        submit(state, expected_hash())
+        with pytest.raises(Exception, match="1/2 valid signatures"):
+            get_unsigned_safe_tx(state, make_request(relayer=RELAYER_ADDRESS))
+
+    def test_unknown_relayer_raises(self, tmp_path):
+        state, _ = make_state(tmp_path)
+        with pytest.raises(Exception, match="Unknown relayer"):
+            get_unsigned_safe_tx(state, make_request(relayer=OWNER_ADDRESS))
+
+    @patch("src.daemon.safe_transaction.create")
+    def test_builds_with_collected_signatures(self, mock_create, tmp_path):
+        state, w3 = make_state(tmp_path)
+        submit(state, expected_hash())
+        mock_create.return_value = {"nonce": 0}
+
+        result = get_unsigned_safe_tx(state, make_request(relayer=RELAYER_ADDRESS))
+
+        assert result == {"nonce": 0}
+        args = mock_create.call_args[0]
+        assert args[0] is w3
+        assert args[6] == bytes.fromhex(SIGNATURE)
+        assert args[7] == RELAYER_ADDRESS
+        assert args[8] == 100000
+
+    @patch("src.daemon.safe_transaction.sign")
+    @patch("src.daemon.safe_transaction.create", return_value={"nonce": 0})
+    def test_broadcast_sends_signed_tx(self, _mock_create, mock_sign, tmp_path):
+        state, w3 = make_state(tmp_path)
+        submit(state, expected_hash())
+        mock_sign.return_value.raw_transaction = b"\x02\x01"
+
+        result = broadcast_safe_tx(state, make_request(relayer=RELAYER_ADDRESS))
+
+        w3.eth.send_raw_transaction.assert_called_once_with(b"\x02\x01")
+        assert result["tx_hash"].startswith("0x")
+
+    @patch("src.daemon.safe_transaction.sign")
+    @patch("src.daemon.safe_transaction.create", return_value={"nonce": 0})
+    def test_broadcasts_back_to_back(self, mock_create, mock_sign, tmp_path):
+        state, w3 = make_state(tmp_path)
+        w3.eth.get_transaction_count.return_value = 4
+        submit(state, expected_hash())
+        mock_sign.return_value.raw_transaction = b"\x02\x01"
+
+        broadcast_safe_tx(state, make_request(relayer=RELAYER_ADDRESS))
+        broadcast_safe_tx(state, make_request(relayer=RELAYER_ADDRESS))
+
+        # The pending count is read once, relayer nonces are handed out locally.
+        w3.eth.get_transaction_count.assert_called_once_with(RELAYER_ADDRESS, "pending")
+        assert [c.args[11] for c in mock_create.call_args_list] == [4, 5]
+
+    @patch("src.daemon.safe_transaction.sign")
+    @patch("src.daemon.safe_transaction.create")
+    def test_hardware_relayer_raises(self, mock_create, mock_sign, tmp_path):
+        state, w3 = make_state(tmp_path)
+        state["relayers"][RELAYER_ADDRESS] = {
+            **state["relayers"][RELAYER_ADDRESS],
+            "wallet": "L",
+        }
+        submit(state, expected_hash())
+
+        for endpoint in (get_signed_safe_tx, broadcast_safe_tx):
+            with pytest.raises(Exception, match="not a hot wallet"):
+                endpoint(state, make_request(relayer=RELAYER_ADDRESS))
+
+        mock_create.assert_not_called()
+        mock_sign.assert_not_called()
+        w3.eth.get_transaction_count.assert_not_called()
+
+    @patch("src.daemon.safe_transaction.sign", return_value=False)
+    @patch("src.daemon.safe_transaction.create", return_value={"nonce": 0})
+    def test_failed_signing_raises(self, _mock_create, _mock_sign, tmp_path):
+        state, w3 = make_state(tmp_path)
+        submit(state, expected_hash())
+        with pytest.raises(Exception, match="could not sign"):
+            broadcast_safe_tx(state, make_request(relayer=RELAYER_ADDRESS))
+        w3.eth.send_raw_transaction.assert_not_called()
+
+
+class TestServer:
+    @pytest.fixture
+    def server(self, tmp_path):
+        state, _ = make_state(tmp_path)
+        server = create_server(state, port=0, token=TOKEN)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+
+    def request(self, server, method, endpoint, body=None, headers=None):
+        if headers is None:
+            headers = {
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {TOKEN}",
+            }
+        connection = http.client.HTTPConnection(*server.server_address)
+        connection.request(
+            method, endpoint, body=json.dumps(body) if body else None, headers=headers
+        )
+        response = connection.getresponse()
+        result = response.status, json.loads(response.read())
+        connection.close()
+        return result
+
+    def test_health(self, server):
+        assert self.request(server, "GET", "/health") == (200, {"status": "ok"})
+
+    def test_safe_tx_hash(self, server):
+        status, body = self.request(server, "POST", "/safe_tx_hash", make_request())
+        assert status == 200
+        assert body["transaction_hash"] == expected_hash()
+
+    def test_unknown_endpoint(self, server):
+        status, _ = self.request(server, "POST", "/unknown", {})
+        assert status == 404
+
+    def test_error_returns_400(self, server):
+        status, body = self.request(server, "POST", "/safe_tx_hash", {})
+        assert status == 400
+        assert "missing field" in body["error"]
+
+    def test_missing_token_returns_401(self, server):
+        status, _ = self.request(
+            server,
+            "POST",
+            "/safe_tx_hash",
+            make_request(),
+            {"Content-Type": "application/json", "Authorization": "Bearer wrong"},
+        )
+        assert status == 401
+
+    def test_form_content_type_returns_415(self, server):
+        # A cross-origin form post can't set the JSON content type.
+        status, _ = self.request(
+            server,
+            "POST",
+            "/safe_tx_hash",
+            make_request(),
+            {
+                "Content-Type": "text/plain",
+                "Authorization": f"Bearer {TOKEN}",
+            },
+        )
+        assert status == 415
+
+    def test_create_token_is_private(self, tmp_path):
+        (tmp_path / "out").mkdir()
+
+        token = create_token(str(tmp_path))
+
+        token_path = tmp_path / "out" / "daemon.token"
+        assert token_path.read_text() == token
+        assert os.stat(token_path).st_mode & 0o777 == 0o600
+        assert create_token(str(tmp_path)) != token
+
+    def test_unix_socket(self, tmp_path):
+        state, _ = make_state(tmp_path)
+        socket_path = str(tmp_path / "daemon.sock")
+        server = create_server(state, socket_path=socket_path)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                client.connect(socket_path)
+                client.sendall(b"GET /health HTTP/1.0\r\n\r\n")
+                response = b""
+                while chunk := client.recv(4096):
+                    response += chunk
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert response.startswith(b"HTTP/1.0 200")
+        assert response.endswith(b'{"status": "ok"}')
+        assert os.stat(socket_path).st_mode & 0o777 == 0o600
+
+    def test_replaces_stale_socket(self, tmp_path):
+        state, _ = make_state(tmp_path)
+        socket_path = str(tmp_path / "daemon.sock")
+        create_server(state, socket_path=socket_path).server_close()
+
+        server = create_server(state, socket_path=socket_path)
+        server.server_close()
+
+    def test_socket_path_of_other_file_raises(self, tmp_path):
+        state, _ = make_state(tmp_path)
+        config = tmp_path / "config_transaction_signer.toml"
+        config.write_text("gas = 0")
+
+        with pytest.raises(Exception, match="is not a socket"):
+            create_server(state, socket_path=str(config))
+        assert config.read_text() == "gas = 0"
@@ -5,7 +5,16 @@ import pytest
 from eth_abi import encode
 from eth_utils import keccak
 from helpers import SAFE_TX_CONSTANTS, make_mock_safe, make_typed_data
-from src.eip712_typed_data import get_typed_data, get_typed_data_hash, sign
+from eth_account.messages import encode_typed_data
+from src.eip712_typed_data import (
+    get_domain_separator,
+    get_safe_tx_hash,
+    get_safe_tx_hashes,
+    get_transaction_hash,
+    get_typed_data,
+    get_typed_data_hash,
+    sign,
+)
 
 SAFE_TX_TYPE_STRING = "SafeTx(address to,uint256 value,bytes data,uint8 operation,uint256 safeTxGas,uint256 baseGas,uint256 gasPrice,address gasToken,address refundReceiver,uint256 nonce)"
 SAFE_TX_TYPEHASH = keccak(text=SAFE_TX_TYPE_STRING)
@@ -143,6 +152,125 @@ class TestGetTypedDataHash:
         assert get_typed_data_hash(data1) != get_typed_data_hash(data2)
 
 
+class TestOfflineHashing:
+    SAFE_ADDRESS = "0x1111111111111111111111111111111111111111"
+    CONSTANTS = {**SAFE_TX_CONSTANTS, "SIGN_MAGIC": "0x1901"}
+
+    def test_domain_separator_matches_eip712_encoding(self):
+        typed_data = make_typed_data(verifying_contract=self.SAFE_ADDRESS)
+        expected = encode_typed_data(full_message=typed_data).header
+        assert get_domain_separator(8453, self.SAFE_ADDRESS) == expected
+
+    def test_domain_separator_depends_on_chain_id(self):
+        assert get_domain_separator(1, self.SAFE_ADDRESS) != get_domain_separator(
+            8453, self.SAFE_ADDRESS
+        )
+
+    def test_matching_on_chain_domain_separator(self):
+        expected = get_domain_separator(8453, self.SAFE_ADDRESS)
+        assert get_domain_separator(8453, self.SAFE_ADDRESS, expected) == expected
+
+    def test_mismatching_on_chain_domain_separator_raises(self):
+        with pytest.raises(Exception, match="Domain separator of safe"):
+            get_domain_separator(8453, self.SAFE_ADDRESS, b"\x01" * 32)
+
+    def test_safe_tx_hash_matches_eip712_encoding(self):
+        typed_data = make_typed_data(nonce=7, verifying_contract=self.SAFE_ADDRESS)
+        signable = encode_typed_data(full_message=typed_data)
+        expected = keccak(b"\x19" + signable.version + signable.header + signable.body)
+
+        result = get_safe_tx_hash(
+            self.SAFE_ADDRESS, 8453, TO, RAW_DATA, 1, 7, self.CONSTANTS
+        )
+
+        assert result == expected.hex()
+
+    def test_safe_tx_hash_matches_online_computation(self):
+        safe = make_mock_safe(nonce=7, address=self.SAFE_ADDRESS)
+        typed_data = get_typed_data(safe, TO, RAW_DATA, 1, self.CONSTANTS)
+        expected = get_transaction_hash(
+            get_domain_separator(8453, self.SAFE_ADDRESS),
+            get_typed_data_hash(typed_data),
+            self.CONSTANTS,
+        )
+
+        result = get_safe_tx_hash(
+            self.SAFE_ADDRESS, 8453, TO, RAW_DATA, 1, 7, self.CONSTANTS
+        )
+
+        assert result == expected
+
+
+class TestGetSafeTxHashes:
+    SAFES = [
+        "0x1111111111111111111111111111111111111111",
+        "0x3333333333333333333333333333333333333333",
+    ]
+    CONSTANTS = {**SAFE_TX_CONSTANTS, "SIGN_MAGIC": "0x1901"}
+
+    def make_safe_txs(self):
+        return [
+            {
+                "safe": safe,
+                "chain_id": chain_id,
+                "to": TO,
+                "raw_data": raw_data,
+                "operation": 1,
+                "nonce": nonce,
+            }
+            for safe in self.SAFES
+            for chain_id in [1, 8453]
+            for raw_data in [RAW_DATA, "0xdeadbeef"]
+            for nonce in range(3)
+        ]
+
+    def test_matches_single_hashing(self):
+        safe_txs = self.make_safe_txs()
+
+        result = get_safe_tx_hashes(safe_txs, self.CONSTANTS)
+
+        expected = []
+        for safe_tx in safe_txs:
+            safe = make_mock_safe(address=safe_tx["safe"])
+            typed_data = get_typed_data(
+                safe,
+                TO,
+                safe_tx["raw_data"],
+                1,
+                self.CONSTANTS,
+                safe_tx["nonce"],
+                safe_tx["chain_id"],
+            )
+            expected.append(
+                get_transaction_hash(
+                    get_domain_separator(safe_tx["chain_id"], safe_tx["safe"]),
+                    get_typed_data_hash(typed_data),
+                    self.CONSTANTS,
+                )
+            )
+        assert result == expected
+        assert len(set(result)) == len(safe_txs)
+
+    def test_uses_constants(self):
+        safe_tx = self.make_safe_txs()[0]
+        constants = {**self.CONSTANTS, "SAFE_TX_GAS": 1}
+        assert get_safe_tx_hashes([safe_tx], constants) != get_safe_tx_hashes(
+            [safe_tx], self.CONSTANTS
+        )
+
+    @patch("src.eip712_typed_data.keccak", wraps=keccak)
+    def test_hashes_shared_data_once(self, mock_keccak):
+        safe_txs = self.make_safe_txs()
+
+        get_safe_tx_hashes(safe_txs, self.CONSTANTS)
+
+        data_hashes = [c for c in mock_keccak.call_args_list if "hexstr" in c.kwargs]
+        assert len(data_hashes) == 2
+
+    def test_empty(self):
+        assert get_safe_tx_hashes([], self.CONSTANTS) == []
+
+
 class TestSignRouting:
     def test_hot_wallet_missing_key_returns_false(self):
         signer = {
@@ -155,7 +283,7 @@ class TestSignRouting:
             result = sign(MagicMock(), signer, {}, b"", b"")
         assert result is False
 
-    @patch("src.eip712_typed_data.hot_wallet.sign_typed_data")
+    @patch("src.wallets.hot_wallet.sign_typed_data")
     def test_hot_wallet_with_key_calls_hot_wallet(self, mock_sign):
         mock_sign.return_value = "0xsig"
         signer = {
@@ -173,7 +301,7 @@ class TestSignRouting:
         assert result == "0xsig"
         mock_sign.assert_called_once_with("0xprivatekey", "0x1234", w3, typed_data)
 
-    @patch("src.eip712_typed_data.trezor_t.sign_typed_data")
+    @patch("src.wallets.trezor_t.sign_typed_data")
     @patch("builtins.input", return_value="")
     def test_trezor_t_routing(self, _mock_input, mock_sign):
         mock_sign.return_value = "0xsig_t"
@@ -183,7 +311,7 @@ class TestSignRouting:
         assert result == "0xsig_t"
         mock_sign.assert_called_once_with(2, "0xABC", {"data": True})
 
-    @patch("src.eip712_typed_data.trezor_1.sign_typed_data_hash")
+    @patch("src.wallets.trezor_1.sign_typed_data_hash")
     @patch("builtins.input", return_value="")
     def test_trezor_1_routing(self, _mock_input, mock_sign):
         mock_sign.return_value = "0xsig_1"
@@ -196,7 +324,7 @@ class TestSignRouting:
         assert result == "0xsig_1"
         mock_sign.assert_called_once_with(3, "0xABC", domain_hash, message_hash)
 
-    @patch("src.eip712_typed_data.ledger_nano.sign_typed_data_hash")
+    @patch("src.wallets.ledger_nano.sign_typed_data_hash")
     @patch("builtins.input", return_value="")
     def test_ledger_routing(self, _mock_input, mock_sign):
         mock_sign.return_value = "0xsig_l"
@@ -228,7 +356,7 @@ class TestSignRouting:
         assert "not found" in captured.out
         assert "Test" in captured.out
 
-    @patch("src.eip712_typed_data.hot_wallet.sign_typed_data")
+    @patch("src.wallets.hot_wallet.sign_typed_data")
     def test_hot_wallet_returns_none_on_address_mismatch(self, mock_sign):
         mock_sign.return_value = None
         signer = {
@@ -241,7 +369,7 @@ class TestSignRouting:
             result = sign(MagicMock(), signer, {}, b"", b"")
         assert result is None
 
-    @patch("src.eip712_typed_data.trezor_t.sign_typed_data")
+    @patch("src.wallets.trezor_t.sign_typed_data")
     @patch("builtins.input", return_value="")
     def test_trezor_t_returns_none_on_address_mismatch(self, _mock_input, mock_sign):
         mock_sign.return_value = None
@@ -249,7 +377,7 @@ class TestSignRouting:
         result = sign(MagicMock(), signer, {}, b"", b"")
         assert result is None
 
-    @patch("src.eip712_typed_data.trezor_1.sign_typed_data_hash")
+    @patch("src.wallets.trezor_1.sign_typed_data_hash")
     @patch("builtins.input", return_value="")
     def test_trezor_1_returns_none_on_address_mismatch(self, _mock_input, mock_sign):
         mock_sign.return_value = None
@@ -257,7 +385,7 @@ class TestSignRouting:
         result = sign(MagicMock(), signer, {}, b"\x00" * 32, b"\x00" * 32)
         assert result is None
 
-    @patch("src.eip712_typed_data.ledger_nano.sign_typed_data_hash")
+    @patch("src.wallets.ledger_nano.sign_typed_data_hash")
     @patch("builtins.input", return_value="")
     def test_ledger_returns_none_on_address_mismatch(self, _mock_input, mock_sign):
         mock_sign.return_value = None
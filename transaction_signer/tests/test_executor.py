@@ -0,0 +1,260 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from web3.exceptions import TransactionNotFound
+
+from helpers import (
+    RELAY_TX_CONSTANTS,
+    make_approved_hash_signature,
+    make_execution_log,
+    make_mock_safe,
+    make_record,
+)
+from src.eip712_typed_data import get_safe_tx_hashes
+from src.executor import get_relayers, run
+from src.gas_estimator import get_nonce_override
+from src.utils.signatures import add, open_store
+
+CHAIN_ID = 8453
+SAFE_A = "0x1111111111111111111111111111111111111111"
+SAFE_B = "0x4444444444444444444444444444444444444444"
+OWNER = "0x2222222222222222222222222222222222222222"
+CONSTANTS = {**RELAY_TX_CONSTANTS, "SIGN_MAGIC": "0x1901"}
+RELAYERS = [
+    {
+        "name": f"Relayer {i}",
+        "address": f"0x{i:040x}",
+        "wallet": "HOT",
+        "key_name": f"KEY_{i}",
+    }
+    for i in range(1, 3)
+] + [{"name": "Trezor", "address": f"0x{9:040x}", "wallet": "T", "index": 0}]
+
+
+def make_config(gas=100000):
+    return {
+        "chains": [{"name": "Base", "chain_id": CHAIN_ID, "rpc_name": "RPC_BASE"}],
+        "relayers": RELAYERS,
+        "gas": gas,
+        "max_fee_per_gas": 100,
+        "max_priority_fee_per_gas": 10,
+    }
+
+
+def sign_transaction(store, safe, nonce):
+    transaction = make_record(safe, nonce, raw_data=f"0x{nonce:04x}")
+    (transaction_hash,) = get_safe_tx_hashes([transaction], CONSTANTS)
+    add(
+        store,
+        transaction_hash,
+        OWNER,
+        make_approved_hash_signature(OWNER),
+        transaction,
+    )
+    return transaction_hash
+
+
+def make_receipt(transaction_hashes, status=1):
+    # Receipt with the ExecutionSuccess events of the Safe transactions.
+    return {
+        "status": status,
+        "logs": [
+            make_execution_log(safe, transaction_hash)
+            for transaction_hash in transaction_hashes
+            for safe in (SAFE_A, SAFE_B)
+        ],
+    }
+
+
+def make_w3(executed=()):
+    w3 = MagicMock()
+    # Transaction count per relayer, sent transactions are mined at once.
+    w3.counts = {}
+    w3.eth.get_transaction_count.side_effect = lambda address, block: w3.counts.get(
+        address, 0
+    )
+    w3.eth.contract.side_effect = lambda address, abi: make_mock_safe(address=address)
+    w3.eth.get_transaction_receipt.return_value = make_receipt(executed)
+    return w3
+
+
+def safe_state(nonce, threshold=1):
+    return {"nonce": nonce, "threshold": threshold, "owners": [OWNER]}
+
+
+@pytest.fixture
+def path(tmp_path):
+    (tmp_path / "out").mkdir()
+    return tmp_path
+
+
+def create_transaction(w3, safe, *args):
+    # The built execTransaction transaction, with the relayer nonce and the gas limit,
+    # gas set to zero is estimated.
+    w3.counts[args[5]] = args[9] + 1
+    return {"to": safe.address, "nonce": args[9], "gas": args[6] or 150000}
+
+
+def signed(raw_transaction):
+    return MagicMock(raw_transaction=raw_transaction)
+
+
+class TestGetRelayers:
+    def test_only_hot_wallets(self):
+        assert get_relayers(RELAYERS) == RELAYERS[:2]
+
+    def test_selected_relayers(self):
+        assert get_relayers(RELAYERS, [RELAYERS[1]["address"]]) == [RELAYERS[1]]
+
+    def test_no_relayers_raises(self):
+        with pytest.raises(Exception, match="No hot wallet relayers"):
+            get_relayers(RELAYERS, [RELAYERS[2]["address"]])
+
+
+@patch("src.executor.safe_transaction.sign")
+@patch("src.executor.safe_transaction.create")
+@patch("src.executor.safe_reader.read_safes_state")
+@patch("src.executor.connections.get_w3")
+class TestRun:
+    def test_executes_lanes_in_nonce_order(
+        self, mock_get_w3, mock_read, mock_create, mock_sign, path
+    ):
+        store = open_store(str(path))
+        # Nonce 3 is already executed, nonce 6 is missing before nonce 7.
+        hashes = [sign_transaction(store, SAFE_A, nonce) for nonce in (3, 5, 4, 7)]
+        hashes.append(sign_transaction(store, SAFE_B, 0))
+        w3 = make_w3(hashes)
+        mock_get_w3.return_value = w3
+        mock_read.return_value = {SAFE_A: safe_state(4), SAFE_B: safe_state(0)}
+        mock_create.side_effect = create_transaction
+        mock_sign.side_effect = [signed(bytes([i])) for i in range(3)]
+
+        results = run(str(path), make_config(), CONSTANTS, [])
+
+        assert [(r["safe"], r["nonce"]) for r in results] == [
+            (SAFE_A, 4),
+            (SAFE_A, 5),
+            (SAFE_B, 0),
+        ]
+        # Lanes are assigned round-robin to the hot wallet relayers.
+        assert [r["relayer"] for r in results] == [
+            RELAYERS[0]["address"],
+            RELAYERS[0]["address"],
+            RELAYERS[1]["address"],
+        ]
+        # Relayer nonces are handed out sequentially.
+        assert [c.args[11] for c in mock_create.call_args_list] == [0, 1, 0]
+        assert w3.eth.send_raw_transaction.call_count == 3
+        assert all(r["status"] == 1 for r in results)
+
+    def test_gas_estimation_pipelines_lane(
+        self, mock_get_w3, mock_read, mock_create, mock_sign, path
+    ):
+        store = open_store(str(path))
+        hashes = [sign_transaction(store, SAFE_A, nonce) for nonce in (0, 1, 2)]
+        w3 = make_w3(hashes)
+        mock_get_w3.return_value = w3
+        mock_read.return_value = {SAFE_A: safe_state(0)}
+        mock_create.side_effect = create_transaction
+        mock_sign.side_effect = [signed(bytes([i])) for i in range(3)]
+        events = []
+        w3.eth.send_raw_transaction.side_effect = lambda raw: events.append("send")
+
+        results = run(str(path), make_config(gas=0), CONSTANTS, [])
+
+        # All transactions are sent before the receipts are awaited.
+        assert events == ["send"] * 3
+        assert all(r["status"] == 1 for r in results)
+        # Later transactions are estimated with the nonce of the safe overridden.
+        assert [c.args[8] for c in mock_create.call_args_list] == [0, 0, 0]
+        assert [c.args[16] for c in mock_create.call_args_list] == [
+            None,
+            get_nonce_override(SAFE_A, 1),
+            get_nonce_override(SAFE_A, 2),
+        ]
+
+    def test_failed_send_stops_lane(
+        self, mock_get_w3, mock_read, mock_create, mock_sign, path
+    ):
+        store = open_store(str(path))
+        for nonce in (0, 1):
+            sign_transaction(store, SAFE_A, nonce)
+        w3 = make_w3()
+        mock_get_w3.return_value = w3
+        mock_read.return_value = {SAFE_A: safe_state(0)}
+        mock_create.side_effect = create_transaction
+        mock_sign.return_value = False
+
+        results = run(str(path), make_config(gas=0), CONSTANTS, [])
+
+        assert len(results) == 1
+        assert "tx_hash" not in results[0]
+        w3.eth.send_raw_transaction.assert_not_called()
+
+    def test_failed_execution_is_reported(
+        self, mock_get_w3, mock_read, mock_create, mock_sign, path, capsys
+    ):
+        sign_transaction(open_store(str(path)), SAFE_A, 0)
+        w3 = make_w3()
+        mock_get_w3.return_value = w3
+        mock_read.return_value = {SAFE_A: safe_state(0)}
+        mock_create.side_effect = create_transaction
+        mock_sign.return_value = signed(b"\x01")
+
+        for receipt in (make_receipt([], status=0), make_receipt([])):
+            w3.eth.get_transaction_receipt.return_value = receipt
+
+            (result,) = run(str(path), make_config(), CONSTANTS, [])
+
+            # Mined without the ExecutionSuccess event of the Safe transaction.
+            assert result["status"] == receipt["status"]
+            assert "nonce 0: not executed" in capsys.readouterr().out
+
+    @patch("src.receipt_tracker.TIMEOUT", 0)
+    def test_dropped_transaction_is_reported(
+        self, mock_get_w3, mock_read, mock_create, mock_sign, path, capsys
+    ):
+        sign_transaction(open_store(str(path)), SAFE_A, 0)
+        w3 = make_w3()
+        w3.eth.get_transaction_receipt.side_effect = TransactionNotFound("dropped")
+        mock_get_w3.return_value = w3
+        mock_read.return_value = {SAFE_A: safe_state(0)}
+        # The transaction never reaches the pending count of the relayer.
+        mock_create.side_effect = lambda w3, safe, *args: {
+            "to": safe.address,
+            "nonce": args[9],
+            "gas": args[6],
+        }
+        mock_sign.return_value = signed(b"\x01")
+
+        (result,) = run(str(path), make_config(), CONSTANTS, [])
+
+        assert result["status"] is None
+        assert f"Transaction {result['tx_hash']}" in capsys.readouterr().out
+
+    def test_below_threshold_is_not_executed(
+        self, mock_get_w3, mock_read, mock_create, mock_sign, path
+    ):
+        sign_transaction(open_store(str(path)), SAFE_A, 0)
+        mock_get_w3.return_value = make_w3()
+        mock_read.return_value = {SAFE_A: safe_state(0, threshold=2)}
+
+        assert run(str(path), make_config(), CONSTANTS, []) == []
+        mock_create.assert_not_called()
+
+    def test_record_must_match_hash(
+        self, mock_get_w3, mock_read, mock_create, mock_sign, path, capsys
+    ):
+        store = open_store(str(path))
+        add(
+            store,
+            "ab" * 32,
+            OWNER,
+            make_approved_hash_signature(OWNER),
+            make_record(SAFE_A, 0),
+        )
+        mock_get_w3.return_value = make_w3()
+        mock_read.return_value = {SAFE_A: safe_state(0)}
+
+        assert run(str(path), make_config(), CONSTANTS, []) == []
+        assert "does not match its record" in capsys.readouterr().out
@@ -0,0 +1,115 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+from src.fee_oracle import (
+    create_oracle,
+    estimate_fees,
+    get_fees,
+    get_oracle,
+    resolve,
+    stop,
+)
+
+HISTORY = {
+    "baseFeePerGas": [90, 95, 100, 110],
+    "reward": [[3], [0], [1], [2]],
+}
+
+
+def make_w3(history=HISTORY):
+    w3 = MagicMock()
+    w3.eth.fee_history.return_value = history
+    return w3
+
+
+class TestEstimateFees:
+    def test_uses_next_base_fee_and_median_priority_fee(self):
+        assert estimate_fees(HISTORY) == {
+            "base_fee": 110,
+            # Empty blocks with a reward of zero are left out.
+            "max_priority_fee_per_gas": 2,
+            "max_fee_per_gas": 222,
+        }
+
+    def test_without_rewards(self):
+        fees = estimate_fees({"baseFeePerGas": [100, 100], "reward": [[0]]})
+        assert fees["max_priority_fee_per_gas"] == 0
+        assert fees["max_fee_per_gas"] == 200
+
+
+class TestGetFees:
+    def test_fresh_fees_need_no_rpc_call(self):
+        w3 = make_w3()
+        oracle = create_oracle(w3)
+
+        get_fees(oracle)
+        get_fees(oracle)
+
+        w3.eth.fee_history.assert_called_once_with(10, "latest", [50])
+
+    def test_stale_fees_are_refreshed_in_background(self):
+        w3 = make_w3()
+        oracle = create_oracle(w3, ttl=10)
+        refreshed = threading.Event()
+
+        get_fees(oracle)
+        oracle["updated"] -= 15
+        w3.eth.fee_history.side_effect = lambda *args: (
+            refreshed.set()
+            or {
+                "baseFeePerGas": [200],
+                "reward": [],
+            }
+        )
+        fees = get_fees(oracle)
+
+        # The stale estimate is returned without waiting for the refresh.
+        assert fees["base_fee"] == 110
+        assert refreshed.wait(5)
+
+    def test_old_fees_are_refreshed_synchronously(self):
+        w3 = make_w3()
+        oracle = create_oracle(w3)
+
+        get_fees(oracle)
+        # E.g. after an hour waiting for a hardware wallet.
+        oracle["updated"] -= 3600
+        w3.eth.fee_history.return_value = {"baseFeePerGas": [200], "reward": []}
+        fees = get_fees(oracle)
+
+        assert fees["base_fee"] == 200
+        assert w3.eth.fee_history.call_count == 2
+
+    @patch("src.fee_oracle.start")
+    def test_background_refresh_starts_once_used(self, mock_start):
+        oracles = {}
+        oracle = get_oracle(oracles, make_w3(), 8453, background=True)
+        assert get_oracle(oracles, MagicMock(), 8453) is oracle
+        mock_start.assert_not_called()
+
+        get_fees(oracle)
+        get_fees(oracle)
+
+        mock_start.assert_called_once_with(oracle)
+        stop(oracle)
+
+
+class TestResolve:
+    def test_configured_fees_need_no_rpc_call(self):
+        w3 = make_w3()
+        assert resolve(create_oracle(w3), 100, 10) == (100, 10)
+        w3.eth.fee_history.assert_not_called()
+
+    def test_estimates_max_fee_with_configured_priority_fee(self):
+        assert resolve(create_oracle(make_w3()), 0, 10) == (230, 10)
+
+    def test_estimates_both_fees(self):
+        assert resolve(create_oracle(make_w3()), 0, 0) == (222, 2)
+
+    def test_estimates_priority_fee_only(self):
+        assert resolve(create_oracle(make_w3()), 1000, 0) == (1000, 2)
+
+    def test_priority_fee_is_clamped_to_max_fee(self):
+        # The estimated priority fee of 2 is above the configured max fee.
+        assert resolve(create_oracle(make_w3()), 1, 0) == (1, 1)
+        assert resolve(create_oracle(make_w3()), 5, 10) == (5, 5)
@@ -0,0 +1,181 @@
+from unittest.mock import MagicMock
+
+from helpers import MULTISEND_ADDRESS
+from src.gas_estimator import (
+    DEFAULT_MARGIN,
+    MAX_MARGIN,
+    create_access_list,
+    create_estimator,
+    estimate,
+    get_margin,
+    get_nonce_override,
+    get_payload_hash,
+)
+
+SAFE = "0x1111111111111111111111111111111111111111"
+RELAYER = "0x3333333333333333333333333333333333333333"
+TOKEN = "0x4444444444444444444444444444444444444444"
+ACCESS_LIST = [{"address": TOKEN, "storageKeys": [b"\x01" * 32]}]
+UNSIGNED_TX = {"chainId": 8453, "to": SAFE, "data": "0xabcdef"}
+PAYLOAD_HASH = get_payload_hash(MULTISEND_ADDRESS, 1, "0x1234")
+
+
+def make_w3(block=100, gas_estimate=100000):
+    w3 = MagicMock()
+    w3.eth.block_number = block
+    w3.eth.estimate_gas.return_value = gas_estimate
+    return w3
+
+
+class TestGetPayloadHash:
+    def test_depends_on_content(self):
+        assert PAYLOAD_HASH == get_payload_hash(MULTISEND_ADDRESS, 1, "0x1234")
+        assert PAYLOAD_HASH != get_payload_hash(MULTISEND_ADDRESS, 0, "0x1234")
+        assert PAYLOAD_HASH != get_payload_hash(MULTISEND_ADDRESS, 1, "0x1235")
+
+
+class TestEstimate:
+    def test_reuses_estimate_in_same_block(self):
+        estimator = create_estimator()
+        w3 = make_w3()
+
+        first = estimate(estimator, w3, UNSIGNED_TX, SAFE, PAYLOAD_HASH, 2)
+        second = estimate(estimator, w3, UNSIGNED_TX, SAFE, PAYLOAD_HASH, 2)
+
+        w3.eth.estimate_gas.assert_called_once_with(UNSIGNED_TX, 100, None)
+        assert first == second == int(100000 * DEFAULT_MARGIN)
+
+    def test_signature_count_is_part_of_key(self):
+        estimator = create_estimator()
+        w3 = make_w3()
+
+        estimate(estimator, w3, UNSIGNED_TX, SAFE, PAYLOAD_HASH, 2)
+        estimate(estimator, w3, UNSIGNED_TX, SAFE, PAYLOAD_HASH, 3)
+
+        assert w3.eth.estimate_gas.call_count == 2
+
+    def test_access_list_is_part_of_key(self):
+        estimator = create_estimator()
+        w3 = make_w3()
+
+        estimate(estimator, w3, UNSIGNED_TX, SAFE, PAYLOAD_HASH, 2)
+        estimate(
+            estimator,
+            w3,
+            {**UNSIGNED_TX, "accessList": [{"address": SAFE, "storageKeys": []}]},
+            SAFE,
+            PAYLOAD_HASH,
+            2,
+        )
+
+        assert w3.eth.estimate_gas.call_count == 2
+
+    def test_reestimates_in_new_block(self):
+        estimator = create_estimator()
+        estimate(estimator, make_w3(block=100), UNSIGNED_TX, SAFE, PAYLOAD_HASH, 2)
+        w3 = make_w3(block=101)
+
+        estimate(estimator, w3, UNSIGNED_TX, SAFE, PAYLOAD_HASH, 2)
+
+        w3.eth.estimate_gas.assert_called_once_with(UNSIGNED_TX, 101, None)
+        # Only the estimate of the latest block is kept.
+        assert len(estimator["estimates"]) == 1
+
+
+class TestMargin:
+    def test_measured_from_drift_between_blocks(self):
+        estimator = create_estimator()
+        estimate(estimator, make_w3(block=100), UNSIGNED_TX, SAFE, PAYLOAD_HASH, 2)
+
+        result = estimate(
+            estimator,
+            make_w3(block=101, gas_estimate=115000),
+            UNSIGNED_TX,
+            SAFE,
+            PAYLOAD_HASH,
+            2,
+        )
+
+        # A rise of 15% gives a margin of 30%.
+        assert round(get_margin(estimator), 6) == 1.3
+        assert result == int(115000 * get_margin(estimator))
+
+    def test_stable_estimates_keep_default_margin(self):
+        estimator = create_estimator()
+        for block in (100, 101):
+            estimate(
+                estimator, make_w3(block=block), UNSIGNED_TX, SAFE, PAYLOAD_HASH, 2
+            )
+
+        # The gas used can still exceed an estimate that did not change.
+        assert get_margin(estimator) == DEFAULT_MARGIN
+
+    def test_margin_is_bounded(self):
+        estimator = create_estimator()
+        estimator["drift"] = 1
+        assert get_margin(estimator) == MAX_MARGIN
+
+
+class TestCreateAccessList:
+    def make_w3(self, gas_with, gas_without=200000, gas_used=150000):
+        w3 = MagicMock()
+        # gasUsed of eth_createAccessList is below any gas estimate.
+        w3.eth.create_access_list.return_value = {
+            "accessList": ACCESS_LIST,
+            "gasUsed": gas_used,
+        }
+        w3.eth.estimate_gas.side_effect = lambda transaction, block: (
+            gas_with if "accessList" in transaction else gas_without
+        )
+        return w3
+
+    def test_keeps_access_list_that_lowers_gas(self):
+        w3 = self.make_w3(gas_with=190000)
+        unsigned_tx = {"to": SAFE, "data": "0xabcdef", "gas": 1, "maxFeePerGas": 100}
+
+        access_list, estimated = create_access_list(w3, unsigned_tx, RELAYER, 100)
+
+        assert access_list == [{"address": TOKEN, "storageKeys": ["0x" + "01" * 32]}]
+        assert estimated == 190000
+        # The access list is created for the transaction without gas and fees.
+        w3.eth.create_access_list.assert_called_once_with(
+            {"to": SAFE, "data": "0xabcdef", "from": RELAYER}, 100
+        )
+
+    def test_drops_access_list_that_does_not_lower_gas(self):
+        w3 = self.make_w3(gas_with=200000)
+        unsigned_tx = {"to": SAFE, "data": "0xabcdef"}
+
+        assert create_access_list(w3, unsigned_tx, RELAYER) == (None, 200000)
+
+    def test_drops_access_list_that_costs_gas(self):
+        # The low gasUsed of eth_createAccessList does not make the list pay off.
+        w3 = self.make_w3(gas_with=210000, gas_used=100000)
+        unsigned_tx = {"to": SAFE, "data": "0xabcdef"}
+
+        assert create_access_list(w3, unsigned_tx, RELAYER) == (None, 200000)
+
+    def test_unsupported_rpc_creates_none(self, capsys):
+        w3 = MagicMock()
+        w3.eth.create_access_list.side_effect = Exception("method not found")
+        unsigned_tx = {"to": SAFE, "data": "0xabcdef"}
+
+        assert create_access_list(w3, unsigned_tx, RELAYER) == (None, None)
+        assert "Could not create an access list" in capsys.readouterr().out
+
+
+class TestGetNonceOverride:
+    def test_sets_nonce_slot_of_safe(self):
+        assert get_nonce_override(SAFE, 7) == {
+            SAFE: {"stateDiff": {"0x" + "00" * 31 + "05": "0x" + "00" * 31 + "07"}}
+        }
+
+    def test_estimate_passes_override(self):
+        w3 = make_w3()
+        state_override = get_nonce_override(SAFE, 7)
+
+        estimate(
+            create_estimator(), w3, UNSIGNED_TX, SAFE, PAYLOAD_HASH, 2, state_override
+        )
+
+        w3.eth.estimate_gas.assert_called_once_with(UNSIGNED_TX, 100, state_override)
@@ -1,3 +1,4 @@
+import rlp
 import struct
 from unittest.mock import MagicMock, patch
 
@@ -12,10 +13,12 @@ from src.wallets.ledger_nano import (
     _sign_typed_data_hash,
     get_address,
     get_path,
+    iter_chunks,
     parse_bip32_path,
     sign_transaction,
     sign_typed_data_hash,
 )
+from src.wallets.serializer import encode, get_payload, iter_payload
 
 
 class TestGetPath:
@@ -326,6 +329,24 @@ class TestSignTransaction:
 
         assert result.raw_transaction.hex().startswith("02")
 
+    @patch("src.wallets.ledger_nano._sign_transaction")
+    @patch("src.wallets.ledger_nano.get_address")
+    @patch("src.wallets.ledger_nano.getDongle")
+    def test_raw_transaction_includes_access_list(
+        self, mock_get_dongle, mock_get_addr, mock_sign_tx
+    ):
+        mock_get_dongle.return_value = MagicMock()
+        mock_get_addr.return_value = SIGNER_ADDRESS
+        mock_sign_tx.return_value = (1, b"\x01" * 32, b"\x02" * 32)
+        access_list = [{"address": SIGNER_ADDRESS, "storageKeys": ["0x" + "01" * 32]}]
+
+        result = sign_transaction(
+            0, SIGNER_ADDRESS, {**UNSIGNED_TX, "accessList": access_list}
+        )
+
+        fields = rlp.decode(bytes(result.raw_transaction)[1:])
+        assert fields[8] == [[bytes.fromhex(SIGNER_ADDRESS[2:]), [b"\x01" * 32]]]
+
     @patch("src.wallets.ledger_nano._sign_transaction")
     @patch("src.wallets.ledger_nano.get_address")
     @patch("src.wallets.ledger_nano.getDongle")
@@ -460,7 +481,9 @@ class TestInternalSignTransaction:
         mock_dongle.exchange.return_value = v_byte + r_bytes + s_bytes
         dongle_path = parse_bip32_path("m/44'/60'/0'/0/0")
 
-        v, r, s = _sign_transaction(mock_dongle, dongle_path, UNSIGNED_TX)
+        v, r, s = _sign_transaction(
+            mock_dongle, dongle_path, get_payload(encode(UNSIGNED_TX))
+        )
 
         assert mock_dongle.exchange.call_count == 1
         sent_apdu = mock_dongle.exchange.call_args[0][0]
@@ -477,7 +500,7 @@ class TestInternalSignTransaction:
         dongle_path = parse_bip32_path("m/44'/60'/0'/0/0")
 
         large_tx = {**UNSIGNED_TX, "data": "0x" + "ab" * 300}
-        _sign_transaction(mock_dongle, dongle_path, large_tx)
+        _sign_transaction(mock_dongle, dongle_path, get_payload(encode(large_tx)))
 
         assert mock_dongle.exchange.call_count >= 2
         calls = mock_dongle.exchange.call_args_list
@@ -491,7 +514,7 @@ class TestInternalSignTransaction:
         dongle_path = parse_bip32_path("m/44'/60'/0'/0/0")
 
         large_tx = {**UNSIGNED_TX, "data": "0x" + "ab" * 300}
-        _sign_transaction(mock_dongle, dongle_path, large_tx)
+        _sign_transaction(mock_dongle, dongle_path, get_payload(encode(large_tx)))
 
         for call in mock_dongle.exchange.call_args_list:
             apdu = call[0][0]
@@ -506,8 +529,38 @@ class TestInternalSignTransaction:
         mock_dongle.exchange.return_value = v_byte + r_bytes + s_bytes
         dongle_path = parse_bip32_path("m/44'/60'/0'/0/0")
 
-        v, r, s = _sign_transaction(mock_dongle, dongle_path, UNSIGNED_TX)
+        v, r, s = _sign_transaction(
+            mock_dongle, dongle_path, get_payload(encode(UNSIGNED_TX))
+        )
 
         assert v == 1
         assert r == r_bytes
         assert s == s_bytes
+
+    def test_chunks_carry_path_and_payload_in_order(self):
+        mock_dongle = MagicMock()
+        mock_dongle.exchange.return_value = bytes([1]) + b"\x01" * 64
+        dongle_path = parse_bip32_path("m/44'/60'/0'/0/0")
+        encoded = encode({**UNSIGNED_TX, "data": "0x" + "ab" * 1000})
+        timings = []
+
+        _sign_transaction(mock_dongle, dongle_path, iter_payload(encoded), timings)
+
+        apdus = [call[0][0] for call in mock_dongle.exchange.call_args_list]
+        sent = b"".join(apdu[5:] for apdu in apdus)
+        assert sent == bytes([5]) + dongle_path + get_payload(encoded)
+        # The time of each APDU exchange is recorded.
+        assert len(timings) == len(apdus)
+
+
+class TestIterChunks:
+    def test_chunks_span_pieces(self):
+        pieces = [b"\x01" * 3, b"\x02" * 600, b"", b"\x03" * 2]
+
+        chunks = list(iter_chunks(pieces))
+
+        assert [len(chunk) for chunk in chunks] == [255, 255, 95]
+        assert b"".join(chunks) == b"".join(pieces)
+
+    def test_exact_multiple_has_no_empty_chunk(self):
+        assert list(iter_chunks([b"\x01" * 510])) == [b"\x01" * 255] * 2
@@ -0,0 +1,154 @@
+import json
+
+import pytest
+from eth_account import Account
+
+from helpers import RELAY_TX_CONSTANTS, make_record
+from src.eip712_typed_data import get_safe_tx_hashes
+from src.merge import run
+from src.utils.signatures import add, load, open_store
+
+HASH_A = "ab" * 32
+HASH_B = "cd" * 32
+ACCOUNTS = [Account.from_key(bytes([i]) * 32) for i in range(1, 4)]
+CONSTANTS = {**RELAY_TX_CONSTANTS, "SIGN_MAGIC": "0x1901"}
+
+
+def sign(account, transaction_hash=HASH_A):
+    return account.unsafe_sign_hash(bytes.fromhex(transaction_hash)).signature.hex()
+
+
+def write_store(file_path, entries):
+    file_path.write_text("".join(json.dumps(entry) + "\n" for entry in entries))
+    return str(file_path)
+
+
+def signature_entry(account, transaction_hash=HASH_A, signature=None):
+    return {
+        "transaction_hash": transaction_hash,
+        "signer": account.address,
+        "signature": signature or sign(account, transaction_hash),
+    }
+
+
+@pytest.fixture
+def path(tmp_path):
+    (tmp_path / "out").mkdir()
+    return tmp_path
+
+
+class TestMerge:
+    def test_unions_signatures_of_all_files(self, path):
+        files = [
+            write_store(path / f"signer_{i}.jsonl", [signature_entry(account)])
+            for i, account in enumerate(ACCOUNTS)
+        ]
+
+        result = run(str(path), files, CONSTANTS)
+
+        assert result == {"added": 3, "conflicts": 0, "invalid": 0}
+        assert load(str(path)) == {
+            HASH_A: {account.address: sign(account) for account in ACCOUNTS}
+        }
+
+    def test_reads_legacy_files(self, path):
+        legacy = path / "signatures.txt"
+        legacy.write_text(
+            json.dumps({HASH_A: {ACCOUNTS[0].address: "0x" + sign(ACCOUNTS[0])}})
+        )
+
+        run(str(path), [str(legacy)], CONSTANTS)
+
+        assert load(str(path)) == {HASH_A: {ACCOUNTS[0].address: sign(ACCOUNTS[0])}}
+
+    def test_skips_known_signatures(self, path):
+        add(open_store(str(path)), HASH_A, ACCOUNTS[0].address, sign(ACCOUNTS[0]))
+        file = write_store(path / "other.jsonl", [signature_entry(ACCOUNTS[0])])
+
+        assert run(str(path), [file, file], CONSTANTS)["added"] == 0
+        assert (path / "out" / "signatures.jsonl").read_text().count("\n") == 1
+
+    def test_leaves_out_invalid_signatures(self, path, capsys):
+        file = write_store(
+            path / "other.jsonl",
+            [
+                signature_entry(ACCOUNTS[0]),
+                signature_entry(ACCOUNTS[1], signature=sign(ACCOUNTS[2])),
+            ],
+        )
+
+        result = run(str(path), [file], CONSTANTS)
+
+        assert result == {"added": 1, "conflicts": 0, "invalid": 1}
+        assert load(str(path)) == {HASH_A: {ACCOUNTS[0].address: sign(ACCOUNTS[0])}}
+        assert "is invalid" in capsys.readouterr().out
+
+    def test_conflict_keeps_valid_signature(self, path, capsys):
+        invalid = signature_entry(ACCOUNTS[0], signature=sign(ACCOUNTS[1]))
+        files = [
+            write_store(path / "a.jsonl", [invalid]),
+            write_store(path / "b.jsonl", [signature_entry(ACCOUNTS[0])]),
+        ]
+
+        result = run(str(path), files, CONSTANTS)
+
+        assert result == {"added": 1, "conflicts": 0, "invalid": 1}
+        assert load(str(path)) == {HASH_A: {ACCOUNTS[0].address: sign(ACCOUNTS[0])}}
+
+    def test_conflict_with_valid_local_signature(self, path, capsys):
+        local = sign(ACCOUNTS[0])
+        add(open_store(str(path)), HASH_A, ACCOUNTS[0].address, local)
+        # A different signature of the same signer.
+        other = local[:-2] + ("1c" if local.endswith("1b") else "1b")
+        file = write_store(
+            path / "other.jsonl", [signature_entry(ACCOUNTS[0], signature=other)]
+        )
+
+        result = run(str(path), [file], CONSTANTS, verify=False)
+
+        assert result["conflicts"] == 1
+        assert load(str(path)) == {HASH_A: {ACCOUNTS[0].address: local}}
+        assert "local signature is kept" in capsys.readouterr().out
+
+    def test_merges_transaction_records(self, path):
+        record = make_record(ACCOUNTS[2].address, 4)
+        other = make_record(ACCOUNTS[2].address, 5)
+        transaction_hash, other_hash = get_safe_tx_hashes([record, other], CONSTANTS)
+        file = write_store(
+            path / "other.jsonl",
+            [
+                {"transaction_hash": transaction_hash, **record},
+                signature_entry(ACCOUNTS[0], transaction_hash),
+                # Records of transactions without signatures are not merged.
+                {"transaction_hash": other_hash, **other},
+            ],
+        )
+
+        run(str(path), [file], CONSTANTS)
+
+        assert open_store(str(path))["transactions"] == {transaction_hash: record}
+
+    def test_leaves_out_records_not_matching_their_hash(self, path, capsys):
+        record = make_record(ACCOUNTS[2].address, 4)
+        (transaction_hash,) = get_safe_tx_hashes([record], CONSTANTS)
+        file = write_store(
+            path / "other.jsonl",
+            [
+                # A record with another nonce would make compaction archive the signatures.
+                {"transaction_hash": transaction_hash, **record, "nonce": 0},
+                {"transaction_hash": HASH_A, "chain_id": 1, "safe": "0x1"},
+                # Malformed records are left out without failing the others.
+                {
+                    "transaction_hash": HASH_A,
+                    **make_record(ACCOUNTS[2].address, 4, raw_data="0xzz"),
+                },
+                signature_entry(ACCOUNTS[0], transaction_hash),
+                signature_entry(ACCOUNTS[0]),
+            ],
+        )
+
+        result = run(str(path), [file], CONSTANTS)
+
+        assert result["added"] == 2
+        assert open_store(str(path))["transactions"] == {}
+        assert "does not match its record" in capsys.readouterr().out
@@ -0,0 +1,98 @@
+import json
+import os
+from unittest.mock import MagicMock
+
+import pytest
+from eth_abi import decode, encode
+from web3 import Web3
+
+from src.multicall import AGGREGATE3_SELECTOR, MULTICALL3_ADDRESS, aggregate
+
+SAFE_ADDRESS = "0x1111111111111111111111111111111111111111"
+OWNER = "0x2222222222222222222222222222222222222222"
+
+with open(os.path.join(os.path.dirname(__file__), "..", "data/abis/safe.json")) as f:
+    SAFE_ABI = json.load(f)
+
+SAFE = Web3().eth.contract(address=SAFE_ADDRESS, abi=SAFE_ABI)
+
+
+def make_multicall_w3(results):
+    w3 = MagicMock()
+    w3.eth.call.return_value = encode(["(bool,bytes)[]"], [results])
+    return w3
+
+
+def sent_calls(w3):
+    tx = w3.eth.call.call_args[0][0]
+    assert tx["to"] == MULTICALL3_ADDRESS
+    assert tx["data"][:4] == AGGREGATE3_SELECTOR
+    (calls,) = decode(["(address,bool,bytes)[]"], tx["data"][4:])
+    return calls
+
+
+class TestAggregate:
+    def test_empty_calls_skip_rpc(self):
+        w3 = MagicMock()
+        assert aggregate(w3, []) == []
+        w3.eth.call.assert_not_called()
+
+    def test_single_eth_call(self):
+        w3 = make_multicall_w3(
+            [
+                (True, encode(["uint256"], [2])),
+                (True, encode(["uint256"], [7])),
+            ]
+        )
+
+        result = aggregate(w3, [SAFE.functions.getThreshold(), SAFE.functions.nonce()])
+
+        assert result == [2, 7]
+        w3.eth.call.assert_called_once()
+
+    def test_encodes_calls_with_arguments(self):
+        w3 = make_multicall_w3([(True, encode(["bool"], [True]))])
+
+        aggregate(w3, [SAFE.functions.isOwner(OWNER)])
+
+        ((target, allow_failure, call_data),) = sent_calls(w3)
+        assert target.lower() == SAFE_ADDRESS
+        assert allow_failure is True
+        assert call_data == bytes.fromhex(SAFE.encode_abi("isOwner", [OWNER])[2:])
+
+    def test_decodes_bytes32_and_checksums_addresses(self):
+        w3 = make_multicall_w3(
+            [
+                (True, encode(["bytes32"], [b"\x01" * 32])),
+                (True, encode(["address[]"], [[OWNER]])),
+            ]
+        )
+
+        domain_separator, owners = aggregate(
+            w3, [SAFE.functions.domainSeparator(), SAFE.functions.getOwners()]
+        )
+
+        assert domain_separator == b"\x01" * 32
+        assert owners == [Web3.to_checksum_address(OWNER)]
+
+    def test_failed_call_returns_none(self):
+        w3 = make_multicall_w3([(False, b""), (True, encode(["uint256"], [7]))])
+
+        result = aggregate(w3, [SAFE.functions.getThreshold(), SAFE.functions.nonce()])
+
+        assert result == [None, 7]
+
+    def test_empty_return_data_returns_none(self):
+        w3 = make_multicall_w3([(True, b"")])
+        assert aggregate(w3, [SAFE.functions.nonce()]) == [None]
+
+    def test_result_count_mismatch_raises(self):
+        w3 = make_multicall_w3([(True, encode(["uint256"], [7]))])
+        with pytest.raises(Exception, match="expected 2"):
+            aggregate(w3, [SAFE.functions.getThreshold(), SAFE.functions.nonce()])
+
+    def test_rpc_failure_propagates(self):
+        w3 = MagicMock()
+        w3.eth.call.side_effect = Exception("RPC error")
+        with pytest.raises(Exception, match="RPC error"):
+            aggregate(w3, [SAFE.functions.nonce()])
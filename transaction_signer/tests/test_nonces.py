@@ -0,0 +1,127 @@
+from unittest.mock import MagicMock
+
+from src.utils.nonces import (
+    create_manager,
+    get_nonce,
+    mark_sent,
+    reconcile,
+    release,
+    try_reconcile,
+)
+
+CHAIN_ID = 8453
+RELAYER = "0x3333333333333333333333333333333333333333"
+
+
+def make_w3(latest=5, pending=5):
+    w3 = MagicMock()
+    w3.eth.get_transaction_count.side_effect = lambda address, block: (
+        latest if block == "latest" else pending
+    )
+    return w3
+
+
+class TestGetNonce:
+    def test_reads_pending_count_once(self):
+        manager = create_manager()
+        w3 = make_w3(latest=5, pending=7)
+
+        assert [get_nonce(manager, w3, CHAIN_ID, RELAYER) for _ in range(3)] == [
+            7,
+            8,
+            9,
+        ]
+        w3.eth.get_transaction_count.assert_called_once_with(RELAYER, "pending")
+
+    def test_nonces_per_chain_and_relayer(self):
+        manager = create_manager()
+        w3 = make_w3()
+
+        get_nonce(manager, w3, CHAIN_ID, RELAYER)
+
+        assert (
+            get_nonce(manager, w3, CHAIN_ID, RELAYER.upper().replace("0X", "0x")) == 6
+        )
+        assert get_nonce(manager, w3, 10, RELAYER) == 5
+
+
+class TestRelease:
+    def test_last_nonce_is_handed_out_again(self):
+        manager = create_manager()
+        w3 = make_w3()
+        nonce = get_nonce(manager, w3, CHAIN_ID, RELAYER)
+
+        release(manager, CHAIN_ID, RELAYER, nonce)
+
+        assert get_nonce(manager, w3, CHAIN_ID, RELAYER) == nonce
+
+    def test_earlier_nonce_is_not_handed_out_again(self):
+        manager = create_manager()
+        w3 = make_w3()
+        nonce = get_nonce(manager, w3, CHAIN_ID, RELAYER)
+        get_nonce(manager, w3, CHAIN_ID, RELAYER)
+
+        release(manager, CHAIN_ID, RELAYER, nonce)
+
+        assert get_nonce(manager, w3, CHAIN_ID, RELAYER) == nonce + 2
+
+
+class TestReconcile:
+    def send(self, manager, w3, count):
+        for _ in range(count):
+            nonce = get_nonce(manager, w3, CHAIN_ID, RELAYER)
+            mark_sent(manager, CHAIN_ID, RELAYER, nonce, f"0x{nonce:064x}")
+
+    def test_forgets_confirmed_transactions(self):
+        manager = create_manager()
+        self.send(manager, make_w3(), 3)
+
+        dropped = reconcile(manager, make_w3(latest=7, pending=8), CHAIN_ID, RELAYER)
+
+        assert dropped == {}
+        entry = manager["relayers"][(CHAIN_ID, RELAYER.lower())]
+        assert list(entry["sent"]) == [7]
+        assert get_nonce(manager, make_w3(), CHAIN_ID, RELAYER) == 8
+
+    def test_returns_dropped_transactions(self):
+        manager = create_manager()
+        self.send(manager, make_w3(), 3)
+
+        dropped = reconcile(manager, make_w3(latest=5, pending=6), CHAIN_ID, RELAYER)
+
+        assert dropped == {6: f"0x{6:064x}", 7: f"0x{7:064x}"}
+        assert get_nonce(manager, make_w3(), CHAIN_ID, RELAYER) == 6
+
+    def test_catches_up_with_transactions_sent_elsewhere(self):
+        manager = create_manager()
+        get_nonce(manager, make_w3(), CHAIN_ID, RELAYER)
+
+        reconcile(manager, make_w3(latest=9, pending=9), CHAIN_ID, RELAYER)
+
+        assert get_nonce(manager, make_w3(), CHAIN_ID, RELAYER) == 9
+
+    def test_unknown_relayer_needs_no_rpc(self):
+        w3 = make_w3()
+        assert reconcile(create_manager(), w3, CHAIN_ID, RELAYER) == {}
+        w3.eth.get_transaction_count.assert_not_called()
+
+
+class TestTryReconcile:
+    def test_prints_dropped_transactions(self, capsys):
+        manager = create_manager()
+        nonce = get_nonce(manager, make_w3(), CHAIN_ID, RELAYER)
+        mark_sent(manager, CHAIN_ID, RELAYER, nonce, "0x01")
+
+        dropped = try_reconcile(manager, make_w3(), CHAIN_ID, RELAYER)
+
+        assert dropped == {5: "0x01"}
+        assert "Transaction 0x01" in capsys.readouterr().out
+
+    def test_error_is_printed(self, capsys):
+        manager = create_manager()
+        get_nonce(manager, make_w3(), CHAIN_ID, RELAYER)
+        w3 = MagicMock()
+        w3.eth.get_transaction_count.side_effect = Exception("timeout")
+
+        assert try_reconcile(manager, w3, CHAIN_ID, RELAYER) == {}
+        assert "Could not reconcile" in capsys.readouterr().out
@@ -0,0 +1,70 @@
+from unittest.mock import MagicMock, patch
+
+from src.ownership import OWNERSHIP_CALLS, get_matrix, run
+
+SAFE_A = "0x1111111111111111111111111111111111111111"
+SAFE_B = "0x3333333333333333333333333333333333333333"
+SIGNER_1 = "0x2222222222222222222222222222222222222222"
+SIGNER_2 = "0x4444444444444444444444444444444444444444"
+SIGNERS = [
+    {"name": "Signer 1", "address": SIGNER_1},
+    {"name": "Signer 2", "address": SIGNER_2},
+]
+CONFIG_DATA = {
+    "chains": [
+        {"name": "Base", "chain_id": 8453, "rpc_name": "RPC_BASE"},
+        {"name": "Optimism", "chain_id": 10, "rpc_name": "RPC_OPTIMISM"},
+    ],
+    "safes": [
+        {"name": "Safe A", "address": SAFE_A},
+        {"name": "Safe B", "address": SAFE_B},
+    ],
+    "signers": SIGNERS,
+}
+
+
+class TestGetMatrix:
+    def test_signers_that_are_owners(self):
+        safes_state = {
+            SAFE_A: {"threshold": 2, "owners": [SIGNER_1.upper().replace("0X", "0x")]},
+            SAFE_B: None,
+        }
+
+        assert get_matrix(SIGNERS, safes_state) == {
+            SAFE_A: {"threshold": 2, "owners": 1, "signers": [SIGNER_1]},
+            SAFE_B: None,
+        }
+
+
+class TestRun:
+    @patch("src.ownership.safe_reader.read_safes_state")
+    @patch("src.ownership.connections.get_w3")
+    def test_reports_all_chains(self, mock_get_w3, mock_read, capsys):
+        mock_read.return_value = {
+            SAFE_A: {"threshold": 2, "owners": [SIGNER_1]},
+            SAFE_B: {"threshold": 1, "owners": [SIGNER_1, SIGNER_2]},
+        }
+
+        result = run(CONFIG_DATA, [])
+
+        # One read per chain, for all safes at once.
+        assert mock_read.call_count == 2
+        assert mock_read.call_args.kwargs["calls"] == OWNERSHIP_CALLS
+        assert set(result) == {8453, 10}
+        assert result[10][SAFE_B]["signers"] == [SIGNER_1, SIGNER_2]
+        output = capsys.readouterr().out
+        assert "Safe A (" in output and "threshold 2/1" in output
+        assert "can't be reached" in output
+
+    @patch("src.ownership.safe_reader.read_safes_state")
+    @patch("src.ownership.connections.get_w3")
+    def test_unreachable_chain_is_skipped(self, mock_get_w3, mock_read, capsys):
+        mock_get_w3.side_effect = [Exception("RPC URL not set"), MagicMock()]
+        mock_read.return_value = {SAFE_A: None, SAFE_B: None}
+
+        result = run(CONFIG_DATA, [])
+
+        assert len(result) == 1
+        output = capsys.readouterr().out
+        assert "Could not read the safes" in output
+        assert "not deployed on this chain" in output
@@ -0,0 +1,175 @@
+from unittest.mock import MagicMock, patch
+
+from eth_utils import keccak
+from web3.exceptions import TransactionNotFound
+
+from helpers import make_execution_log
+from src.receipt_tracker import (
+    bump_fees,
+    create_entry,
+    decode_executions,
+    is_executed,
+    track,
+)
+
+SAFE = "0x1111111111111111111111111111111111111111"
+RELAYER = {"name": "Relayer", "address": f"0x{1:040x}", "wallet": "HOT"}
+UNSIGNED_TX = {
+    "to": SAFE,
+    "nonce": 7,
+    "maxFeePerGas": 1000,
+    "maxPriorityFeePerGas": 100,
+}
+SAFE_TX_HASH = "ab" * 32
+
+
+def make_log(event="ExecutionSuccess", address=SAFE, payment=0):
+    return make_execution_log(address, SAFE_TX_HASH, event, payment)
+
+
+def make_entry(tx_hash="0x01"):
+    return create_entry(tx_hash, UNSIGNED_TX, RELAYER, "0x" + SAFE_TX_HASH)
+
+
+def make_w3(base_fee=None):
+    w3 = MagicMock()
+    w3.eth.get_block.return_value = {"baseFeePerGas": base_fee} if base_fee else {}
+    return w3
+
+
+class TestDecodeExecutions:
+    def test_decodes_safe_events(self):
+        receipt = {
+            "logs": [
+                make_log(payment=5),
+                make_log("ExecutionFailure"),
+                # Events of other contracts are left out.
+                make_log(address=f"0x{2:040x}"),
+            ]
+        }
+
+        assert decode_executions(receipt, SAFE) == [
+            {
+                "event": "ExecutionSuccess",
+                "transaction_hash": SAFE_TX_HASH,
+                "payment": 5,
+            },
+            {
+                "event": "ExecutionFailure",
+                "transaction_hash": SAFE_TX_HASH,
+                "payment": 0,
+            },
+        ]
+
+    def test_failed_execution_is_not_executed(self):
+        failure = {"event": "ExecutionFailure", "transaction_hash": SAFE_TX_HASH}
+        success = {"event": "ExecutionSuccess", "transaction_hash": SAFE_TX_HASH}
+        result = {"status": 1, "safe_tx_hash": SAFE_TX_HASH, "executions": [failure]}
+        assert not is_executed(result)
+        assert is_executed({**result, "executions": [success]})
+        assert not is_executed({**result, "status": 0, "executions": [success]})
+
+    def test_execution_of_safe_transaction_is_required(self):
+        result = {"status": 1, "safe_tx_hash": SAFE_TX_HASH, "executions": []}
+        # E.g. the transaction called another contract.
+        assert not is_executed(result)
+        other = {"event": "ExecutionSuccess", "transaction_hash": "cd" * 32}
+        assert not is_executed({**result, "executions": [other]})
+
+
+class TestBumpFees:
+    def test_bumps_both_fees(self):
+        bumped = bump_fees(make_w3(), UNSIGNED_TX)
+
+        assert bumped["maxFeePerGas"] == 1125
+        assert bumped["maxPriorityFeePerGas"] == 113
+        assert bumped["nonce"] == UNSIGNED_TX["nonce"]
+
+    def test_follows_rising_base_fee(self):
+        bumped = bump_fees(make_w3(base_fee=2000), UNSIGNED_TX)
+        assert bumped["maxFeePerGas"] == 2 * 2000 + 113
+
+    def test_bumps_zero_priority_fee(self):
+        bumped = bump_fees(make_w3(), {**UNSIGNED_TX, "maxPriorityFeePerGas": 0})
+        assert bumped["maxPriorityFeePerGas"] == 1
+
+
+@patch("src.receipt_tracker.POLL_INTERVAL", 0)
+class TestTrack:
+    def test_returns_receipt_and_executions(self):
+        w3 = make_w3()
+        w3.eth.get_transaction_receipt.return_value = {
+            "status": 1,
+            "logs": [make_log()],
+        }
+
+        (result,) = track(w3, [make_entry()])
+
+        assert result["tx_hash"] == "0x01"
+        assert result["status"] == 1
+        assert result["replacements"] == 0
+        assert is_executed(result)
+
+    def test_polls_until_mined(self):
+        w3 = make_w3()
+        w3.eth.get_transaction_receipt.side_effect = [
+            TransactionNotFound("pending"),
+            TransactionNotFound("pending"),
+            {"status": 1, "logs": []},
+        ]
+
+        (result,) = track(w3, [make_entry()])
+
+        assert result["status"] == 1
+        assert w3.eth.get_transaction_receipt.call_count == 3
+
+    @patch("src.receipt_tracker.STUCK_AFTER", 0)
+    @patch("src.receipt_tracker.safe_transaction.sign")
+    def test_replaces_stuck_transaction(self, mock_sign):
+        w3 = make_w3()
+        mock_sign.return_value = MagicMock(raw_transaction=b"\x02")
+        replacement = "0x" + keccak(b"\x02").hex()
+
+        def get_receipt(tx_hash):
+            # Only the replacement is mined.
+            if tx_hash != replacement:
+                raise TransactionNotFound("pending")
+            return {"status": 1, "logs": []}
+
+        w3.eth.get_transaction_receipt.side_effect = get_receipt
+
+        (result,) = track(w3, [make_entry()])
+
+        assert result["tx_hash"] == replacement
+        assert result["replacements"] == 1
+        # The replacement has the same nonce and higher fees.
+        replacement_tx = mock_sign.call_args.args[1]
+        assert replacement_tx["nonce"] == UNSIGNED_TX["nonce"]
+        assert replacement_tx["maxFeePerGas"] > UNSIGNED_TX["maxFeePerGas"]
+        w3.eth.send_raw_transaction.assert_called_once_with(b"\x02")
+
+    @patch("src.receipt_tracker.STUCK_AFTER", 0)
+    @patch("src.receipt_tracker.MAX_REPLACEMENTS", 1)
+    @patch("src.receipt_tracker.safe_transaction.sign")
+    def test_failed_fee_bump_keeps_tracking(self, mock_sign, capsys):
+        w3 = make_w3()
+        w3.eth.get_block.side_effect = Exception("rate limited")
+        receipts = [TransactionNotFound("pending"), {"status": 1, "logs": []}]
+        w3.eth.get_transaction_receipt.side_effect = receipts
+
+        (result,) = track(w3, [make_entry()])
+
+        assert result["status"] == 1
+        assert result["replacements"] == 0
+        mock_sign.assert_not_called()
+        assert "could not be replaced (rate limited)" in capsys.readouterr().out
+
+    @patch("src.receipt_tracker.TIMEOUT", 0)
+    def test_gives_up_after_timeout(self, capsys):
+        w3 = make_w3()
+        w3.eth.get_transaction_receipt.side_effect = TransactionNotFound("pending")
+
+        (result,) = track(w3, [make_entry()])
+
+        assert result["status"] is None
+        assert "No receipt for transaction 0x01" in capsys.readouterr().out
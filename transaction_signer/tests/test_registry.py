@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import src.wallets.hot_wallet as hot_wallet
+from src.wallets.registry import WALLET_MODULES, get_wallet
+
+_project_dir = os.path.join(os.path.dirname(__file__), "..")
+
+
+class TestGetWallet:
+    def test_returns_wallet_module(self):
+        assert get_wallet("HOT") is hot_wallet
+
+    def test_all_wallet_types_resolve(self):
+        for wallet in WALLET_MODULES:
+            assert hasattr(get_wallet(wallet), "sign_transaction")
+
+    def test_unknown_wallet_raises(self):
+        with pytest.raises(Exception, match="Unknown wallet type 'X'"):
+            get_wallet("X")
+
+
+class TestLazyImport:
+    def test_signing_modules_do_not_import_hardware_libraries(self):
+        code = (
+            "import sys\n"
+            "import src.eip712_typed_data, src.safe_transaction\n"
+            "print(' '.join(m for m in ('trezorlib', 'ledgerblue') if m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=_project_dir,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert result.stdout.strip() == ""
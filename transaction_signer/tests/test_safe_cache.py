@@ -0,0 +1,278 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from helpers import make_mock_safe
+from src.eip712_typed_data import get_domain_separator as compute_domain_separator
+from src.utils.safe_cache import (
+    OWNER_EVENT_TOPICS,
+    get,
+    get_domain_separator,
+    load,
+    read_safe_state,
+    read_safes_state,
+    save,
+    update,
+)
+
+CHAIN_ID = 8453
+SAFE_ADDRESS = "0x1111111111111111111111111111111111111111"
+OWNERS = ["0x2222222222222222222222222222222222222222"]
+DOMAIN_SEPARATOR = compute_domain_separator(CHAIN_ID, SAFE_ADDRESS)
+
+SAFE_STATE = {
+    "threshold": 2,
+    "nonce": 5,
+    "chain_id": CHAIN_ID,
+    "domain_separator": DOMAIN_SEPARATOR,
+    "owners": OWNERS,
+}
+
+
+def make_cache(block=100):
+    cache = {}
+    update(cache, CHAIN_ID, SAFE_ADDRESS, SAFE_STATE, block)
+    return cache
+
+
+class TestLoadAndSave:
+    def test_round_trip(self, tmp_path):
+        (tmp_path / "out").mkdir()
+        cache = make_cache()
+        save(str(tmp_path), cache)
+        assert load(str(tmp_path)) == cache
+
+    def test_missing_file(self, tmp_path):
+        assert load(str(tmp_path)) == {}
+
+    def test_malformed_json(self, tmp_path):
+        (tmp_path / "out").mkdir()
+        (tmp_path / "out" / "safe_cache.json").write_text("{bad json")
+        assert load(str(tmp_path)) == {}
+
+    def test_json_array_instead_of_dict_raises(self, tmp_path):
+        (tmp_path / "out").mkdir()
+        (tmp_path / "out" / "safe_cache.json").write_text("[1, 2, 3]")
+        with pytest.raises(TypeError, match="Expected dict"):
+            load(str(tmp_path))
+
+
+class TestGetAndUpdate:
+    def test_get_returns_cached_state_without_nonce(self):
+        result = get(make_cache(), CHAIN_ID, SAFE_ADDRESS)
+        assert result == {
+            "threshold": 2,
+            "chain_id": CHAIN_ID,
+            "domain_separator": DOMAIN_SEPARATOR,
+            "owners": OWNERS,
+        }
+
+    def test_keyed_by_chain_id(self):
+        assert get(make_cache(), 10, SAFE_ADDRESS) is None
+
+    def test_address_case_insensitive(self):
+        assert get(make_cache(), CHAIN_ID, SAFE_ADDRESS.upper()) is not None
+
+    def test_missing_safe_returns_none(self):
+        assert get({}, CHAIN_ID, SAFE_ADDRESS) is None
+
+    def test_undeployed_safe_returns_none(self):
+        cache = {}
+        update(cache, CHAIN_ID, SAFE_ADDRESS, None, 100)
+        assert get(cache, CHAIN_ID, SAFE_ADDRESS) is None
+
+    def test_state_of_other_chain_is_not_stored(self):
+        cache = {}
+        update(cache, CHAIN_ID, SAFE_ADDRESS, {**SAFE_STATE, "chain_id": 1}, 100)
+        assert cache == {}
+
+    def test_serializable(self):
+        json.dumps(make_cache())
+
+
+class TestReadSafesState:
+    def test_all_cached_needs_no_rpc(self):
+        w3 = MagicMock()
+        result = read_safes_state(
+            w3, [make_mock_safe(address=SAFE_ADDRESS)], make_cache(), CHAIN_ID
+        )
+        assert result[SAFE_ADDRESS]["threshold"] == 2
+        assert w3.mock_calls == []
+
+    @patch("src.utils.safe_cache.safe_reader.read_safes_state")
+    def test_missing_safe_reads_all_and_caches(self, mock_read):
+        other = "0x3333333333333333333333333333333333333333"
+        mock_read.return_value = {SAFE_ADDRESS: SAFE_STATE, other: None}
+        w3 = MagicMock()
+        w3.eth.block_number = 123
+        cache = make_cache()
+        safes = [make_mock_safe(address=SAFE_ADDRESS), make_mock_safe(address=other)]
+
+        result = read_safes_state(w3, safes, cache, CHAIN_ID)
+
+        mock_read.assert_called_once_with(w3, safes, 123)
+        assert result[SAFE_ADDRESS]["nonce"] == 5
+        assert result[other] is None
+        assert get(cache, CHAIN_ID, other) is None
+        assert cache[f"{CHAIN_ID}:{other}"]["deployed"] is False
+
+    @patch("src.utils.safe_cache.safe_reader.read_safes_state")
+    def test_states_of_other_chain_are_not_cached(self, mock_read):
+        other = "0x3333333333333333333333333333333333333333"
+        mock_read.return_value = {
+            SAFE_ADDRESS: {**SAFE_STATE, "chain_id": 1},
+            other: None,
+        }
+        cache = {}
+        safes = [make_mock_safe(address=SAFE_ADDRESS), make_mock_safe(address=other)]
+
+        result = read_safes_state(MagicMock(), safes, cache, CHAIN_ID)
+
+        assert result[SAFE_ADDRESS]["chain_id"] == 1
+        assert cache == {}
+
+
+class TestReadSafeState:
+    @patch("src.utils.safe_cache.safe_reader.read")
+    def test_unchanged_safe_only_reads_nonce(self, mock_read):
+        mock_read.return_value = {
+            "block": 150,
+            "chain_id": CHAIN_ID,
+            "nonce": 6,
+            "logs": [],
+        }
+        cache = make_cache(block=100)
+        safe = make_mock_safe(address=SAFE_ADDRESS)
+
+        result = read_safe_state(MagicMock(), safe, cache, CHAIN_ID)
+
+        mock_read.assert_called_once()
+        assert set(mock_read.call_args[0][1].keys()) == {
+            "block",
+            "chain_id",
+            "nonce",
+            "logs",
+        }
+        assert result == {**SAFE_STATE, "nonce": 6}
+        assert cache[f"{CHAIN_ID}:{SAFE_ADDRESS}"]["block"] == 150
+
+    @patch("src.utils.safe_cache.safe_reader.read")
+    def test_returns_chain_id_of_rpc(self, mock_read):
+        # The RPC is on another chain than the cache entry it is keyed by.
+        mock_read.return_value = {"block": 150, "chain_id": 1, "nonce": 6, "logs": []}
+
+        cache = make_cache(block=100)
+
+        result = read_safe_state(
+            MagicMock(), make_mock_safe(address=SAFE_ADDRESS), cache, CHAIN_ID
+        )
+
+        assert result["chain_id"] == 1
+        assert cache[f"{CHAIN_ID}:{SAFE_ADDRESS}"]["block"] == 100
+
+    @patch("src.utils.safe_cache.safe_reader.read")
+    def test_checks_owner_events_since_cached_block(self, mock_read):
+        mock_read.return_value = {
+            "block": 150,
+            "chain_id": CHAIN_ID,
+            "nonce": 6,
+            "logs": [],
+        }
+        w3 = MagicMock()
+        safe = make_mock_safe(address=SAFE_ADDRESS)
+
+        read_safe_state(w3, safe, make_cache(block=100), CHAIN_ID)
+        mock_read.call_args[0][1]["logs"]()
+
+        w3.eth.get_logs.assert_called_once_with(
+            {
+                "address": SAFE_ADDRESS,
+                "fromBlock": 101,
+                "toBlock": "latest",
+                "topics": [OWNER_EVENT_TOPICS],
+            }
+        )
+
+    @patch("src.utils.safe_cache.safe_reader.read")
+    def test_owner_event_rereads_state(self, mock_read):
+        new_owners = OWNERS + ["0x4444444444444444444444444444444444444444"]
+        mock_read.side_effect = [
+            {"block": 150, "nonce": 6, "logs": [{}]},
+            {**SAFE_STATE, "block": 150, "nonce": 6, "owners": new_owners},
+        ]
+        cache = make_cache(block=100)
+
+        result = read_safe_state(
+            MagicMock(), make_mock_safe(address=SAFE_ADDRESS), cache, CHAIN_ID
+        )
+
+        assert mock_read.call_count == 2
+        assert result["owners"] == new_owners
+        assert "block" not in result
+        assert get(cache, CHAIN_ID, SAFE_ADDRESS)["owners"] == new_owners
+        assert cache[f"{CHAIN_ID}:{SAFE_ADDRESS}"]["block"] == 150
+
+    @patch("src.utils.safe_cache.safe_reader.read")
+    def test_failed_check_rereads_state(self, mock_read, capsys):
+        mock_read.side_effect = [
+            Exception("block range too large"),
+            {**SAFE_STATE, "block": 150},
+        ]
+
+        result = read_safe_state(
+            MagicMock(), make_mock_safe(address=SAFE_ADDRESS), make_cache(), CHAIN_ID
+        )
+
+        assert result == SAFE_STATE
+        assert "block range too large" in capsys.readouterr().out
+
+    @patch("src.utils.safe_cache.safe_reader.read")
+    def test_uncached_safe_reads_and_caches_state(self, mock_read):
+        mock_read.return_value = {**SAFE_STATE, "block": 150}
+        cache = {}
+
+        result = read_safe_state(
+            MagicMock(), make_mock_safe(address=SAFE_ADDRESS), cache, CHAIN_ID
+        )
+
+        mock_read.assert_called_once()
+        assert result == SAFE_STATE
+        assert get(cache, CHAIN_ID, SAFE_ADDRESS)["threshold"] == 2
+
+
+class TestGetDomainSeparator:
+    def test_cached_safe_needs_no_rpc(self):
+        w3 = MagicMock()
+        safe = make_mock_safe(address=SAFE_ADDRESS)
+
+        result = get_domain_separator(w3, safe, make_cache(), CHAIN_ID)
+
+        assert result == DOMAIN_SEPARATOR
+        assert w3.mock_calls == []
+        safe.functions.domainSeparator.assert_not_called()
+
+    @patch("src.utils.safe_cache.safe_reader.read")
+    def test_uncached_safe_is_checked_once(self, mock_read):
+        mock_read.return_value = {**SAFE_STATE, "block": 150}
+        cache = {}
+        safe = make_mock_safe(address=SAFE_ADDRESS)
+
+        get_domain_separator(MagicMock(), safe, cache, CHAIN_ID)
+        get_domain_separator(MagicMock(), safe, cache, CHAIN_ID)
+
+        mock_read.assert_called_once()
+
+    def test_mismatch_raises(self):
+        cache = {}
+        update(
+            cache,
+            CHAIN_ID,
+            SAFE_ADDRESS,
+            {**SAFE_STATE, "domain_separator": b"\x01" * 32},
+            100,
+        )
+        with pytest.raises(Exception, match="Domain separator of safe"):
+            get_domain_separator(
+                MagicMock(), make_mock_safe(address=SAFE_ADDRESS), cache, CHAIN_ID
+            )
@@ -0,0 +1,166 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from helpers import make_mock_safe
+from src.safe_reader import read, read_safe_state, read_safes_state
+
+DOMAIN_SEPARATOR = b"\x01" * 32
+OWNERS = ["0x2222222222222222222222222222222222222222"]
+
+
+def make_batch_w3(results):
+    w3 = MagicMock()
+    batch = w3.batch_requests.return_value.__enter__.return_value
+    batch.execute.return_value = results
+    return w3, batch
+
+
+class TestRead:
+    def test_single_batch_request(self):
+        w3, batch = make_batch_w3([1, 2])
+        calls = {"a": MagicMock(), "b": MagicMock()}
+
+        result = read(w3, calls)
+
+        assert result == {"a": 1, "b": 2}
+        w3.batch_requests.assert_called_once()
+        batch.execute.assert_called_once()
+        assert [c.args[0] for c in batch.add.call_args_list] == [
+            calls["a"],
+            calls["b"],
+        ]
+
+    def test_does_not_call_individually(self):
+        w3, _ = make_batch_w3([1])
+        call = MagicMock()
+
+        read(w3, {"a": call})
+
+        call.call.assert_not_called()
+
+    def test_falls_back_to_individual_calls(self, capsys):
+        w3, batch = make_batch_w3(None)
+        batch.execute.side_effect = Exception("batch not supported")
+        call_a = MagicMock()
+        call_a.call.return_value = 1
+        call_b = MagicMock()
+        call_b.call.return_value = 2
+
+        result = read(w3, {"a": call_a, "b": call_b})
+
+        assert result == {"a": 1, "b": 2}
+        assert "falling back" in capsys.readouterr().out
+
+    def test_fallback_failure_propagates(self):
+        w3, batch = make_batch_w3(None)
+        batch.execute.side_effect = Exception("batch not supported")
+        call = MagicMock()
+        call.call.side_effect = Exception("RPC error")
+
+        with pytest.raises(Exception, match="RPC error"):
+            read(w3, {"a": call})
+
+
+class TestReadSafeState:
+    def test_returns_named_state(self):
+        w3, _ = make_batch_w3([2, 5, 8453, DOMAIN_SEPARATOR, OWNERS])
+        safe = make_mock_safe()
+
+        result = read_safe_state(w3, safe)
+
+        assert result == {
+            "threshold": 2,
+            "nonce": 5,
+            "chain_id": 8453,
+            "domain_separator": DOMAIN_SEPARATOR,
+            "owners": OWNERS,
+        }
+
+    def test_reads_in_one_batch(self):
+        w3, batch = make_batch_w3([2, 5, 8453, DOMAIN_SEPARATOR, OWNERS])
+        safe = make_mock_safe()
+
+        read_safe_state(w3, safe)
+
+        w3.batch_requests.assert_called_once()
+        assert batch.add.call_count == 5
+        safe.functions.nonce.return_value.call.assert_not_called()
+        safe.functions.getChainId.return_value.call.assert_not_called()
+
+
+class TestReadSafesState:
+    SAFE_A = "0x1111111111111111111111111111111111111111"
+    SAFE_B = "0x3333333333333333333333333333333333333333"
+
+    def make_safes(self):
+        return [
+            make_mock_safe(address=self.SAFE_A),
+            make_mock_safe(address=self.SAFE_B),
+        ]
+
+    @patch("src.safe_reader.multicall.aggregate")
+    def test_single_multicall_for_all_safes(self, mock_aggregate):
+        mock_aggregate.return_value = [2, 5, 8453, DOMAIN_SEPARATOR, OWNERS] + [
+            1,
+            0,
+            8453,
+            DOMAIN_SEPARATOR,
+            OWNERS,
+        ]
+        w3 = MagicMock()
+
+        result = read_safes_state(w3, self.make_safes())
+
+        mock_aggregate.assert_called_once()
+        assert len(mock_aggregate.call_args[0][1]) == 10
+        assert result[self.SAFE_A]["threshold"] == 2
+        assert result[self.SAFE_A]["nonce"] == 5
+        assert result[self.SAFE_B]["threshold"] == 1
+        assert result[self.SAFE_B]["owners"] == OWNERS
+        w3.batch_requests.assert_not_called()
+
+    @patch("src.safe_reader.multicall.aggregate")
+    def test_undeployed_safe_is_none(self, mock_aggregate):
+        mock_aggregate.return_value = [2, 5, 8453, DOMAIN_SEPARATOR, OWNERS] + [
+            None
+        ] * 5
+
+        result = read_safes_state(MagicMock(), self.make_safes())
+
+        assert result[self.SAFE_A]["threshold"] == 2
+        assert result[self.SAFE_B] is None
+
+    @patch("src.safe_reader.multicall.aggregate")
+    def test_falls_back_to_batch_per_safe(self, mock_aggregate, capsys):
+        mock_aggregate.side_effect = Exception("no multicall")
+        w3, _ = make_batch_w3([2, 5, 8453, DOMAIN_SEPARATOR, OWNERS])
+
+        result = read_safes_state(w3, self.make_safes())
+
+        assert w3.batch_requests.call_count == 2
+        assert result[self.SAFE_A]["nonce"] == 5
+        assert "falling back" in capsys.readouterr().out
+
+    @patch("src.safe_reader.multicall.aggregate")
+    def test_reads_given_calls(self, mock_aggregate):
+        mock_aggregate.return_value = [2, OWNERS, None, None]
+        calls = {"threshold": "getThreshold", "owners": "getOwners"}
+
+        result = read_safes_state(MagicMock(), self.make_safes(), calls=calls)
+
+        assert len(mock_aggregate.call_args[0][1]) == 4
+        assert result == {
+            self.SAFE_A: {"threshold": 2, "owners": OWNERS},
+            self.SAFE_B: None,
+        }
+
+    @patch("src.safe_reader.multicall.aggregate")
+    def test_falls_back_with_given_calls(self, mock_aggregate):
+        mock_aggregate.side_effect = Exception("no multicall")
+        w3, batch = make_batch_w3([3])
+
+        result = read_safes_state(w3, self.make_safes(), calls={"nonce": "nonce"})
+
+        assert result == {self.SAFE_A: {"nonce": 3}, self.SAFE_B: {"nonce": 3}}
+        assert batch.add.call_count == 2
@@ -1,15 +1,51 @@
+import json
 import os
 from unittest.mock import MagicMock, patch
 
 import pytest
+from web3 import Web3
+from web3.providers.base import BaseProvider
 
 from helpers import MULTISEND_ADDRESS, RELAY_TX_CONSTANTS, make_mock_safe
+from src.gas_estimator import create_estimator
 from src.safe_transaction import create, sign
 
 TO = MULTISEND_ADDRESS
 RAW_DATA = "0xabcdef"
 SIGNATURES = "0xaabbccdd"
 RELAYER_ADDR = "0x3333333333333333333333333333333333333333"
+TOKEN_ADDR = "0x4444444444444444444444444444444444444444"
+ACCESS_LIST = [{"address": TOKEN_ADDR, "storageKeys": [b"\x01" * 32]}]
+
+
+class RecordingProvider(BaseProvider):
+    # Records the RPC methods that are called, answering with fixed results.
+    RESULTS = {
+        "eth_blockNumber": "0x64",
+        "eth_chainId": "0x2105",
+        "eth_estimateGas": "0x30d40",
+        "eth_gasPrice": "0x3b9aca00",
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.methods = []
+
+    def make_request(self, method, params):
+        self.methods.append(method)
+        return {"jsonrpc": "2.0", "id": 1, "result": self.RESULTS.get(method, "0x0")}
+
+    def is_connected(self, show_traceback=False):
+        return True
+
+
+def make_recording_w3():
+    w3 = Web3(RecordingProvider())
+    with open(os.path.join(os.path.dirname(__file__), "../data/abis/safe.json")) as f:
+        safe = w3.eth.contract(
+            address="0x1111111111111111111111111111111111111111", abi=json.load(f)
+        )
+    return w3, safe
 
 
 def make_mock_w3(nonce=0, gas_estimate=200000, gas_price=1000000000):
@@ -42,6 +78,66 @@ class TestCreateGasBranching:
         w3.eth.estimate_gas.assert_called_once()
         assert result["gas"] == int(300000 * 1.2)
 
+    def test_gas_zero_with_estimator_reuses_estimate(self):
+        w3 = make_mock_w3(gas_estimate=300000)
+        w3.eth.block_number = 100
+        safe = make_mock_safe()
+        estimator = create_estimator()
+
+        for _ in range(2):
+            result = create(
+                w3,
+                safe,
+                TO,
+                RELAY_TX_CONSTANTS,
+                RAW_DATA,
+                0,
+                SIGNATURES,
+                RELAYER_ADDR,
+                gas=0,
+                max_fee_per_gas=100,
+                max_priority_fee_per_gas=10,
+                estimator=estimator,
+                signer_count=1,
+            )
+
+        w3.eth.estimate_gas.assert_called_once()
+        assert result["gas"] == int(300000 * 1.2)
+
+    def test_estimate_is_cached_by_signer_count(self):
+        w3 = make_mock_w3(gas_estimate=300000)
+        w3.eth.block_number = 100
+        estimator = create_estimator()
+        # A contract signature with 70 bytes of data is longer than two static parts.
+        data = b"\x12" * 70
+        signatures = (
+            bytes(12)
+            + bytes.fromhex(RELAYER_ADDR[2:])
+            + (65).to_bytes(32, "big")
+            + b"\x00"
+            + len(data).to_bytes(32, "big")
+            + data
+        )
+
+        create(
+            w3,
+            make_mock_safe(),
+            TO,
+            RELAY_TX_CONSTANTS,
+            RAW_DATA,
+            0,
+            signatures,
+            RELAYER_ADDR,
+            gas=0,
+            max_fee_per_gas=100,
+            max_priority_fee_per_gas=10,
+            estimator=estimator,
+            signer_count=1,
+        )
+
+        ((_, _, _, signature_count, _),) = estimator["latest"]
+        assert signature_count == 1
+
     def test_gas_nonzero_uses_provided(self):
         w3 = make_mock_w3()
         safe = make_mock_safe()
@@ -84,6 +180,155 @@ class TestCreateGasBranching:
             )
 
 
+class TestCreateAccessList:
+    def make_w3(self, gas_with, gas_without=200000):
+        w3 = make_mock_w3()
+        w3.eth.block_number = 100
+        w3.eth.create_access_list.return_value = {
+            "accessList": ACCESS_LIST,
+            "gasUsed": 150000,
+        }
+        w3.eth.estimate_gas.side_effect = lambda transaction, *args: (
+            gas_with if "accessList" in transaction else gas_without
+        )
+        return w3
+
+    def create(self, w3, gas=0, estimator=None):
+        return create(
+            w3,
+            make_mock_safe(),
+            TO,
+            RELAY_TX_CONSTANTS,
+            RAW_DATA,
+            0,
+            SIGNATURES,
+            RELAYER_ADDR,
+            gas=gas,
+            max_fee_per_gas=100,
+            max_priority_fee_per_gas=10,
+            estimator=estimator,
+            access_list=True,
+            signer_count=None if estimator is None else 1,
+        )
+
+    def test_create_estimates_gas_with_access_list(self):
+        w3 = self.make_w3(gas_with=190000)
+
+        result = self.create(w3)
+
+        assert "accessList" in result
+        assert result["gas"] == int(190000 * 1.2)
+        # The estimate with the access list is reused.
+        assert w3.eth.estimate_gas.call_count == 2
+
+    def test_decision_is_cached_with_estimate(self):
+        w3 = self.make_w3(gas_with=190000)
+        estimator = create_estimator()
+
+        for _ in range(2):
+            result = self.create(w3, estimator=estimator)
+
+        w3.eth.create_access_list.assert_called_once()
+        assert w3.eth.estimate_gas.call_count == 2
+        assert result["accessList"][0]["address"] == TOKEN_ADDR
+        assert result["gas"] == int(190000 * 1.2)
+
+    def test_dropped_access_list_reuses_estimate(self):
+        w3 = self.make_w3(gas_with=210000)
+        estimator = create_estimator()
+
+        result = self.create(w3, estimator=estimator)
+
+        assert "accessList" not in result
+        assert w3.eth.estimate_gas.call_count == 2
+        assert result["gas"] == int(200000 * 1.2)
+
+    def test_fixed_gas_creates_no_access_list(self):
+        w3 = self.make_w3(gas_with=190000)
+
+        result = self.create(w3, gas=500000, estimator=create_estimator())
+
+        w3.eth.create_access_list.assert_not_called()
+        assert "accessList" not in result
+
+
+class TestCreateRpcCalls:
+    def create(self, w3, safe, estimator):
+        return create(
+            w3,
+            safe,
+            TO,
+            RELAY_TX_CONSTANTS,
+            RAW_DATA,
+            0,
+            SIGNATURES,
+            RELAYER_ADDR,
+            gas=0,
+            max_fee_per_gas=100,
+            max_priority_fee_per_gas=10,
+            nonce=0,
+            estimator=estimator,
+            chain_id=8453,
+            signer_count=1,
+        )
+
+    def test_cached_estimate_needs_no_estimate_gas(self):
+        w3, safe = make_recording_w3()
+        estimator = create_estimator()
+        self.create(w3, safe, estimator)
+        w3.provider.methods.clear()
+
+        result = self.create(w3, safe, estimator)
+
+        # Only the block number is read, to look up the cached estimate.
+        assert w3.provider.methods == ["eth_blockNumber"]
+        assert result["gas"] == int(200000 * 1.2)
+        assert result["chainId"] == 8453
+
+    def test_resolved_fees_need_no_fee_rpc_calls(self):
+        w3, safe = make_recording_w3()
+
+        create(
+            w3,
+            safe,
+            TO,
+            RELAY_TX_CONSTANTS,
+            RAW_DATA,
+            0,
+            SIGNATURES,
+            RELAYER_ADDR,
+            gas=500000,
+            max_fee_per_gas=100,
+            max_priority_fee_per_gas=10,
+            nonce=0,
+            chain_id=8453,
+        )
+
+        assert w3.provider.methods == []
+
+
+class TestCreateSignatures:
+    @pytest.mark.parametrize("signatures", [SIGNATURES, bytes.fromhex("aabbccdd")])
+    def test_accepts_hex_and_bytes(self, signatures):
+        safe = make_mock_safe()
+
+        create(
+            make_mock_w3(),
+            safe,
+            TO,
+            RELAY_TX_CONSTANTS,
+            RAW_DATA,
+            0,
+            signatures,
+            RELAYER_ADDR,
+            gas=100000,
+            max_fee_per_gas=100,
+            max_priority_fee_per_gas=10,
+        )
+
+        assert safe.functions.execTransaction.call_args[0][9] == b"\xaa\xbb\xcc\xdd"
+
+
 class TestCreateNonceAndChainId:
     def test_fetches_nonce_from_relayer_address(self):
         w3 = make_mock_w3(nonce=42)
@@ -103,7 +348,30 @@ class TestCreateNonceAndChainId:
             max_priority_fee_per_gas=10,
         )
 
-        w3.eth.get_transaction_count.assert_called_once_with(RELAYER_ADDR)
+        w3.eth.get_transaction_count.assert_called_once_with(RELAYER_ADDR, "pending")
+
+    def test_uses_given_nonce(self):
+        w3 = make_mock_w3(nonce=42)
+        safe = make_mock_safe()
+
+        create(
+            w3,
+            safe,
+            TO,
+            RELAY_TX_CONSTANTS,
+            RAW_DATA,
+            0,
+            SIGNATURES,
+            RELAYER_ADDR,
+            gas=100000,
+            max_fee_per_gas=100,
+            max_priority_fee_per_gas=10,
+            nonce=7,
+        )
+
+        w3.eth.get_transaction_count.assert_not_called()
+        build_args = safe.functions.execTransaction.return_value.build_transaction
+        assert build_args.call_args[0][0]["nonce"] == 7
 
     def test_fetches_chain_id_from_safe(self):
         w3 = make_mock_w3()
@@ -190,7 +458,7 @@ class TestCreateMaxFeeBranching:
 
 
 class TestSignRouting:
-    @patch("src.safe_transaction.hot_wallet.sign_transaction")
+    @patch("src.wallets.hot_wallet.sign_transaction")
     def test_hot_wallet_happy_path(self, mock_sign):
         mock_sign.return_value = {"raw_transaction": "0x"}
         relayer = {
@@ -220,7 +488,7 @@ class TestSignRouting:
 
         assert result is False
 
-    @patch("src.safe_transaction.trezor_t.sign_transaction")
+    @patch("src.wallets.trezor_t.sign_transaction")
     @patch("builtins.input", return_value="")
     def test_trezor_t_routing(self, _mock_input, mock_sign):
         mock_sign.return_value = "signed"
@@ -232,7 +500,7 @@ class TestSignRouting:
         assert result == "signed"
         mock_sign.assert_called_once_with(5, "0xR", unsigned_tx)
 
-    @patch("src.safe_transaction.trezor_1.sign_transaction")
+    @patch("src.wallets.trezor_1.sign_transaction")
     @patch("builtins.input", return_value="")
     def test_trezor_1_routing(self, _mock_input, mock_sign):
         mock_sign.return_value = "signed"
@@ -263,7 +531,7 @@ class TestSignRouting:
         captured = capsys.readouterr()
         assert "not found" in captured.out
 
-    @patch("src.safe_transaction.hot_wallet.sign_transaction")
+    @patch("src.wallets.hot_wallet.sign_transaction")
     def test_hot_wallet_returns_none_on_address_mismatch(self, mock_sign):
         mock_sign.return_value = None
         relayer = {
@@ -276,7 +544,7 @@ class TestSignRouting:
             result = sign(MagicMock(), {}, relayer)
         assert result is None
 
-    @patch("src.safe_transaction.trezor_t.sign_transaction")
+    @patch("src.wallets.trezor_t.sign_transaction")
     @patch("builtins.input", return_value="")
     def test_trezor_t_returns_none_on_address_mismatch(self, _mock_input, mock_sign):
         mock_sign.return_value = None
@@ -284,7 +552,7 @@ class TestSignRouting:
         result = sign(MagicMock(), {}, relayer)
         assert result is None
 
-    @patch("src.safe_transaction.trezor_1.sign_transaction")
+    @patch("src.wallets.trezor_1.sign_transaction")
     @patch("builtins.input", return_value="")
     def test_trezor_1_returns_none_on_address_mismatch(self, _mock_input, mock_sign):
         mock_sign.return_value = None
@@ -292,7 +560,7 @@ class TestSignRouting:
         result = sign(MagicMock(), {}, relayer)
         assert result is None
 
-    @patch("src.safe_transaction.ledger_nano.sign_transaction")
+    @patch("src.wallets.ledger_nano.sign_transaction")
     @patch("builtins.input", return_value="")
     def test_ledger_wallet_routes_to_ledger(self, _mock_input, mock_sign):
         mock_sign.return_value = MagicMock()
@@ -300,7 +568,7 @@ class TestSignRouting:
         sign(MagicMock(), {}, relayer)
         mock_sign.assert_called_once_with(2, "0xR", {})
 
-    @patch("src.safe_transaction.ledger_nano.sign_transaction")
+    @patch("src.wallets.ledger_nano.sign_transaction")
     @patch("builtins.input", return_value="")
     def test_ledger_address_mismatch_returns_none(self, _mock_input, mock_sign):
         mock_sign.return_value = None
@@ -0,0 +1,70 @@
+import pytest
+from eth_account import Account
+from eth_utils import keccak
+
+from helpers import HW_UNSIGNED_TX as UNSIGNED_TX
+from src.wallets.serializer import (
+    ACCESS_LIST,
+    DYNAMIC_FEE,
+    LEGACY,
+    encode,
+    get_payload,
+    encode_signed,
+    get_type,
+)
+
+KEY = "0x" + "11" * 32
+ENTRIES = [
+    {
+        "address": "0x4444444444444444444444444444444444444444",
+        "storageKeys": ["0x" + "01" * 32],
+    }
+]
+LEGACY_TX = {
+    key: value
+    for key, value in UNSIGNED_TX.items()
+    if key not in ("maxFeePerGas", "maxPriorityFeePerGas")
+} | {"gasPrice": 1000000000}
+
+
+class TestGetType:
+    def test_infers_type_from_fields(self):
+        assert get_type(UNSIGNED_TX) == DYNAMIC_FEE
+        assert get_type({**LEGACY_TX, "accessList": []}) == ACCESS_LIST
+        assert get_type(LEGACY_TX) == LEGACY
+
+    def test_explicit_type(self):
+        assert get_type({**UNSIGNED_TX, "type": "0x2"}) == DYNAMIC_FEE
+        assert get_type({**LEGACY_TX, "type": 1}) == ACCESS_LIST
+
+
+class TestEncode:
+    @pytest.mark.parametrize(
+        "unsigned_tx",
+        [
+            UNSIGNED_TX,
+            {**UNSIGNED_TX, "accessList": ENTRIES},
+            {**LEGACY_TX, "accessList": ENTRIES},
+            LEGACY_TX,
+            {**UNSIGNED_TX, "data": "0x" + "ab" * 5000},
+        ],
+    )
+    def test_matches_eth_account(self, unsigned_tx):
+        signed = Account.sign_transaction(unsigned_tx, KEY)
+
+        encoded = encode(unsigned_tx)
+
+        assert encode_signed(encoded, signed.v, signed.r, signed.s) == (
+            signed.raw_transaction
+        )
+
+    def test_payload_is_signed(self):
+        unsigned_tx = {**UNSIGNED_TX, "accessList": ENTRIES}
+        signed = Account.sign_transaction(unsigned_tx, KEY)
+
+        payload = get_payload(encode(unsigned_tx))
+
+        address = Account._recover_hash(
+            keccak(payload), vrs=(signed.v, signed.r, signed.s)
+        )
+        assert address == Account.from_key(KEY).address
@@ -1,4 +1,6 @@
-from src.utils.signatures import concatenate, sort_by_signer
+import pytest
+
+from src.utils.signatures import concatenate, pack, select, sort_by_signer
 
 SAMPLE_SIGNERS = {
     "0x3A1b2C3d4E5f6A7B8c9D0E1F2a3B4c5D6e7F8a9B": "sig_1",
@@ -101,3 +103,110 @@ class TestConcatenate:
     def test_single_signature(self):
         items = [("0xaaa", "abcdef")]
         assert concatenate(items) == "0xabcdef"
+
+
+def make_signature(v):
+    return "11" * 64 + f"{v:02x}"
+
+
+class TestSelect:
+    def test_selects_threshold_signatures_in_owner_order(self):
+        sigs = {address: make_signature(27) for address in SAMPLE_SIGNERS}
+
+        result = select(sigs, 3)
+
+        assert [addr for addr, _ in result] == list(SAMPLE_SIGNERS)[:3]
+
+    def test_prefers_recovered_signatures(self):
+        addresses = list(SAMPLE_SIGNERS)
+        sigs = {
+            addresses[0]: make_signature(0),
+            addresses[1]: make_signature(31),
+            addresses[2]: make_signature(27),
+            addresses[3]: make_signature(1),
+        }
+
+        result = select(sigs, 2)
+
+        # An approved hash (v = 1) is only valid if approved on-chain.
+        assert result == [
+            (addresses[1], make_signature(31)),
+            (addresses[2], make_signature(27)),
+        ]
+
+    def test_fewer_signatures_than_threshold(self):
+        sigs = {"0xF000000000000000000000000000000000000000": make_signature(27)}
+        assert len(select(sigs, 2)) == 1
+
+    def test_packs_only_selected_signatures(self):
+        sigs = {address: make_signature(27) for address in SAMPLE_SIGNERS}
+        packed = concatenate(select(sigs, 2))
+        assert len(packed) == 2 + 2 * 130
+
+
+def make_contract_signature(owner, data):
+    static = "00" * 12 + owner[2:].lower() + "00" * 32 + "00"
+    return static + f"{len(data):064x}" + data.hex()
+
+
+class TestPack:
+    OWNERS = [
+        "0x1000000000000000000000000000000000000000",
+        "0x2000000000000000000000000000000000000000",
+        "0x3000000000000000000000000000000000000000",
+    ]
+
+    def test_ecdsa_signatures_match_concatenation(self):
+        items = [(owner, make_signature(27)) for owner in self.OWNERS]
+        assert "0x" + pack(items).hex() == concatenate(items)
+
+    def test_contract_signature_dynamic_part(self):
+        data = b"\x12" * 70
+        items = [
+            (self.OWNERS[0], make_signature(27)),
+            (self.OWNERS[1], make_contract_signature(self.OWNERS[1], data)),
+            (self.OWNERS[2], make_signature(28)),
+        ]
+
+        packed = pack(items)
+
+        assert len(packed) == 3 * 65 + 32 + 70
+        contract_static = packed[65:130]
+        assert contract_static[12:32] == bytes.fromhex(self.OWNERS[1][2:])
+        # s points at the dynamic part, after all static parts.
+        offset = int.from_bytes(contract_static[32:64], "big")
+        assert offset == 3 * 65
+        assert int.from_bytes(packed[offset : offset + 32], "big") == 70
+        assert packed[offset + 32 :] == data
+        assert packed[130:195] == bytes.fromhex(make_signature(28))
+
+    def test_multiple_contract_signatures(self):
+        items = [
+            (self.OWNERS[0], make_contract_signature(self.OWNERS[0], b"\x01" * 3)),
+            (self.OWNERS[1], make_contract_signature(self.OWNERS[1], b"\x02" * 5)),
+        ]
+
+        packed = pack(items)
+
+        first = int.from_bytes(packed[32:64], "big")
+        second = int.from_bytes(packed[97:129], "big")
+        assert (first, second) == (130, 130 + 32 + 3)
+        assert packed[second + 32 :] == b"\x02" * 5
+
+    def test_contract_signature_without_data(self):
+        static = make_contract_signature(self.OWNERS[0], b"")[:130]
+        packed = pack([(self.OWNERS[0], static)])
+        assert int.from_bytes(packed[32:64], "big") == 65
+        assert packed[65:] == bytes(32)
+
+    def test_invalid_contract_signature_length_raises(self):
+        signature = make_contract_signature(self.OWNERS[0], b"\x01" * 3) + "ff"
+        with pytest.raises(Exception, match="invalid length"):
+            pack([(self.OWNERS[0], signature)])
+
+    def test_ecdsa_signature_with_extra_bytes_raises(self):
+        with pytest.raises(Exception, match="must be 65 bytes"):
+            pack([(self.OWNERS[0], make_signature(27) + "ff")])
+
+    def test_empty(self):
+        assert pack([]) == b""
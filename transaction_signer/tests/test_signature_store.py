@@ -0,0 +1,216 @@
+import json
+import multiprocessing
+
+import pytest
+
+from helpers import make_record
+from src.utils.signatures import (
+    add,
+    compact,
+    load,
+    migrate,
+    open_store,
+    refresh,
+)
+
+HASH_A = "aa" * 32
+HASH_B = "bb" * 32
+SIGNER_1 = "0x1111111111111111111111111111111111111111"
+SIGNER_2 = "0x2222222222222222222222222222222222222222"
+SAFE = "0x3333333333333333333333333333333333333333"
+
+
+@pytest.fixture
+def path(tmp_path):
+    (tmp_path / "out").mkdir()
+    return tmp_path
+
+
+def store_file(path):
+    return path / "out" / "signatures.jsonl"
+
+
+def append(path, transaction_hash, signer, signature):
+    # A session that adds a single signature.
+    add(open_store(str(path)), transaction_hash, signer, signature)
+
+
+class TestAdd:
+    def test_round_trip(self, path):
+        append(path, HASH_A, SIGNER_1, "sig1")
+        append(path, HASH_A, SIGNER_2, "sig2")
+        append(path, HASH_B, SIGNER_1, "sig3")
+
+        assert load(str(path)) == {
+            HASH_A: {SIGNER_1: "sig1", SIGNER_2: "sig2"},
+            HASH_B: {SIGNER_1: "sig3"},
+        }
+
+    def test_does_not_rewrite_existing_signatures(self, path):
+        append(path, HASH_A, SIGNER_1, "sig1")
+        before = store_file(path).read_bytes()
+
+        append(path, HASH_A, SIGNER_2, "sig2")
+
+        after = store_file(path).read_bytes()
+        assert after.startswith(before)
+        assert after.count(b"\n") == 2
+
+    def test_latest_signature_wins(self, path):
+        append(path, HASH_A, SIGNER_1, "old")
+        append(path, HASH_A, SIGNER_1, "new")
+        assert load(str(path)) == {HASH_A: {SIGNER_1: "new"}}
+
+    def test_recovers_from_interrupted_write(self, path, capsys):
+        append(path, HASH_A, SIGNER_1, "sig1")
+        with open(store_file(path), "a") as f:
+            f.write('{"transaction_hash": "')
+
+        append(path, HASH_A, SIGNER_2, "sig2")
+
+        assert load(str(path)) == {HASH_A: {SIGNER_1: "sig1", SIGNER_2: "sig2"}}
+        assert "malformed line" in capsys.readouterr().out
+
+
+class TestMigrate:
+    LEGACY = {HASH_A: {SIGNER_1: "sig1", SIGNER_2: "sig2"}}
+
+    def test_migrates_legacy_file(self, path):
+        (path / "out" / "signatures.txt").write_text(json.dumps(self.LEGACY))
+
+        migrate(str(path))
+
+        assert store_file(path).read_text().count("\n") == 2
+        assert load(str(path)) == self.LEGACY
+        # The legacy file is left untouched.
+        assert json.loads((path / "out" / "signatures.txt").read_text()) == self.LEGACY
+
+    def test_migrates_only_once(self, path):
+        (path / "out" / "signatures.txt").write_text(json.dumps(self.LEGACY))
+        load(str(path))
+        append(path, HASH_B, SIGNER_1, "sig3")
+
+        # Later changes of the legacy file are ignored.
+        (path / "out" / "signatures.txt").write_text(json.dumps({HASH_B: {}}))
+
+        assert load(str(path)) == {**self.LEGACY, HASH_B: {SIGNER_1: "sig3"}}
+
+    def test_empty_legacy_file_creates_no_store(self, path):
+        (path / "out" / "signatures.txt").write_text("{}")
+        migrate(str(path))
+        assert not store_file(path).exists()
+
+
+def sign_in_session(path, signer, count):
+    store = open_store(path)
+    for i in range(count):
+        add(store, f"{i:064x}", signer, f"sig-{signer}-{i}")
+
+
+class TestConcurrentSessions:
+    def test_refresh_reads_signatures_of_other_sessions(self, path):
+        store = open_store(str(path))
+        other = open_store(str(path))
+
+        add(other, HASH_A, SIGNER_1, "sig1")
+
+        assert store["signatures"] == {}
+        assert refresh(store) == {HASH_A: {SIGNER_1: "sig1"}}
+
+    def test_add_merges_signatures_of_other_sessions(self, path):
+        store = open_store(str(path))
+        other = open_store(str(path))
+
+        add(other, HASH_A, SIGNER_1, "sig1")
+        add(store, HASH_A, SIGNER_2, "sig2")
+
+        assert store["signatures"] == {HASH_A: {SIGNER_1: "sig1", SIGNER_2: "sig2"}}
+
+    def test_refresh_only_reads_new_lines(self, path):
+        store = open_store(str(path))
+        add(store, HASH_A, SIGNER_1, "sig1")
+        offset = store["offset"]
+
+        append(path, HASH_B, SIGNER_1, "sig2")
+        refresh(store)
+
+        assert store["offset"] > offset
+        assert store["signatures"][HASH_B] == {SIGNER_1: "sig2"}
+
+    def test_refresh_rereads_replaced_store(self, path):
+        store = open_store(str(path))
+        add(store, HASH_A, SIGNER_1, "sig1", make_record(SAFE, 3))
+        add(store, HASH_B, SIGNER_2, "sig2")
+
+        compact(str(path), {(8453, SAFE.lower()): 4}, archive=False)
+
+        assert refresh(store) == {HASH_B: {SIGNER_2: "sig2"}}
+
+    def test_parallel_sessions_lose_no_signatures(self, path):
+        signers = [f"0x{i:040x}" for i in range(1, 5)]
+        processes = [
+            multiprocessing.Process(target=sign_in_session, args=(str(path), s, 25))
+            for s in signers
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        all_signatures = load(str(path))
+        assert len(all_signatures) == 25
+        assert all(len(s) == len(signers) for s in all_signatures.values())
+
+
+class TestTransactions:
+    def test_transaction_is_recorded_once(self, path):
+        store = open_store(str(path))
+        add(store, HASH_A, SIGNER_1, "sig1", make_record(SAFE, 3))
+        add(store, HASH_A, SIGNER_2, "sig2", make_record(SAFE, 3))
+
+        assert store["transactions"] == {HASH_A: make_record(SAFE, 3)}
+        assert store["signatures"] == {HASH_A: {SIGNER_1: "sig1", SIGNER_2: "sig2"}}
+        assert open_store(str(path))["transactions"] == {HASH_A: make_record(SAFE, 3)}
+        assert store_file(path).read_text().count("\n") == 3
+
+
+class TestCompact:
+    def test_removes_consumed_nonces(self, path):
+        store = open_store(str(path))
+        add(store, HASH_A, SIGNER_1, "sig1", make_record(SAFE, 3))
+        add(store, HASH_B, SIGNER_1, "sig2", make_record(SAFE, 4))
+
+        removed = compact(str(path), {(8453, SAFE.lower()): 4})
+
+        assert removed == [HASH_A]
+        assert refresh(store) == {HASH_B: {SIGNER_1: "sig2"}}
+        assert store["transactions"] == {HASH_B: make_record(SAFE, 4)}
+
+    def test_archives_removed_entries(self, path):
+        store = open_store(str(path))
+        add(store, HASH_A, SIGNER_1, "sig1", make_record(SAFE, 3))
+
+        compact(str(path), {(8453, SAFE.lower()): 4})
+
+        archive = path / "out" / "signatures_archive.jsonl"
+        lines = [json.loads(line) for line in archive.read_text().splitlines()]
+        assert lines == [
+            {"transaction_hash": HASH_A, **make_record(SAFE, 3)},
+            {"transaction_hash": HASH_A, "signer": SIGNER_1, "signature": "sig1"},
+        ]
+
+    def test_drop_writes_no_archive(self, path):
+        add(open_store(str(path)), HASH_A, SIGNER_1, "sig1", make_record(SAFE, 3))
+
+        assert compact(str(path), {(8453, SAFE.lower()): 4}, archive=False) == [HASH_A]
+        assert load(str(path)) == {}
+        assert not (path / "out" / "signatures_archive.jsonl").exists()
+
+    def test_keeps_unrecorded_and_unknown_safes(self, path):
+        store = open_store(str(path))
+        add(store, HASH_A, SIGNER_1, "sig1")
+        add(store, HASH_B, SIGNER_1, "sig2", make_record(SIGNER_2, 3))
+        before = store_file(path).read_bytes()
+
+        assert compact(str(path), {(8453, SAFE.lower()): 10}) == []
+        assert store_file(path).read_bytes() == before
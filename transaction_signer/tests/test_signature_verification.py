@@ -0,0 +1,140 @@
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+from helpers import make_approved_hash_signature
+from src.utils.signatures import (
+    APPROVED_HASH,
+    CONTRACT_SIGNATURE,
+    ECDSA,
+    ETH_SIGN,
+    get_kind,
+    get_valid,
+    recover,
+    verify,
+)
+
+TRANSACTION_HASH = "ab" * 32
+ACCOUNTS = [Account.from_key(bytes([i]) * 32) for i in range(1, 4)]
+OTHER = "0x4444444444444444444444444444444444444444"
+
+
+def ecdsa_signature(account, transaction_hash=TRANSACTION_HASH):
+    return account.unsafe_sign_hash(bytes.fromhex(transaction_hash)).signature.hex()
+
+
+def eth_sign_signature(account):
+    signed = account.sign_message(
+        encode_defunct(primitive=bytes.fromhex(TRANSACTION_HASH))
+    )
+    # Safe expects eth_sign signatures with v + 4.
+    return signed.signature[:64].hex() + f"{signed.v + 4:02x}"
+
+
+def contract_signature(owner):
+    return "00" * 12 + owner[2:].lower() + f"{65:064x}" + "00"
+
+
+class TestGetKind:
+    def test_kinds(self):
+        assert get_kind(ecdsa_signature(ACCOUNTS[0])) == ECDSA
+        assert get_kind(eth_sign_signature(ACCOUNTS[0])) == ETH_SIGN
+        assert get_kind(make_approved_hash_signature(OTHER)) == APPROVED_HASH
+        assert get_kind(contract_signature(OTHER)) == CONTRACT_SIGNATURE
+
+    def test_invalid_v(self):
+        assert get_kind("00" * 64 + "05") is None
+        assert get_kind("") is None
+
+
+class TestRecover:
+    def test_ecdsa(self):
+        signature = ecdsa_signature(ACCOUNTS[0])
+        assert recover(TRANSACTION_HASH, signature) == ACCOUNTS[0].address
+        assert recover("0x" + TRANSACTION_HASH, "0x" + signature) == ACCOUNTS[0].address
+
+    def test_eth_sign(self):
+        signature = eth_sign_signature(ACCOUNTS[0])
+        assert recover(TRANSACTION_HASH, signature) == ACCOUNTS[0].address
+
+    def test_approved_hash_and_contract_signature_contain_owner(self):
+        owner = Account.from_key(b"\x05" * 32).address
+        assert recover(TRANSACTION_HASH, make_approved_hash_signature(owner)) == owner
+        assert recover(TRANSACTION_HASH, contract_signature(owner)) == owner
+
+    def test_contract_signature_with_dynamic_data(self):
+        signature = contract_signature(OTHER) + f"{2:064x}" + "abcd"
+        assert recover(TRANSACTION_HASH, signature).lower() == OTHER
+
+    def test_other_hash_recovers_other_address(self):
+        signature = ecdsa_signature(ACCOUNTS[0], "cd" * 32)
+        assert recover(TRANSACTION_HASH, signature) != ACCOUNTS[0].address
+
+    def test_malformed_signatures(self):
+        assert recover(TRANSACTION_HASH, "zz" * 65) is None
+        assert recover(TRANSACTION_HASH, "aa" * 64) is None
+        assert recover(TRANSACTION_HASH, ecdsa_signature(ACCOUNTS[0]) + "00") is None
+        assert recover(TRANSACTION_HASH, "ff" * 32 + "00" * 32 + "01") is None
+
+
+class TestVerify:
+    def test_valid_signatures(self):
+        signers_to_signatures = {
+            account.address: ecdsa_signature(account) for account in ACCOUNTS
+        }
+        assert verify(TRANSACTION_HASH, signers_to_signatures) == {}
+
+    def test_signature_of_other_signer(self):
+        signers_to_signatures = {ACCOUNTS[0].address: ecdsa_signature(ACCOUNTS[1])}
+        invalid = verify(TRANSACTION_HASH, signers_to_signatures)
+        assert invalid == {ACCOUNTS[0].address: f"recovers to {ACCOUNTS[1].address}"}
+
+    def test_signer_address_case_insensitive(self):
+        signers_to_signatures = {
+            ACCOUNTS[0].address.lower(): ecdsa_signature(ACCOUNTS[0])
+        }
+        assert verify(TRANSACTION_HASH, signers_to_signatures) == {}
+
+    def test_non_owner(self):
+        signers_to_signatures = {
+            account.address: ecdsa_signature(account) for account in ACCOUNTS
+        }
+        owners = [ACCOUNTS[0].address, ACCOUNTS[1].address]
+        invalid = verify(TRANSACTION_HASH, signers_to_signatures, owners)
+        assert invalid == {ACCOUNTS[2].address: "not an owner of the safe"}
+
+    def test_large_sets_use_process_pool(self):
+        signers_to_signatures = {
+            account.address: ecdsa_signature(account) for account in ACCOUNTS
+        }
+        signers_to_signatures[OTHER] = ecdsa_signature(ACCOUNTS[0])
+        expected = verify(TRANSACTION_HASH, signers_to_signatures)
+
+        with (
+            patch("src.utils.signatures.PARALLEL_VERIFICATION_THRESHOLD", 2),
+            patch("src.utils.signatures.os.cpu_count", return_value=2),
+            patch(
+                "src.utils.signatures.ProcessPoolExecutor", wraps=ProcessPoolExecutor
+            ) as mock_executor,
+        ):
+            result = verify(TRANSACTION_HASH, signers_to_signatures)
+
+        mock_executor.assert_called_once()
+        assert result == expected
+        assert list(result) == [OTHER]
+
+
+class TestGetValid:
+    def test_leaves_out_invalid_signatures(self, capsys):
+        valid = ecdsa_signature(ACCOUNTS[0])
+        signers_to_signatures = {
+            ACCOUNTS[0].address: valid,
+            ACCOUNTS[1].address: "aa" * 65,
+        }
+
+        result = get_valid(TRANSACTION_HASH, signers_to_signatures)
+
+        assert result == {ACCOUNTS[0].address: valid}
+        assert ACCOUNTS[1].address in capsys.readouterr().out
@@ -184,6 +184,24 @@ class TestSignTransaction:
 
         assert result.raw_transaction.hex().startswith("02")
 
+    @patch("src.wallets.trezor_t.ClickUI")
+    @patch("src.wallets.trezor_t.TrezorClient")
+    @patch("src.wallets.trezor_t.get_transport")
+    @patch("src.wallets.trezor_t.ethereum")
+    def test_passes_access_list(
+        self, mock_eth, mock_transport, mock_client_cls, mock_ui
+    ):
+        mock_client_cls.return_value = MagicMock()
+        mock_eth.get_address.return_value = SIGNER_ADDRESS
+        mock_eth.sign_tx_eip1559.return_value = (1, b"\x01" * 32, b"\x02" * 32)
+        access_list = [{"address": SIGNER_ADDRESS, "storageKeys": ["0x" + "01" * 32]}]
+
+        sign_transaction(0, SIGNER_ADDRESS, {**UNSIGNED_TX, "accessList": access_list})
+
+        (entry,) = mock_eth.sign_tx_eip1559.call_args.kwargs["access_list"]
+        assert entry.address == SIGNER_ADDRESS
+        assert entry.storage_keys == [b"\x01" * 32]
+
     @patch("src.wallets.trezor_t.ClickUI")
     @patch("src.wallets.trezor_t.TrezorClient")
     @patch("src.wallets.trezor_t.get_transport")
@@ -65,6 +65,25 @@ class TestGetSafe:
         result = get_safe(SAFES)
         assert result == SAFES[1]
 
+    @patch("src.user_input.inquirer.prompt")
+    def test_shows_overview_of_safes_state(self, mock_prompt):
+        mock_prompt.return_value = {
+            "safes": "Safe A (0x1111111111111111111111111111111111111111) - threshold 2/3, nonce 4"
+        }
+        safes_state = {
+            SAFES[0]["address"]: {"threshold": 2, "owners": [1, 2, 3], "nonce": 4},
+            SAFES[1]["address"]: None,
+        }
+
+        result = get_safe(SAFES, safes_state)
+
+        assert result == SAFES[0]
+        choices = mock_prompt.call_args[0][0][0].choices
+        assert choices == [
+            "Safe A (0x1111111111111111111111111111111111111111) - threshold 2/3, nonce 4",
+            "Safe B (0x2222222222222222222222222222222222222222) - not deployed on this chain",
+        ]
+
 
 class TestGetSigner:
     @patch("src.user_input.inquirer.prompt")
@@ -3,7 +3,7 @@ from unittest.mock import MagicMock, patch
 import pytest
 
 from helpers import make_mock_safe
-from src.utils.validate_signer import validate
+from src.utils.validate_signer import get_owners, validate
 
 SIGNER = {"name": "Signer One", "address": "0x2222222222222222222222222222222222222222"}
 TX_HASH = "abc123"
@@ -66,3 +66,18 @@ class TestValidateSignerEdgeCases:
         safe = make_mock_safe(is_owner=True)
         all_signatures = {"other_hash": {SIGNER["address"]: "existing_sig"}}
         assert validate(safe, all_signatures, TX_HASH, SIGNER) is True
+
+
+class TestValidateSignerOwnerSet:
+    def test_owner_needs_no_rpc_call(self):
+        safe = MagicMock()
+        owners = get_owners([SIGNER["address"].upper().replace("0X", "0x")])
+        assert validate(safe, {}, TX_HASH, SIGNER, owners) is True
+        safe.functions.isOwner.assert_not_called()
+
+    def test_non_owner(self, capsys):
+        safe = MagicMock()
+        owners = get_owners(["0x3333333333333333333333333333333333333333"])
+        assert validate(safe, {}, TX_HASH, SIGNER, owners) is False
+        assert "is not an owner" in capsys.readouterr().out
+        safe.functions.isOwner.assert_not_called()